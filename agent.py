@@ -1,5 +1,7 @@
 # agent.py
 import logging
+import threading
+from datetime import datetime
 from typing import List, Dict, Any
 from langchain.agents import create_openai_tools_agent, AgentExecutor
 from langchain_openai import ChatOpenAI
@@ -7,6 +9,7 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import HumanMessage, AIMessage
 from dotenv import load_dotenv
 
+from observability import AgentMetricsCallback, span
 from tools import AVAILABLE_TOOLS
 
 # Load environment variables
@@ -15,35 +18,19 @@ load_dotenv()
 # Setup logging
 logger = logging.getLogger(__name__)
 
-class FoodAgent:
-    """智能食物管理助手 Agent"""
-    
-    def __init__(self):
-        self.llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-        self.tools = AVAILABLE_TOOLS
-        self.agent_executor = self._create_agent()
-        
-    def _create_agent(self):
-        """創建 Agent 執行器"""
-        # 定義系統提示詞
-        from datetime import date, datetime
-        current_date = date.today().isoformat()
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        system_prompt = f"""你是一個智能食物管理助手，專門幫助用戶管理食材庫存。
-
-當前時間：{current_time}
-當前日期：{current_date}
+# 系統提示詞（不含任何隨時間變化的內容）
+SYSTEM_PROMPT = """你是一個智能食物管理助手，專門幫助用戶管理食材庫存。
 
 你有以下工具可以使用：
-1. add_ingredient - 添加食材到庫存
-2. get_ingredient_list - 查看食材庫存列表
-3. check_expiring_ingredients - 檢查即將過期的食材
-4. delete_ingredient - 完全刪除食材項目（可以通過ID或名稱）
-5. reduce_ingredient_quantity - 減少食材數量（可以通過ID或名稱）
-6. update_ingredient - 修改食材資訊（名稱、數量、單位、到期日、存放位置）
+1. add_ingredient - 添加一項食材到庫存
+2. add_ingredients - 一次添加多項食材到庫存
+3. get_ingredient_list - 查看食材庫存列表
+4. check_expiring_ingredients - 檢查即將過期的食材
+5. delete_ingredient - 完全刪除食材項目（可以通過ID或名稱）
+6. reduce_ingredient_quantity - 減少食材數量（可以通過ID或名稱）
+7. update_ingredient - 修改食材資訊（名稱、數量、單位、到期日、存放位置）
 
-當用戶說「查看庫存」、「食材列表」等，直接使用 get_ingredient_list 工具。
+當用戶說「查看庫存」、「食材列表」等，直接使用 get_ingredient_list 工具；用戶說「下一頁」時，帶入上一次列表最後的 cursor 再呼叫一次。
 當用戶說「添加食材」、「新增食材」等，使用 add_ingredient 工具。
 當用戶說「檢查過期」、「即將過期」等，使用 check_expiring_ingredients 工具。
 當用戶說「刪除食材」、「移除食材」等，使用 delete_ingredient 工具。
@@ -54,14 +41,41 @@ class FoodAgent:
 1. 如果用戶說要刪除某個數量的食材（如「刪除3根香蕉」），應該使用 reduce_ingredient_quantity 工具。
 2. 如果用戶說「全吃光」、「全部用掉」、「全部吃完」、「吃光了」、「全部消費」等，應該使用 delete_ingredient 工具來完全刪除該食材。
 3. 如果用戶說要修改食材的資訊（如「把牛奶的數量改成1000ml」），應該使用 update_ingredient 工具。
-4. 處理日期相關的食材時，請記住當前日期是 {current_date}，確保使用正確的年份。
+4. 如果用戶一次提到兩種以上要添加的食材（如「今天買了牛奶兩瓶、雞蛋一盒、吐司一條」），只呼叫一次 add_ingredients 工具並帶入所有食材，不要逐一呼叫 add_ingredient。
+5. 工具找不到食材時會列出名稱相近的候選（「你是不是要找：...」），請直接用候選的 ID 重新呼叫工具，不需要再查看整個庫存。
+6. 處理日期相關的食材時，請以用戶訊息前提供的當前日期為準，確保使用正確的年份。
 
 請直接使用工具來回答用戶的問題，不要詢問額外細節除非真的需要。"""
 
-        # 創建提示詞模板
+# 每次請求附在用戶訊息前的日期（放在最後，不影響前綴快取）
+DATE_PROMPT = "當前時間：{current_time}\n當前日期：{current_date}（{weekday}）"
+
+WEEKDAYS = ["星期一", "星期二", "星期三", "星期四", "星期五", "星期六", "星期日"]
+
+def current_date_variables() -> Dict[str, str]:
+    """DATE_PROMPT 使用的當前日期與時間（精確到分鐘）"""
+    now = datetime.now()
+    return {
+        "current_time": now.strftime("%Y-%m-%d %H:%M"),
+        "current_date": now.date().isoformat(),
+        "weekday": WEEKDAYS[now.weekday()],
+    }
+
+class FoodAgent:
+    """智能食物管理助手 Agent"""
+    
+    def __init__(self, llm=None):
+        self.llm = llm or ChatOpenAI(model="gpt-4o-mini", temperature=0)
+        self.tools = AVAILABLE_TOOLS
+        self.agent_executor = self._create_agent()
+        
+    def _create_agent(self):
+        """創建 Agent 執行器"""
+        # 固定的系統提示詞在前、每次請求的日期在後，讓供應商可以快取提示詞前綴
         prompt = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
+            ("system", SYSTEM_PROMPT),
             MessagesPlaceholder(variable_name="chat_history"),
+            ("system", DATE_PROMPT),
             ("human", "{input}"),
             MessagesPlaceholder(variable_name="agent_scratchpad"),
         ])
@@ -84,35 +98,43 @@ class FoodAgent:
         """處理用戶訊息並返回回應"""
         logger.info(f"🤖 Agent 收到用戶輸入: '{user_input}'")
         
-        try:
-            # 準備聊天歷史
-            if chat_history is None:
-                chat_history = []
-            
-            # 轉換聊天歷史格式
-            messages = []
-            for msg in chat_history[-5:]:  # 只保留最近5條訊息
-                if msg["role"] == "user":
-                    messages.append(HumanMessage(content=msg["content"]))
-                elif msg["role"] == "assistant":
-                    messages.append(AIMessage(content=msg["content"]))
-            
-            # 執行 Agent
-            logger.info("🧠 Agent 開始思考和執行...")
-            result = self.agent_executor.invoke({
-                "input": user_input,
-                "chat_history": messages
-            })
-            
-            response = result["output"]
-            logger.info(f"✅ Agent 回應: {response[:100]}...")
-            
-            return response
-            
-        except Exception as e:
-            error_msg = f"❌ Agent 處理失敗: {str(e)}"
-            logger.error(error_msg)
-            return error_msg
+        with span("agent") as current:
+            callback = AgentMetricsCallback()
+            try:
+                # 準備聊天歷史
+                if chat_history is None:
+                    chat_history = []
+                
+                # 轉換聊天歷史格式
+                messages = []
+                for msg in chat_history[-5:]:  # 只保留最近5條訊息
+                    if msg["role"] == "user":
+                        messages.append(HumanMessage(content=msg["content"]))
+                    elif msg["role"] == "assistant":
+                        messages.append(AIMessage(content=msg["content"]))
+                
+                # 執行 Agent
+                logger.info("🧠 Agent 開始思考和執行...")
+                result = self.agent_executor.invoke({
+                    "input": user_input,
+                    "chat_history": messages,
+                    **current_date_variables()
+                }, config={"callbacks": [callback]})
+                
+                response = result["output"]
+                logger.info(f"✅ Agent 回應: {response[:100]}...（LLM 呼叫 {callback.llm_calls} 次，"
+                            f"tokens {callback.prompt_tokens}+{callback.completion_tokens}，"
+                            f"快取命中 {callback.cached_ratio():.0%}）")
+                
+                return response
+                
+            except Exception as e:
+                current.fail(type(e).__name__)
+                error_msg = f"❌ Agent 處理失敗: {str(e)}"
+                logger.error(error_msg)
+                return error_msg
+            finally:
+                callback.finish()
     
     def get_available_tools_info(self) -> str:
         """獲取可用工具資訊"""
@@ -121,5 +143,16 @@ class FoodAgent:
             tools_info += f"{i}. {tool.name}: {tool.description}\n"
         return tools_info
 
-# 創建全局 Agent 實例
-food_agent = FoodAgent()
+# 全局 Agent 實例（第一次使用時才建立）
+_food_agent = None
+_food_agent_lock = threading.Lock()
+
+def get_food_agent() -> FoodAgent:
+    """獲取全局 Agent 實例（延遲初始化，多執行緒下只建立一次）"""
+    global _food_agent
+    if _food_agent is None:
+        with _food_agent_lock:
+            if _food_agent is None:
+                _food_agent = FoodAgent()
+                logger.info("🤖 已建立 FoodAgent")
+    return _food_agent
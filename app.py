@@ -1,15 +1,32 @@
 # app.py
 import os
+import json
+import time
+import hashlib
 import logging
-from datetime import datetime
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Optional, Tuple
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from linebot import LineBotApi, WebhookParser
-from linebot.models import MessageEvent, TextMessage, TextSendMessage
-from linebot.exceptions import InvalidSignatureError
+from linebot.models import MessageEvent, TextMessage, TextSendMessage, UnfollowEvent
+from linebot.exceptions import InvalidSignatureError, LineBotApiError
 
-from agent import food_agent
-from tools import check_expiring_ingredients
+from agent import get_food_agent
+from line_messaging import SessionHttpClient, split_text
+from tools import DEFAULT_EXPIRING_DAYS
+from intent_router import route_message
+from parser_chain import get_langchain_chain
+from name_index import normalize_name
+from notifier import ExpiryNotifier, LineMulticaster, SubscriberRegistry, SUBSCRIBE_COMMANDS, UNSUBSCRIBE_COMMANDS
+from observability import REGISTRY, bind_trace, span
+from session_store import SessionStore
+from storage import close_storage, current_storage, get_storage
+from worker_pool import AgentWorkerPool
 
 # Setup logging
 logging.basicConfig(
@@ -26,98 +43,450 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 CHANNEL_SECRET = os.getenv("LINE_CHANNEL_SECRET")
 CHANNEL_ACCESS_TOKEN = os.getenv("LINE_CHANNEL_ACCESS_TOKEN")
+# LINE Messaging API 的位址（測試時可以指向本機的假 LINE 伺服器）
+LINE_API_ENDPOINT = os.getenv("LINE_API_ENDPOINT", "https://api.line.me")
 
 # --- LINE setup ---
-line_bot_api = LineBotApi(CHANNEL_ACCESS_TOKEN)
+# 回覆、push 與 multicast 共用同一個 keep-alive 連線池
+line_bot_api = LineBotApi(CHANNEL_ACCESS_TOKEN, endpoint=LINE_API_ENDPOINT, http_client=SessionHttpClient)
 parser = WebhookParser(CHANNEL_SECRET)
 
+# --- Expiry notifications ---
+# 每天 NOTIFY_TIME 以 multicast 發送到期提醒給訂閱的用戶；多個 worker 行程時只在其中一個啟用
+NOTIFY_ENABLED = os.getenv("NOTIFY_ENABLED", "false").lower() == "true"
+notifier = ExpiryNotifier(
+    SubscriberRegistry(os.getenv("NOTIFY_SUBSCRIBERS_FILE", ".food_agent_subscribers.json")),
+    LineMulticaster(
+        line_bot_api,
+        requests_per_minute=float(os.getenv("LINE_MULTICAST_PER_MINUTE", "6000")),
+        max_retries=int(os.getenv("LINE_MAX_RETRIES", "5")),
+    ),
+    get_storage,
+    notify_time=os.getenv("NOTIFY_TIME", "09:00"),
+    days=int(os.getenv("NOTIFY_DAYS", str(DEFAULT_EXPIRING_DAYS))),
+    send_when_empty=os.getenv("NOTIFY_WHEN_EMPTY", "false").lower() == "true",
+)
+
+# --- Agent worker pool ---
+# 每個 uvicorn worker 行程同時處理的事件數上限（同一位用戶的事件仍依序處理）
+AGENT_MAX_WORKERS = int(os.getenv("AGENT_MAX_WORKERS", "4"))
+AGENT_MAX_PENDING = int(os.getenv("AGENT_MAX_PENDING", "100"))
+agent_pool = AgentWorkerPool(max_workers=AGENT_MAX_WORKERS, max_pending=AGENT_MAX_PENDING)
+
+BUSY_REPLY = "⏳ 目前使用人數較多，請稍後再試一次"
+
+# 常見指令直接呼叫工具，不經過 LLM Agent
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() != "false"
+
+# --- Conversation sessions ---
+session_store = SessionStore(
+    max_users=int(os.getenv("SESSION_MAX_USERS", "5000")),
+    ttl_seconds=float(os.getenv("SESSION_TTL_SECONDS", "1800")),
+    max_messages=int(os.getenv("SESSION_MAX_MESSAGES", "10")),
+    max_tokens=int(os.getenv("SESSION_MAX_TOKENS", "1000")),
+)
+
+# 延遲寫入統計中屬於累計值的欄位
+WRITE_BEHIND_COUNTERS = {"flushed_ops", "flush_batches", "failed_flushes"}
+
+# 背景同步統計中屬於累計值的欄位
+SHEET_SYNC_COUNTERS = {"syncs", "unchanged_syncs", "delta_syncs", "full_syncs", "changed_rows", "failed_syncs"}
+
+def collect_runtime_metrics():
+    """/metrics 輸出時讀取工作池、對話與 Google Sheets 客戶端的即時統計"""
+    yield ("food_agent_worker_pool_in_flight", "gauge", "背景工作池中執行與排隊中的工作數", agent_pool.in_flight)
+    yield ("food_agent_sessions", "gauge", "記憶體中的對話數", len(session_store))
+
+    # 只讀取已建立的儲存實例，/metrics 不會觸發 Google Sheets 連線
+    storage = current_storage()
+    worksheet = getattr(storage, "worksheet", None)
+    if hasattr(worksheet, "metrics"):
+        for key, value in worksheet.metrics().items():
+            yield (f"food_agent_sheets_{key}_total", "counter", f"Google Sheets 客戶端統計 {key}", value)
+
+    write_behind = getattr(storage, "write_behind", None)
+    if write_behind is not None:
+        for key, value in write_behind.stats().items():
+            if not isinstance(value, (int, float)):
+                continue
+            if key in WRITE_BEHIND_COUNTERS:
+                yield (f"food_agent_write_behind_{key}_total", "counter", f"延遲寫入統計 {key}", value)
+            else:
+                yield (f"food_agent_write_behind_{key}", "gauge", f"延遲寫入統計 {key}", value)
+
+    sheet_sync = getattr(storage, "sheet_sync", None)
+    if sheet_sync is not None:
+        for key, value in sheet_sync.stats().items():
+            if not isinstance(value, (int, float)):
+                continue
+            if key in SHEET_SYNC_COUNTERS:
+                yield (f"food_agent_sheet_sync_{key}_total", "counter", f"試算表同步統計 {key}", value)
+            else:
+                yield (f"food_agent_sheet_sync_{key}", "gauge", f"試算表同步統計 {key}", value)
+
+REGISTRY.register_collector(collect_runtime_metrics)
+
+# /api/expiring-ingredients 的結果，依 (days, location) 保存 (ETag, 內容)，日期或庫存版本改變時清空
+# 查詢參數來自公開的 API，最多保留 EXPIRING_RESPONSES_MAX 組，超過時移除最久沒用到的
+EXPIRING_RESPONSES_MAX = 64
+MAX_EXPIRING_DAYS = 365
+_expiring_responses = {"state": None, "responses": OrderedDict()}
+_expiring_responses_lock = threading.Lock()
+
+# --- Warm-up ---
+# 設為 true 時在啟動後於背景預熱，/readyz 會在預熱完成後才回應 200
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "false").lower() == "true"
+# 預熱時先連線到 LINE 與 OpenAI，第一個回覆不必等 TCP / TLS 握手（離線環境可設為 false）
+WARMUP_CONNECTIONS = os.getenv("WARMUP_CONNECTIONS", "true").lower() == "true"
+WARMUP_CONNECT_TIMEOUT = float(os.getenv("WARMUP_CONNECT_TIMEOUT", "3"))
+_warmup_lock = threading.Lock()
+_warmup_state = {"ready": False, "warmup_seconds": None, "error": None}
+
+def open_connections():
+    """預先建立 LINE API 與 OpenAI 的 HTTP 連線，失敗只記錄警告、不影響就緒狀態
+
+    OpenAI 以列出模型的請求建立連線（Agent 與解析 chain 共用同一個 httpx 連線池），
+    金鑰無效時回應 401 也已經完成握手。
+    """
+    line_bot_api.http_client.connect(LINE_API_ENDPOINT, WARMUP_CONNECT_TIMEOUT)
+
+    client = getattr(get_food_agent().llm, "root_client", None)
+    if client is None:
+        return
+    try:
+        client.with_options(timeout=WARMUP_CONNECT_TIMEOUT, max_retries=0).models.list()
+    except Exception as e:
+        if getattr(e, "status_code", None) is None:
+            logger.warning(f"⚠️ 無法預先連線到 OpenAI: {str(e)}")
+
+def warm_up() -> dict:
+    """建立儲存連線並載入庫存索引，建立 Agent、解析 chain 與 LINE / OpenAI 連線（成功後不再重複執行）"""
+    if _warmup_state["ready"]:
+        return dict(_warmup_state)
+    if not _warmup_lock.acquire(blocking=False):
+        # 其他執行緒正在預熱，不阻塞 readiness probe
+        return dict(_warmup_state, error="warming up")
+
+    try:
+        started = time.perf_counter()
+        with span("warm_up") as current:
+            try:
+                storage = get_storage()
+                error = storage.warm_up()
+                if error:
+                    raise RuntimeError(error)
+                get_food_agent()
+                get_langchain_chain()
+                if WARMUP_CONNECTIONS:
+                    open_connections()
+                _warmup_state.update(ready=True, error=None, backend=storage.backend_name)
+                logger.info(f"🔥 預熱完成，耗時 {time.perf_counter() - started:.2f} 秒")
+            except Exception as e:
+                current.fail(type(e).__name__)
+                _warmup_state.update(ready=False, error=str(e))
+                logger.error(f"❌ 預熱失敗: {str(e)}")
+        _warmup_state["warmup_seconds"] = round(time.perf_counter() - started, 3)
+        return dict(_warmup_state)
+    finally:
+        _warmup_lock.release()
+
 # --- FastAPI ---
 app = FastAPI()
 
+@app.on_event("startup")
+def start_warm_up():
+    if WARMUP_ON_STARTUP:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+@app.on_event("startup")
+def start_notifier():
+    if NOTIFY_ENABLED:
+        notifier.start()
+
+@app.on_event("shutdown")
+def shutdown_agent_pool():
+    notifier.stop()
+    agent_pool.shutdown(wait=False)
+    close_storage()
+
 @app.get("/healthz")
 def healthz():
     return {"ok": True}
 
-@app.get("/api/expiring-ingredients")
-async def get_expiring_ingredients():
-    """API 端點：獲取即將過期的食材列表，供 n8n 調用"""
+@app.get("/readyz")
+async def readyz():
+    """預熱（第一次呼叫時執行）並回報是否可以接收流量"""
+    state = await run_in_threadpool(warm_up)
+    if not state["ready"]:
+        return JSONResponse(status_code=503, content=state)
+    return state
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus 指標"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/admin/write-behind")
+def write_behind_stats():
+    """延遲寫入佇列的深度與寫入延遲"""
+    write_behind = getattr(get_storage(), "write_behind", None)
+    if write_behind is None:
+        return {"enabled": False}
+    return {"enabled": True, **write_behind.stats()}
+
+@app.get("/admin/notifier")
+def notifier_stats():
+    """到期提醒的訂閱人數與發送統計"""
+    return {"enabled": NOTIFY_ENABLED, **notifier.stats()}
+
+@app.post("/admin/notify")
+async def notify_now(force: bool = False):
+    """立即發送今天的到期提醒（force=true 時即使今天已發送過也重新發送）"""
     try:
-        logger.info("🔍 n8n 請求檢查過期食材")
-        result = check_expiring_ingredients()
-        
-        # 解析結果，判斷是否有過期食材
-        has_expiring = "沒有即將過期的食材" not in result
-        
-        return {
-            "success": True,
-            "has_expiring": has_expiring,
-            "message": result,
-            "timestamp": datetime.now().isoformat() + "Z"
+        result = await run_in_threadpool(notifier.run_once, force)
+    except Exception as e:
+        logger.error(f"❌ 發送到期提醒失敗: {str(e)}")
+        return JSONResponse(status_code=503, content={"sent": False, "error": str(e)})
+    return result
+
+@app.post("/admin/resync")
+async def resync(full: bool = False):
+    """立即把試算表上的手動編輯同步到記憶體索引（full=true 時重新讀取整張試算表）"""
+    sheet_sync = getattr(get_storage(), "sheet_sync", None)
+    if sheet_sync is None:
+        return {"enabled": False}
+    try:
+        result = await run_in_threadpool(sheet_sync.run_once, full)
+    except Exception as e:
+        logger.error(f"❌ 同步試算表失敗: {str(e)}")
+        return JSONResponse(status_code=503, content={"enabled": True, "error": str(e)})
+    return {"enabled": True, **result, "stats": sheet_sync.stats()}
+
+def expiring_payload(days: int, location: Optional[str]) -> Tuple[str, dict]:
+    """即將過期食材的結構化結果與 ETag
+
+    由儲存後端快取的到期日查詢計算；同一個庫存版本、日期與查詢參數的結果也會保留，
+    庫存沒有變更時不需要重新序列化。ETag 是內容的雜湊，多個 worker 行程會得到相同的值。
+    """
+    storage = get_storage()
+    today = date.today()
+    version = storage.inventory_version()
+    key = (days, normalize_name(location) if location else None)
+    with _expiring_responses_lock:
+        responses = _expiring_responses["responses"]
+        if _expiring_responses["state"] != (today, version):
+            responses.clear()
+            _expiring_responses["state"] = (today, version)
+        cached = responses.get(key) if version is not None else None
+        if cached is not None:
+            responses.move_to_end(key)
+    if cached is not None:
+        return cached
+
+    expiring = storage.get_expiring_records(days, location)
+    items = [
+        {
+            "id": ingredient.id,
+            "name": ingredient.name,
+            "quantity": ingredient.quantity,
+            "unit": ingredient.unit,
+            "expires_at": ingredient.expires_at_text,
+            "location": ingredient.location,
+            "days_left": days_left,
         }
+        for ingredient, days_left in expiring
+    ]
+    body = {
+        "success": True,
+        "has_expiring": bool(items),
+        "days": days,
+        "location": location,
+        "count": len(items),
+        "items": items,
+        "message": storage.format_expiring(expiring, days),
+    }
+    digest = hashlib.sha1(json.dumps([today.isoformat(), body], ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    result = (f'"{digest.hexdigest()}"', body)
+    if version is not None:
+        with _expiring_responses_lock:
+            if _expiring_responses["state"] == (today, version):
+                responses = _expiring_responses["responses"]
+                responses[key] = result
+                while len(responses) > EXPIRING_RESPONSES_MAX:
+                    responses.popitem(last=False)
+    return result
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否包含這個 ETag（也接受弱比對的 W/ 前綴與 *）"""
+    if not if_none_match:
+        return False
+    candidates = {tag.strip() for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+@app.get("/api/expiring-ingredients")
+async def get_expiring_ingredients(request: Request,
+                                   days: int = Query(DEFAULT_EXPIRING_DAYS, ge=0, le=MAX_EXPIRING_DAYS),
+                                   location: Optional[str] = None):
+    """API 端點：獲取 days 天內即將過期的食材列表，供 n8n 調用
+
+    days 限制在 0 到 MAX_EXPIRING_DAYS 之間，超出範圍回應 422。
+
+    回應帶有 ETag；n8n 以 If-None-Match 輪詢時，庫存與日期都沒有變就回應 304。
+    """
+    try:
+        logger.info(f"🔍 n8n 請求檢查 {days} 天內過期食材")
+        with span("api_expiring_ingredients"):
+            etag, body = await run_in_threadpool(expiring_payload, days, location)
+
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return JSONResponse(content=dict(body, timestamp=datetime.now().isoformat() + "Z"), headers=headers)
     except Exception as e:
         logger.error(f"❌ 檢查過期食材失敗: {str(e)}")
         return {
             "success": False,
             "has_expiring": False,
+            "items": [],
             "message": f"檢查失敗: {str(e)}",
             "timestamp": datetime.now().isoformat() + "Z"
         }
 
+def send_reply(reply_token: str, user_id: str, text: str):
+    """用 reply token 回覆，token 過期或失效時改用 push 訊息
+
+    超過 LINE 字數上限的回覆會切成多則訊息（最多 5 則）一起送出。
+    """
+    messages = [TextSendMessage(text=chunk) for chunk in split_text(text)]
+    message = messages[0] if len(messages) == 1 else messages
+    with span("line_reply"):
+        try:
+            line_bot_api.reply_message(reply_token, message)
+        except LineBotApiError as e:
+            if not user_id or user_id == "unknown" or e.status_code != 400:
+                raise
+            logger.warning(f"⚠️ reply token 已失效（{e.error.message}），改用 push 訊息回覆用戶 {user_id}")
+            line_bot_api.push_message(user_id, message)
+
+def handle_text_message(text_in: str, user_id: str) -> str:
+    """處理單則文字訊息並回傳回覆內容（在背景執行緒中執行）"""
+    if text_in.lower() == "ping":
+        logger.info("🏓 收到 ping 命令，回覆 pong")
+        return "pong ✅ Connected"
+    
+    if text_in.lower() == "help" or text_in.lower() == "幫助":
+        logger.info("📋 用戶請求幫助資訊")
+        return (
+            "🤖 智能食物管理助手\n\n"
+            "我可以幫助你：\n"
+            "• 管理食材庫存\n"
+            "• 添加食材到庫存\n"
+            "• 查看食材列表\n"
+            "• 檢查即將過期的食材\n"
+            "• 刪除食材\n"
+            "• 每天早上提醒即將過期的食材（輸入「訂閱提醒」，取消請輸入「取消提醒」）\n\n"
+            "試試說：「我想添加牛奶到庫存」或「查看食材庫存」"
+        )
+    
+    if text_in.lower() in SUBSCRIBE_COMMANDS and user_id != "unknown":
+        if notifier.registry.subscribe(user_id):
+            logger.info(f"🔔 用戶 {user_id} 訂閱到期提醒")
+        return "🔔 已訂閱每日到期提醒，輸入「取消提醒」可以取消"
+
+    if text_in.lower() in UNSUBSCRIBE_COMMANDS and user_id != "unknown":
+        if notifier.registry.unsubscribe(user_id):
+            logger.info(f"🔕 用戶 {user_id} 取消到期提醒")
+        return "🔕 已取消每日到期提醒"
+    
+    if text_in.lower() == "tools" or text_in.lower() == "工具":
+        logger.info("🛠️ 用戶請求工具列表")
+        return get_food_agent().get_available_tools_info()
+
+    has_session = user_id != "unknown"
+    
+    if FAST_PATH_ENABLED:
+        try:
+            reply = route_message(text_in)
+        except Exception as e:
+            reply = None
+            logger.error(f"❌ 快速路徑處理失敗，改由 Agent 處理: {str(e)}")
+        if reply is not None:
+            if has_session:
+                session_store.append_turn(user_id, text_in, reply)
+            return reply
+
+    try:
+        logger.info("🚀 Agent 開始處理用戶輸入...")
+        # 使用 Agent 處理用戶輸入，帶入該用戶最近的對話紀錄
+        chat_history = session_store.get_history(user_id) if has_session else None
+        reply = get_food_agent().process_user_message(text_in, chat_history=chat_history)
+        logger.info(f"📤 Agent 回覆用戶: {reply[:100]}...")
+        if has_session:
+            session_store.append_turn(user_id, text_in, reply)
+    except Exception as e:
+        reply = f"❌ 處理失敗，請稍後再試。\n錯誤: {str(e)}"
+        logger.error(f"❌ Agent 處理失敗: {str(e)}")
+    return reply
+
+def event_user_id(event) -> str:
+    return event.source.user_id if hasattr(event.source, 'user_id') else "unknown"
+
+def process_event(event):
+    """在背景工作池中處理單一事件並回覆"""
+    text_in = event.message.text.strip()
+    user_id = event_user_id(event)
+    
+    logger.info(f"👤 用戶 {user_id} 發送訊息: '{text_in}'")
+    # 每個事件一個根區間：agent → tool → sheets → line_reply
+    with span("line_event"):
+        reply = handle_text_message(text_in, user_id)
+        
+        try:
+            send_reply(event.reply_token, user_id, reply)
+        except Exception as e:
+            logger.error(f"❌ 回覆用戶 {user_id} 失敗: {str(e)}")
+
 @app.post("/line/webhook")
 async def line_webhook(request: Request):
     logger.info("📨 收到 LINE webhook 請求")
     signature = request.headers.get("X-Line-Signature", "")
     body = await request.body()
 
-    try:
-        events = parser.parse(body.decode("utf-8"), signature)
-        logger.info(f"✅ LINE webhook 解析成功，收到 {len(events)} 個事件")
-    except InvalidSignatureError:
-        logger.error("❌ LINE webhook 簽名驗證失敗")
-        raise HTTPException(status_code=400, detail="Invalid signature")
-
-    for event in events:
-        if isinstance(event, MessageEvent) and isinstance(event.message, TextMessage):
-            text_in = event.message.text.strip()
-            user_id = event.source.user_id if hasattr(event.source, 'user_id') else "unknown"
-            
-            logger.info(f"👤 用戶 {user_id} 發送訊息: '{text_in}'")
-
-            if text_in.lower() == "ping":
-                logger.info("🏓 收到 ping 命令，回覆 pong")
-                line_bot_api.reply_message(event.reply_token, TextSendMessage(text="pong ✅ Connected"))
-                continue
-            
-            if text_in.lower() == "help" or text_in.lower() == "幫助":
-                logger.info("📋 用戶請求幫助資訊")
-                help_text = (
-                    "🤖 智能食物管理助手\n\n"
-                    "我可以幫助你：\n"
-                    "• 管理食材庫存\n"
-                    "• 添加食材到庫存\n"
-                    "• 查看食材列表\n"
-                    "• 檢查即將過期的食材\n"
-                    "• 刪除食材\n\n"
-                    "試試說：「我想添加牛奶到庫存」或「查看食材庫存」"
-                )
-                line_bot_api.reply_message(event.reply_token, TextSendMessage(text=help_text))
-                continue
-            
-            if text_in.lower() == "tools" or text_in.lower() == "工具":
-                logger.info("🛠️ 用戶請求工具列表")
-                tools_info = food_agent.get_available_tools_info()
-                line_bot_api.reply_message(event.reply_token, TextSendMessage(text=tools_info))
-                continue
+    # 同一個 webhook 的所有事件共用一個追蹤 ID（透過 contextvars 傳到背景工作池）
+    with bind_trace():
+        with span("line_webhook"):
+            try:
+                events = parser.parse(body.decode("utf-8"), signature)
+                logger.info(f"✅ LINE webhook 解析成功，收到 {len(events)} 個事件")
+            except InvalidSignatureError:
+                logger.error("❌ LINE webhook 簽名驗證失敗")
+                raise HTTPException(status_code=400, detail="Invalid signature")
 
+            for event in events:
+                # 封鎖或刪除好友後 multicast 會失敗，直接取消訂閱
+                if isinstance(event, UnfollowEvent) and getattr(event.source, "user_id", None):
+                    notifier.registry.unsubscribe(event.source.user_id)
+
+            text_events = [
+                event for event in events
+                if isinstance(event, MessageEvent) and isinstance(event.message, TextMessage)
+            ]
+        if not text_events:
+            return "OK"
+
+        # 每個事件各自交給背景工作池並行處理，立即回應 LINE 平台；
+        # 以用戶 ID 為 key，同一位用戶的事件（跨 webhook 也一樣）依收到的順序處理
+        rejected = []
+        for event in text_events:
+            user_id = event_user_id(event)
+            key = user_id if user_id != "unknown" else event.reply_token
+            if agent_pool.submit_keyed(key, process_event, event) is None:
+                rejected.append((event, user_id))
+
+        for event, user_id in rejected:
             try:
-                logger.info("🚀 Agent 開始處理用戶輸入...")
-                # 使用 Agent 處理用戶輸入
-                reply = food_agent.process_user_message(text_in)
-                logger.info(f"📤 Agent 回覆用戶: {reply[:100]}...")
+                await run_in_threadpool(send_reply, event.reply_token, user_id, BUSY_REPLY)
             except Exception as e:
-                reply = f"❌ 處理失敗，請稍後再試。\n錯誤: {str(e)}"
-                logger.error(f"❌ Agent 處理失敗: {str(e)}")
-
-            line_bot_api.reply_message(event.reply_token, TextSendMessage(text=reply))
+                logger.error(f"❌ 回覆忙碌訊息失敗: {str(e)}")
 
     return "OK"
@@ -0,0 +1,134 @@
+# benchmarks/fake_line_server.py
+import json
+import time
+import uuid
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+# LINE multicast 一次最多的收件人數
+MAX_RECIPIENTS = 500
+
+
+class FakeLineServer:
+    """本機的假 LINE Messaging API
+
+    支援 multicast、push 與 reply，記錄每個請求（requests）與送達的訊息（delivered）。
+    - 以 X-Line-Retry-Key 去除重複：同一個 key 再次送出時回應 409 與 accepted request ID
+    - rate_per_second 限制每秒的請求數，超過時回應 429
+    - fail_next 讓接下來的幾個 multicast 回應 fail_status（預設 500）
+
+    以 LineBotApi(token, endpoint=server.url) 連接。
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, rate_per_second: float = 0,
+                 latency: float = 0.0):
+        self.rate_per_second = rate_per_second
+        self.latency = latency
+        self.fail_next = 0
+        self.fail_status = 500
+        self.retry_after: Optional[float] = None
+        self.calls: Counter = Counter()
+        self.requests: List[Dict[str, Any]] = []
+        self.delivered: Counter = Counter()
+        self._accepted: Dict[str, str] = {}
+        self._window: List[float] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeLineServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-line", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeLineServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---------- 請求處理 ----------
+
+    def _rate_limited(self) -> bool:
+        if not self.rate_per_second:
+            return False
+        now = time.monotonic()
+        self._window = [t for t in self._window if now - t < 1.0]
+        if len(self._window) >= self.rate_per_second:
+            return True
+        self._window.append(now)
+        return False
+
+    def handle(self, path: str, headers: Dict[str, str], body: Dict[str, Any]):
+        """回傳 (狀態碼, 回應標頭, 回應內容)"""
+        if self.latency:
+            time.sleep(self.latency)
+        kind = path.rstrip("/").rsplit("/", 1)[-1]
+        with self._lock:
+            self.calls[kind] += 1
+            self.requests.append({"path": path, "body": body, "retry_key": headers.get("x-line-retry-key")})
+
+            if self._rate_limited():
+                response_headers = {"Retry-After": str(self.retry_after)} if self.retry_after is not None else {}
+                return 429, response_headers, {"message": "The API rate limit has been exceeded."}
+
+            if kind == "multicast":
+                if self.fail_next > 0:
+                    self.fail_next -= 1
+                    response_headers = {"Retry-After": str(self.retry_after)} if self.retry_after is not None else {}
+                    return self.fail_status, response_headers, {"message": "Injected failure"}
+                if len(body.get("to", [])) > MAX_RECIPIENTS:
+                    return 400, {}, {"message": "The request body has 1 error(s)",
+                                     "details": [{"message": f"Size must be between 1 and {MAX_RECIPIENTS}",
+                                                  "property": "to"}]}
+                retry_key = headers.get("x-line-retry-key")
+                if retry_key and retry_key in self._accepted:
+                    return 409, {"x-line-accepted-request-id": self._accepted[retry_key]}, {
+                        "message": "The retry key is already accepted"}
+                request_id = str(uuid.uuid4())
+                if retry_key:
+                    self._accepted[retry_key] = request_id
+                for user_id in body.get("to", []):
+                    self.delivered[user_id] += 1
+                return 200, {"x-line-request-id": request_id}, {}
+
+            if kind == "push":
+                self.delivered[body.get("to")] += 1
+            return 200, {"x-line-request-id": str(uuid.uuid4())}, {}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    body = {}
+                headers = {key.lower(): value for key, value in self.headers.items()}
+                status, response_headers, payload = server.handle(self.path, headers, body)
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in response_headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
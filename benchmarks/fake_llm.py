@@ -0,0 +1,116 @@
+# benchmarks/fake_llm.py
+import json
+import hashlib
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+from session_store import estimate_tokens
+
+# 腳本：用戶輸入 → [(工具名稱, 工具參數), ...]；參數為字串時以單一字串工具的 __arg1 傳入
+Script = Callable[[str], Sequence[Tuple[str, Union[str, Dict[str, Any]]]]]
+
+
+class ScriptedChatModel(BaseChatModel):
+    """依腳本回應的假聊天模型，用來離線測試 FoodAgent
+
+    每次被呼叫時，依最後一則用戶訊息取得腳本中的工具呼叫步驟：
+    還有未執行的步驟就回傳下一個 tool call，全部執行完後把最後一個
+    工具結果當作最終回覆。calls 與 token 數（粗估）累計在模型上。
+
+    另外模擬供應商的提示詞前綴快取：工具定義加上開頭幾則訊息和先前某次
+    請求完全相同時，這段前綴的 token 計為 cached_tokens（不模擬最小長度限制）。
+    """
+
+    script: Any
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    _prefixes: set = PrivateAttr(default_factory=set)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-chat-model"
+
+    def reset_counters(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+
+    def _cached_prefix_tokens(self, messages: List[BaseMessage], tools: Any) -> int:
+        """和先前請求相同的最長前綴（以訊息為單位）的 token 數"""
+        parts = [json.dumps(tools or [], ensure_ascii=False)]
+        parts += [f"{message.type}:{message.content}" for message in messages]
+        digest = hashlib.sha1()
+        cached = running = 0
+        hit = True
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            key = digest.hexdigest()
+            running += estimate_tokens(part)
+            if hit and key in self._prefixes:
+                cached = running
+            else:
+                hit = False
+                self._prefixes.add(key)
+        return cached
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        self.calls += 1
+
+        last_human = max(i for i, message in enumerate(messages) if isinstance(message, HumanMessage))
+        tool_results = [m for m in messages[last_human:] if isinstance(m, ToolMessage)]
+        steps = list(self.script(str(messages[last_human].content)))
+
+        if len(tool_results) < len(steps):
+            tool_name, args = steps[len(tool_results)]
+            if isinstance(args, str):
+                args = {"__arg1": args}
+            call_id = f"call_{self.calls}"
+            message = AIMessage(
+                content="",
+                additional_kwargs={"tool_calls": [{
+                    "id": call_id,
+                    "type": "function",
+                    "function": {"name": tool_name, "arguments": json.dumps(args, ensure_ascii=False)},
+                }]},
+                tool_calls=[{"name": tool_name, "args": args, "id": call_id}],
+            )
+            output_text = json.dumps(args, ensure_ascii=False)
+        else:
+            answer = str(tool_results[-1].content) if tool_results else "好的"
+            message = AIMessage(content=answer)
+            output_text = answer
+
+        prompt_tokens = sum(estimate_tokens(f"{m.type}:{m.content}") for m in messages)
+        prompt_tokens += estimate_tokens(json.dumps(kwargs.get("tools") or [], ensure_ascii=False))
+        cached_tokens = self._cached_prefix_tokens(messages, kwargs.get("tools"))
+        completion_tokens = estimate_tokens(output_text)
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cached_tokens += cached_tokens
+
+        message.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "input_token_details": {"cache_read": cached_tokens},
+        }
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={
+                "model_name": self._llm_type,
+                "token_usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                    "prompt_tokens_details": {"cached_tokens": cached_tokens},
+                },
+            },
+        )
@@ -0,0 +1,183 @@
+# benchmarks/fake_sheets.py
+import re
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+
+class FakeResponse:
+    """模擬 requests.Response，只提供重試邏輯會讀取的欄位"""
+
+    def __init__(self, status_code: int, headers: Optional[Dict[str, str]] = None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeAPIError(Exception):
+    """模擬 gspread.exceptions.APIError（帶有 response.status_code）"""
+
+    def __init__(self, status_code: int, retry_after: Optional[float] = None):
+        headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+        self.response = FakeResponse(status_code, headers)
+        self.code = status_code
+        super().__init__(f"HTTP {status_code}")
+
+
+def _a1_to_rowcol(label: str):
+    match = re.match(r"^([A-Z]+)(\d+)$", label.upper())
+    if not match:
+        raise ValueError(f"不支援的儲存格位址: {label}")
+    col = 0
+    for ch in match.group(1):
+        col = col * 26 + ord(ch) - 64
+    return int(match.group(2)), col
+
+
+def _col_letter_to_index(letters: str) -> int:
+    col = 0
+    for ch in letters.upper():
+        col = col * 26 + ord(ch) - 64
+    return col
+
+
+class FakeSpreadsheet:
+    """模擬 gspread Spreadsheet，只支援刪除列的 batch_update（deleteDimension）"""
+
+    def __init__(self, worksheet: "FakeWorksheet"):
+        self.worksheet = worksheet
+
+    def batch_update(self, body: Dict[str, Any]):
+        with self.worksheet._write("spreadsheet_batch_update"):
+            # 依請求順序套用，與 Sheets API 相同
+            for request in body["requests"]:
+                target = request["deleteDimension"]["range"]
+                del self.worksheet.rows[target["startIndex"]:target["endIndex"]]
+        return {"replies": [{} for _ in body["requests"]]}
+
+
+class FakeWorksheet:
+    """記憶體中的 gspread Worksheet
+
+    實作 GoogleSheetsStorage 與 WriteBehindQueue 用到的方法，記錄每個方法的
+    呼叫次數（calls），可以為每次呼叫注入延遲（latency 秒），也可以讓接下來的
+    fail_next 次呼叫回應 HTTP 錯誤（預設 429）來測試重試與限流；設定 fail_methods 時
+    只有這些方法會失敗。
+    fail_after_write 為 True 時，寫入請求先生效再回應錯誤（模擬伺服器已寫入但回應 5xx）。
+    spreadsheet 提供刪除多列用的 batch_update。
+    """
+
+    def __init__(self, rows: List[List[Any]], latency: float = 0.0):
+        self.rows = [list(row) for row in rows]
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self.fail_next = 0
+        self.fail_status = 429
+        self.fail_after_write = False
+        self.fail_methods: Optional[set] = None
+        self.id = 0
+        self.spreadsheet = FakeSpreadsheet(self)
+        self._lock = threading.Lock()
+
+    @property
+    def api_calls(self) -> int:
+        """總 API 請求數"""
+        return sum(self.calls.values())
+
+    def _request(self, name: str, defer_failure: bool = False) -> bool:
+        """記錄一次請求；注入的錯誤在 defer_failure 時不立即拋出，而是回傳 True"""
+        with self._lock:
+            self.calls[name] += 1
+            fail = self.fail_next > 0 and (self.fail_methods is None or name in self.fail_methods)
+            if fail:
+                self.fail_next -= 1
+        if self.latency:
+            time.sleep(self.latency)
+        if fail and not defer_failure:
+            raise FakeAPIError(self.fail_status)
+        return fail
+
+    @contextmanager
+    def _write(self, name: str):
+        """寫入請求：fail_after_write 時先套用寫入再拋出注入的錯誤"""
+        fail = self._request(name, defer_failure=self.fail_after_write)
+        yield
+        if fail:
+            raise FakeAPIError(self.fail_status)
+
+    def _cell(self, row: int, col: int, value: Any):
+        while len(self.rows) < row:
+            self.rows.append([])
+        target = self.rows[row - 1]
+        if len(target) < col:
+            target.extend([""] * (col - len(target)))
+        target[col - 1] = value
+
+    # ---------- 讀取 ----------
+
+    def get_all_records(self, expected_headers=None, **kwargs) -> List[Dict[str, Any]]:
+        self._request("get_all_records")
+        headers = self.rows[0] if self.rows else []
+        return [
+            {header: (row[i] if i < len(row) else "") for i, header in enumerate(headers)}
+            for row in self.rows[1:]
+        ]
+
+    def get_all_values(self, **kwargs) -> List[List[Any]]:
+        self._request("get_all_values")
+        return [[str(value) for value in row] for row in self.rows]
+
+    def col_values(self, col: int, **kwargs) -> List[Any]:
+        self._request("col_values")
+        return [str(row[col - 1]) if len(row) >= col else "" for row in self.rows]
+
+    def row_values(self, row: int, **kwargs) -> List[Any]:
+        self._request("row_values")
+        return [str(value) for value in self.rows[row - 1]] if row <= len(self.rows) else []
+
+    def batch_get(self, ranges: List[str], **kwargs) -> List[List[List[Any]]]:
+        """支援 "A:A"、"A2:I2"、"2:2" 這類範圍"""
+        self._request("batch_get")
+        results = []
+        for cell_range in ranges:
+            start, _, end = cell_range.partition(":")
+            end = end or start
+            start_col = re.match(r"^([A-Z]*)(\d*)$", start.upper())
+            end_col = re.match(r"^([A-Z]*)(\d*)$", end.upper())
+            first_col = _col_letter_to_index(start_col.group(1)) if start_col.group(1) else 1
+            last_col = _col_letter_to_index(end_col.group(1)) if end_col.group(1) else 26
+            first_row = int(start_col.group(2)) if start_col.group(2) else 1
+            last_row = int(end_col.group(2)) if end_col.group(2) else len(self.rows)
+            values = []
+            for row in self.rows[first_row - 1:last_row]:
+                values.append([str(value) for value in row[first_col - 1:last_col]])
+            results.append(values)
+        return results
+
+    # ---------- 寫入 ----------
+
+    def append_row(self, values: List[Any], **kwargs):
+        with self._write("append_row"):
+            self.rows.append(list(values))
+
+    def append_rows(self, values: List[List[Any]], **kwargs):
+        with self._write("append_rows"):
+            self.rows.extend(list(row) for row in values)
+
+    def update_cell(self, row: int, col: int, value: Any):
+        with self._write("update_cell"):
+            self._cell(row, col, value)
+
+    def batch_update(self, data: List[Dict[str, Any]], **kwargs):
+        with self._write("batch_update"):
+            for item in data:
+                start = item["range"].split(":")[0]
+                row, col = _a1_to_rowcol(start)
+                for row_offset, values in enumerate(item["values"]):
+                    for col_offset, value in enumerate(values):
+                        self._cell(row + row_offset, col + col_offset, value)
+
+    def delete_rows(self, start_index: int, end_index: Optional[int] = None):
+        with self._write("delete_rows"):
+            del self.rows[start_index - 1:(end_index or start_index)]
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# benchmarks/notify_benchmark.py
+"""
+到期提醒基準測試：以本機的假 LINE 伺服器量測每日提醒發送給大量訂閱者的
+耗時、multicast 請求數與重試次數，並檢查沒有人收到重複的提醒。
+
+情境：
+    normal       正常發送
+    flaky        前幾個請求回應 HTTP 500，靠重試送達
+    rate_limit   假伺服器限制每秒請求數，回應 429
+    partial      一批重試用盡後失敗，重新執行時只補送失敗的批次
+
+用法：
+    python benchmarks/notify_benchmark.py --subscribers 10000 --items 50
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+from typing import Any, Dict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+os.environ["SHEETS_READ_PER_MINUTE"] = "1000000000"
+os.environ["SHEETS_WRITE_PER_MINUTE"] = "1000000000"
+
+from linebot import LineBotApi
+
+from fake_line_server import FakeLineServer
+from fake_sheets import FakeWorksheet
+from run_benchmarks import make_rows
+from google_sheets_storage import GoogleSheetsStorage
+from notifier import ExpiryNotifier, LineMulticaster, SubscriberRegistry
+
+
+def new_notifier(server: FakeLineServer, state_dir: str, subscribers: int, items: int,
+                 max_retries: int) -> ExpiryNotifier:
+    """建立連接到假 LINE 伺服器與假工作表的 ExpiryNotifier"""
+    path = os.path.join(state_dir, f"subscribers-{time.time_ns()}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"subscribers": {f"U{i:032x}": 0 for i in range(subscribers)}}, f)
+
+    os.environ["ID_STATE_FILE"] = os.path.join(state_dir, f"ids-{time.time_ns()}.json")
+    storage = GoogleSheetsStorage(worksheet=FakeWorksheet(make_rows(items)), write_behind=False, sync_interval=0)
+    multicaster = LineMulticaster(
+        LineBotApi("fake-token", endpoint=server.url),
+        requests_per_minute=1000000, max_retries=max_retries, base_delay=0.05, max_delay=0.5,
+    )
+    return ExpiryNotifier(SubscriberRegistry(path), multicaster, lambda: storage, days=3)
+
+
+def run_scenario(name: str, subscribers: int, items: int, state_dir: str) -> Dict[str, Any]:
+    rate = 2 if name == "rate_limit" else 0
+    with FakeLineServer(rate_per_second=rate) as server:
+        notifier = new_notifier(server, state_dir, subscribers, items, max_retries=0 if name == "partial" else 5)
+        if name == "rate_limit":
+            server.retry_after = 1.0
+        if name == "flaky":
+            server.fail_next = 3
+        if name == "partial":
+            server.fail_next = 1
+            server.fail_status = 503
+
+        started = time.perf_counter()
+        result = notifier.run_once()
+        if name == "partial":
+            # 排程在失敗後重新執行同一天的提醒
+            result = notifier.run_once()
+        elapsed = time.perf_counter() - started
+
+        duplicates = sum(1 for count in server.delivered.values() if count > 1)
+        return {
+            "scenario": name,
+            "subscribers": subscribers,
+            "elapsed_ms": round(elapsed * 1000, 3),
+            "multicast_requests": server.calls["multicast"],
+            "batches": result.get("batches"),
+            "retries": notifier.stats()["retries"],
+            "delivered_users": len(server.delivered),
+            "duplicate_users": duplicates,
+            "failed_users": result.get("failed"),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="到期提醒（LINE multicast）基準測試")
+    parser.add_argument("--subscribers", type=int, default=10000, help="訂閱者人數")
+    parser.add_argument("--items", type=int, default=50, help="庫存食材數")
+    parser.add_argument("--scenarios", default="normal,flaky,rate_limit,partial", help="以逗號分隔的情境")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = []
+    with tempfile.TemporaryDirectory() as state_dir:
+        for name in args.scenarios.split(","):
+            print(f"⏱️ 情境：{name}（{args.subscribers} 位訂閱者）")
+            results.append(run_scenario(name.strip(), args.subscribers, args.items, state_dir))
+
+    print(f"\n{'scenario':<11} {'ms':>9} {'requests':>9} {'batches':>8} {'retries':>8} "
+          f"{'delivered':>10} {'dupes':>6} {'failed':>7}")
+    for r in results:
+        print(f"{r['scenario']:<11} {r['elapsed_ms']:>9.1f} {r['multicast_requests']:>9} {r['batches']:>8} "
+              f"{r['retries']:>8} {r['delivered_users']:>10} {r['duplicate_users']:>6} {r['failed_users']:>7}")
+
+
+if __name__ == "__main__":
+    main()
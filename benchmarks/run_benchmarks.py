@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+# benchmarks/run_benchmarks.py
+"""
+離線基準測試：用記憶體中的假工作表與依腳本回應的假 LLM，
+量測 tools.py / GoogleSheetsStorage 在不同庫存大小下的延遲百分位數、
+每次操作的 Sheets API 請求數，以及 FoodAgent 每則訊息的 LLM 呼叫次數。
+
+用法：
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --sizes 50,500,5000,50000 --iterations 20 --latency-ms 5
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/benchmark-20250101-000000.json
+
+結果寫入 benchmarks/results/（或 --output 指定的檔案），格式為 JSON。
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+import statistics
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+# 基準測試完全離線：不連線 OpenAI，也不讓限流器影響量測
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline-benchmark")
+os.environ["SHEETS_READ_PER_MINUTE"] = "1000000000"
+os.environ["SHEETS_WRITE_PER_MINUTE"] = "1000000000"
+os.environ["SHEETS_WRITE_BEHIND"] = "false"
+os.environ["SHEETS_SYNC_INTERVAL"] = "0"
+
+from fake_sheets import FakeWorksheet
+from storage_backend import RECORD_HEADERS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = [50, 500, 5000, 50000]
+
+TOOL_NAMES = [
+    "add_ingredient", "add_ingredients", "get_ingredient_list", "check_expiring_ingredients",
+    "delete_ingredient", "reduce_ingredient_quantity", "update_ingredient",
+]
+
+# 假 LLM 的腳本：訊息 → 依序呼叫的工具與參數
+AGENT_SCRIPT = {
+    "查看庫存": [("get_ingredient_list", {})],
+    "檢查過期": [("check_expiring_ingredients", {"days": 3})],
+    "吃了3顆雞蛋": [("reduce_ingredient_quantity", {"identifier": "雞蛋", "amount": 3})],
+    "把牛奶的數量改成2": [("update_ingredient", {"identifier": "牛奶", "quantity": 2})],
+    "買了一瓶果汁明天到期": [
+        ("add_ingredient", {"name": "果汁", "quantity": 1, "unit": "瓶", "expires_at": "{tomorrow}", "location": "冷藏"}),
+    ],
+    "今天買了優格兩盒、吐司一條": [
+        ("add_ingredients", {"items": [
+            {"name": "優格", "quantity": 2, "unit": "盒", "location": "冷藏"},
+            {"name": "吐司", "quantity": 1, "unit": "條", "location": "室溫"},
+        ]}),
+    ],
+    "刪除香蕉": [("delete_ingredient", {"identifier": "香蕉"})],
+}
+
+
+def make_rows(size: int) -> List[List[Any]]:
+    """產生 size 筆食材資料（含標題列），名稱 食材0..食材N 以及幾個常見食材"""
+    today = date.today()
+    rows = [list(RECORD_HEADERS)]
+    common = ["雞蛋", "牛奶", "香蕉"]
+    for i in range(size):
+        name = common[i] if i < len(common) else f"食材{i}"
+        expires_at = (today + timedelta(days=i % 60 - 5)).isoformat()
+        rows.append([i + 1, name, 1000, "個", expires_at, "冷藏", "", today.isoformat(), today.isoformat()])
+    return rows
+
+
+def hand_edit(worksheet: FakeWorksheet, i: int):
+    """模擬有人直接在試算表上修改一列的數量（並更新「更新時間」）"""
+    row = worksheet.rows[2 + i % (len(worksheet.rows) - 2)]
+    row[2] = i + 1
+    row[8] = f"hand-edit-{time.time_ns()}"
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """延遲統計（毫秒）"""
+    ordered = sorted(samples)
+
+    def pick(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))]
+
+    return {
+        "p50": round(pick(0.50) * 1000, 3),
+        "p90": round(pick(0.90) * 1000, 3),
+        "p99": round(pick(0.99) * 1000, 3),
+        "mean": round(statistics.fmean(ordered) * 1000, 3),
+        "max": round(ordered[-1] * 1000, 3),
+    }
+
+
+def new_storage(size: int, latency: float, state_dir: str):
+    """建立連接到假工作表的 GoogleSheetsStorage，並設為全局儲存實例"""
+    from google_sheets_storage import GoogleSheetsStorage
+    from storage import set_storage
+
+    os.environ["ID_STATE_FILE"] = os.path.join(state_dir, f"ids-{size}-{time.time_ns()}.json")
+    worksheet = FakeWorksheet(make_rows(size), latency=latency)
+    storage = GoogleSheetsStorage(worksheet=worksheet, write_behind=False, sync_interval=0)
+    set_storage(storage)
+    return storage, worksheet
+
+
+def call_tool(tool_name: str, **kwargs) -> str:
+    """以工具名稱呼叫 tools.py 中的工具函式"""
+    import tools
+    return getattr(tools, tool_name)(**kwargs)
+
+
+def measure(worksheet: FakeWorksheet, iterations: int, fn: Callable[[int], Any]) -> Dict[str, Any]:
+    """執行 fn 多次，回傳延遲百分位數與每次操作的 API 請求數"""
+    before = dict(worksheet.calls)
+    samples = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - started)
+    by_method = {
+        method: round((count - before.get(method, 0)) / iterations, 3)
+        for method, count in worksheet.calls.items()
+        if count - before.get(method, 0)
+    }
+    return {
+        "iterations": iterations,
+        "latency_ms": percentiles(samples),
+        "api_calls_per_op": round(sum(by_method.values()), 3),
+        "api_calls_by_method": by_method,
+    }
+
+
+def bench_tools(size: int, iterations: int, latency: float, state_dir: str) -> List[Dict[str, Any]]:
+    """量測每個工具在指定庫存大小下的表現"""
+    results = []
+    tomorrow = (date.today() + timedelta(days=1)).isoformat()
+    rng = random.Random(size)
+
+    storage, worksheet = new_storage(size, latency, state_dir)
+
+    # 冷啟動：第一次讀取會載入整張試算表
+    cold = measure(worksheet, 1, lambda i: call_tool("get_ingredient_list"))
+    results.append({"suite": "tools", "size": size, "operation": "cold_load", **cold})
+
+    # 後續刪除/修改用的 ID，避免刪到同一筆
+    target_ids = rng.sample(range(4, size + 1), min(iterations * 2, max(size - 3, 0)))
+    if len(target_ids) < iterations * 2:
+        iterations = max(1, len(target_ids) // 2)
+
+    operations = [
+        ("get_ingredient_list", lambda i: call_tool("get_ingredient_list")),
+        ("check_expiring_ingredients", lambda i: call_tool("check_expiring_ingredients", days=3)),
+        ("add_ingredient", lambda i: call_tool(
+            "add_ingredient", name=f"基準食材{i}", quantity=2, unit="個", expires_at=tomorrow, location="冷藏")),
+        ("add_ingredients", lambda i: call_tool("add_ingredients", items=[
+            {"name": f"基準牛奶{i}", "quantity": 2, "unit": "瓶", "expires_at": tomorrow, "location": "冷藏"},
+            {"name": f"基準雞蛋{i}", "quantity": 1, "unit": "盒", "location": "冷藏"},
+            {"name": f"基準吐司{i}", "quantity": 1, "unit": "條", "location": "室溫"},
+        ])),
+        ("reduce_ingredient_quantity", lambda i: call_tool("reduce_ingredient_quantity", identifier="雞蛋", amount=1)),
+        ("update_ingredient", lambda i: call_tool(
+            "update_ingredient", identifier=target_ids[i], quantity=i + 1, location="冷凍")),
+        ("delete_ingredient", lambda i: call_tool("delete_ingredient", identifier=target_ids[iterations + i])),
+        ("sync_unchanged", lambda i: storage.sync()),
+        ("sync_hand_edit", lambda i: (hand_edit(worksheet, i), storage.sync())),
+    ]
+    for name, fn in operations:
+        result = measure(worksheet, iterations, fn)
+        results.append({"suite": "tools", "size": size, "operation": name, **result})
+
+    results[-1]["quota"] = storage.worksheet.metrics()
+    return results
+
+
+def bench_agent(size: int, latency: float, state_dir: str, llm_kind: str = "scripted") -> List[Dict[str, Any]]:
+    """量測 FoodAgent 每則訊息的延遲、LLM 呼叫次數（迭代次數）、token 數與 Sheets 請求數
+
+    llm_kind="openai" 時使用真正的 gpt-4o-mini（需要 OPENAI_API_KEY），
+    用來比較工具參數格式對迭代次數與 token 數的影響。
+    """
+    import observability
+    from agent import FoodAgent
+    from intent_router import match_intent
+
+    tomorrow = (date.today() + timedelta(days=1)).isoformat()
+
+    def script(text: str):
+        steps = AGENT_SCRIPT.get(text.strip(), [])
+        return [
+            (tool, {key: value.format(tomorrow=tomorrow) if isinstance(value, str) else value
+                    for key, value in args.items()})
+            for tool, args in steps
+        ]
+
+    if llm_kind == "openai":
+        agent = FoodAgent()
+    else:
+        from fake_llm import ScriptedChatModel
+        agent = FoodAgent(llm=ScriptedChatModel(script=script))
+    agent.agent_executor.verbose = False
+
+    def counters():
+        return (
+            observability.SPAN_DURATION.count(span="llm"),
+            observability.LLM_TOKENS.value(type="prompt"),
+            observability.LLM_TOKENS.value(type="completion"),
+            observability.LLM_TOKENS.value(type="cached"),
+            sum(observability.SPAN_DURATION.count(span=f"tool.{name}") for name in TOOL_NAMES),
+        )
+
+    _, worksheet = new_storage(size, latency, state_dir)
+    results = []
+    for message in AGENT_SCRIPT:
+        before_llm, before_prompt, before_completion, before_cached, before_tools = counters()
+        before = worksheet.api_calls
+        started = time.perf_counter()
+        agent.process_user_message(message)
+        elapsed = time.perf_counter() - started
+        after_llm, after_prompt, after_completion, after_cached, after_tools = counters()
+        prompt_tokens = int(after_prompt - before_prompt)
+        cached_tokens = int(after_cached - before_cached)
+        results.append({
+            "suite": "agent",
+            "size": size,
+            "operation": message,
+            "llm": llm_kind,
+            "latency_ms": percentiles([elapsed]),
+            "llm_calls": after_llm - before_llm,
+            "tool_calls": after_tools - before_tools,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": int(after_completion - before_completion),
+            "cached_tokens": cached_tokens,
+            "cached_ratio": round(cached_tokens / prompt_tokens, 3) if prompt_tokens else 0.0,
+            "api_calls_per_op": worksheet.api_calls - before,
+            "fast_path": match_intent(message) is not None,
+        })
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str):
+    """和先前的結果比較 p50 延遲與 API 請求數"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {(r["suite"], r["size"], r["operation"]): r for r in baseline["results"]}
+
+    print(f"\n📊 與 {baseline_path}（{baseline.get('revision')}）比較")
+    for result in results:
+        old = previous.get((result["suite"], result["size"], result["operation"]))
+        if not old:
+            continue
+        old_p50 = old["latency_ms"]["p50"] or 1e-9
+        ratio = result["latency_ms"]["p50"] / old_p50
+        marker = "⚠️" if ratio > 1.2 or result["api_calls_per_op"] > old["api_calls_per_op"] else "  "
+        line = (f"{marker} {result['suite']:<6} {result['size']:>6} {result['operation']:<28} "
+                f"p50 {old['latency_ms']['p50']:>9.3f} → {result['latency_ms']['p50']:>9.3f} ms (x{ratio:.2f})  "
+                f"api {old['api_calls_per_op']} → {result['api_calls_per_op']}")
+        if "llm_calls" in result and "llm_calls" in old:
+            line += (f"  llm {old['llm_calls']} → {result['llm_calls']}"
+                     f"  tokens {old['prompt_tokens'] + old['completion_tokens']}"
+                     f" → {result['prompt_tokens'] + result['completion_tokens']}")
+        print(line)
+
+
+def print_summary(results: List[Dict[str, Any]]):
+    print(f"\n{'suite':<6} {'size':>6} {'operation':<28} {'p50 ms':>9} {'p99 ms':>9} {'api/op':>7} "
+          f"{'llm':>4} {'tokens':>7} {'cached':>7}")
+    for result in results:
+        tokens = result["prompt_tokens"] + result["completion_tokens"] if "prompt_tokens" in result else ""
+        cached = f"{result['cached_ratio']:.0%}" if "cached_ratio" in result else ""
+        print(f"{result['suite']:<6} {result['size']:>6} {result['operation']:<28} "
+              f"{result['latency_ms']['p50']:>9.3f} {result['latency_ms']['p99']:>9.3f} "
+              f"{result['api_calls_per_op']:>7} {result.get('llm_calls', ''):>4} {tokens:>7} {cached:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Food Agent 離線基準測試")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="庫存大小，以逗號分隔")
+    parser.add_argument("--iterations", type=int, default=20, help="每個操作的執行次數")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="每次 Sheets 請求注入的延遲（毫秒）")
+    parser.add_argument("--agent-size", type=int, default=500, help="Agent 測試使用的庫存大小")
+    parser.add_argument("--skip-agent", action="store_true", help="略過 FoodAgent 測試")
+    parser.add_argument("--agent-llm", choices=["scripted", "openai"], default="scripted",
+                        help="Agent 測試使用的 LLM（openai 會呼叫真正的 API）")
+    parser.add_argument("--output", help="結果 JSON 檔路徑")
+    parser.add_argument("--compare", help="要比較的先前結果 JSON 檔")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    latency = args.latency_ms / 1000.0
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    results = []
+    with tempfile.TemporaryDirectory() as state_dir:
+        for size in sizes:
+            print(f"⏱️ 工具測試：{size} 筆食材")
+            results.extend(bench_tools(size, args.iterations, latency, state_dir))
+        if not args.skip_agent:
+            print(f"⏱️ Agent 測試：{args.agent_size} 筆食材")
+            results.extend(bench_agent(args.agent_size, latency, state_dir, args.agent_llm))
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "config": {
+            "sizes": sizes,
+            "iterations": args.iterations,
+            "latency_ms": args.latency_ms,
+            "agent_size": args.agent_size,
+            "agent_llm": args.agent_llm,
+        },
+        "results": results,
+    }
+
+    output = args.output or os.path.join(
+        BENCH_DIR, "results", f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print_summary(results)
+    if args.compare:
+        compare(results, args.compare)
+    print(f"\n💾 結果已寫入 {output}")
+
+
+if __name__ == "__main__":
+    main()
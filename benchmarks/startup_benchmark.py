@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# benchmarks/startup_benchmark.py
+"""
+冷啟動基準測試：每次在新的 Python 行程中量測
+匯入 app.py、/readyz 預熱，以及預熱前後第一個請求的耗時。
+
+Google Sheets 以假工作表代替（可用 --latency-ms 模擬網路延遲），
+OpenAI 只建立客戶端、不發出請求。
+
+用法：
+    python benchmarks/startup_benchmark.py --runs 5 --rows 5000 --latency-ms 100
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+PHASES = ["import_app", "warm_up", "first_request", "agent_ready"]
+
+
+def child(rows: int, latency: float, warm: bool):
+    """在子行程中執行：量測各階段耗時並以 JSON 輸出"""
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, BENCH_DIR)
+    timings = {}
+
+    started = time.perf_counter()
+    import app
+    timings["import_app"] = time.perf_counter() - started
+
+    from fake_sheets import FakeWorksheet
+    from run_benchmarks import make_rows
+    from google_sheets_storage import GoogleSheetsStorage
+    from storage import set_storage
+    worksheet = FakeWorksheet(make_rows(rows), latency=latency)
+    set_storage(GoogleSheetsStorage(worksheet=worksheet, write_behind=False, sync_interval=0))
+
+    if warm:
+        started = time.perf_counter()
+        state = app.warm_up()
+        timings["warm_up"] = time.perf_counter() - started
+        if not state["ready"]:
+            raise SystemExit(f"❌ 預熱失敗: {state['error']}")
+
+    # 第一個請求（快速路徑，會在未預熱時載入庫存索引）
+    started = time.perf_counter()
+    app.handle_text_message("查看庫存", "startup-benchmark")
+    timings["first_request"] = time.perf_counter() - started
+
+    # 第一次需要 Agent 時的建立時間（預熱後應接近 0）
+    from agent import get_food_agent
+    started = time.perf_counter()
+    get_food_agent()
+    timings["agent_ready"] = time.perf_counter() - started
+
+    print(json.dumps(timings))
+
+
+def run_child(rows: int, latency: float, warm: bool, workdir: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-offline-benchmark")
+    env.setdefault("LINE_CHANNEL_SECRET", "offline-benchmark")
+    env.setdefault("LINE_CHANNEL_ACCESS_TOKEN", "offline-benchmark")
+    # 離線量測：不預先連線到 LINE 與 OpenAI
+    env.setdefault("WARMUP_CONNECTIONS", "false")
+    env["ID_STATE_FILE"] = os.path.join(workdir, f"ids-{time.time_ns()}.json")
+    env.pop("PARSER_CACHE_PATH", None)
+
+    command = [sys.executable, os.path.abspath(__file__), "--child",
+               "--rows", str(rows), "--latency-ms", str(latency * 1000)]
+    if warm:
+        command.append("--warm")
+    # 在暫存目錄執行，food_agent.log 等檔案不會寫進專案目錄
+    output = subprocess.check_output(command, cwd=workdir, env=env, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(samples: list) -> dict:
+    summary = {}
+    for phase in PHASES:
+        values = [sample[phase] for sample in samples if phase in sample]
+        if values:
+            summary[phase] = {
+                "median_ms": round(statistics.median(values) * 1000, 1),
+                "max_ms": round(max(values) * 1000, 1),
+            }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Food Agent 冷啟動基準測試")
+    parser.add_argument("--runs", type=int, default=5, help="每種模式啟動幾個新行程")
+    parser.add_argument("--rows", type=int, default=5000, help="假工作表的食材筆數")
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="每次 Sheets 請求注入的延遲（毫秒）")
+    parser.add_argument("--output", help="結果 JSON 檔路徑")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--warm", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    latency = args.latency_ms / 1000.0
+    if args.child:
+        child(args.rows, latency, args.warm)
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode, warm in (("cold", False), ("warmed", True)):
+            print(f"⏱️ {mode}: {args.runs} 次啟動")
+            samples = [run_child(args.rows, latency, warm, workdir) for _ in range(args.runs)]
+            results[mode] = summarize(samples)
+
+    print(f"\n{'mode':<8} {'phase':<14} {'median ms':>10} {'max ms':>10}")
+    for mode, summary in results.items():
+        for phase, stats in summary.items():
+            print(f"{mode:<8} {phase:<14} {stats['median_ms']:>10} {stats['max_ms']:>10}")
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "config": {"runs": args.runs, "rows": args.rows, "latency_ms": args.latency_ms},
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        BENCH_DIR, "results", f"startup-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 結果已寫入 {output}")
+
+
+if __name__ == "__main__":
+    main()
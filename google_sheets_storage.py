@@ -1,22 +1,161 @@
 # google_sheets_storage.py
 import os
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import date
 import gspread
+from gspread.utils import rowcol_to_a1
 from google.oauth2.service_account import Credentials
 
+from id_allocator import IdAllocator
+from ingredient import Ingredient, fields_from_headers, format_date, headers_from_fields, parse_id
+from inventory_index import InventoryIndex
+from sheet_sync import SheetSync
+from sheets_client import QuotaAwareWorksheet
+from write_behind import MutationJournal, WriteBehindQueue
+from storage_backend import InventoryStorage, ConflictError, RECORD_HEADERS, VERSION_HEADER, new_version
+
 logger = logging.getLogger(__name__)
 
-class GoogleSheetsStorage:
+# 試算表欄位（依序對應 A~I 欄）
+SHEET_HEADERS = RECORD_HEADERS
+
+# 更新時間（記錄版本）所在欄號
+VERSION_COL = SHEET_HEADERS.index(VERSION_HEADER) + 1
+
+# 寫入前定位列號時讀取的欄位：ID 欄與更新時間欄
+LOCATE_RANGES = ["A:A", "I:I"]
+
+# 最後一欄的欄名（同步時讀取整列用）
+LAST_COL = rowcol_to_a1(1, len(SHEET_HEADERS)).rstrip("0123456789")
+
+# 同步時一次讀取的變更範圍上限，變更更分散時改為重新讀取整張試算表
+SYNC_MAX_RANGES = 200
+
+# 查詢試算表修訂資訊（version、modifiedTime）的 Drive API
+DRIVE_FILE_URL = "https://www.googleapis.com/drive/v3/files/{}"
+
+# 同一筆食材的「檢查版本 → 寫入」需要互斥，以 ID 分散到固定數量的鎖上
+ID_LOCK_STRIPES = 64
+
+# 可更新欄位：參數名稱 → 欄號
+UPDATABLE_FIELDS = {
+    'name': 2,
+    'quantity': 3,
+    'unit': 4,
+    'expires_at': 5,
+    'location': 6,
+    'notes': 7,
+}
+
+class _RowShiftLock:
+    """列位移鎖：不會移動其他列的寫入（更新儲存格、新增列）可以並行，刪除列時獨占"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._shared = 0
+        self._exclusive = False
+        self._waiting_exclusive = 0
+
+    @contextmanager
+    def shared(self):
+        with self._cond:
+            # 有刪除在等待時先讓刪除執行，避免刪除一直等不到
+            while self._exclusive or self._waiting_exclusive:
+                self._cond.wait()
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._shared -= 1
+                if not self._shared:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._cond:
+            self._waiting_exclusive += 1
+            while self._exclusive or self._shared:
+                self._cond.wait()
+            self._waiting_exclusive -= 1
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._exclusive = False
+                self._cond.notify_all()
+
+class GoogleSheetsStorage(InventoryStorage):
     """Google Sheets 資料儲存類別"""
     
-    def __init__(self):
+    backend_name = "Google Sheets"
+    
+    def __init__(self, worksheet=None, write_behind: bool = None, sync_interval: float = None):
         self.sheet_name = os.getenv("GOOGLE_SHEET_NAME", "food_agent_ingredients")
         self.worksheet_name = os.getenv("GOOGLE_WORKSHEET_NAME", "ingredients")
         self.client = None
         self.worksheet = None
-        self._initialize_client()
+        self.index = InventoryIndex()
+        self.id_allocator = IdAllocator(
+            os.getenv("ID_STATE_FILE", ".food_agent_ids.json"),
+            key=f"{self.sheet_name}/{self.worksheet_name}"
+        )
+        self._load_lock = threading.Lock()
+        self._row_lock = _RowShiftLock()
+        self._id_locks = [threading.Lock() for _ in range(ID_LOCK_STRIPES)]
+        self.write_behind = None
+        # 上次同步時的試算表修訂資訊
+        self._synced_revision = None
+        if worksheet is not None:
+            # 直接使用外部提供的 worksheet（例如測試用的假工作表）
+            self.worksheet = self._wrap_worksheet(worksheet)
+        else:
+            self._initialize_client()
+        
+        if write_behind is None:
+            write_behind = os.getenv("SHEETS_WRITE_BEHIND", "false").lower() == "true"
+        if write_behind and self.worksheet:
+            self._start_write_behind()
+        
+        if sync_interval is None:
+            sync_interval = float(os.getenv("SHEETS_SYNC_INTERVAL", "60"))
+        self.sheet_sync = SheetSync(self, sync_interval) if self.worksheet else None
+        if self.sheet_sync:
+            self.sheet_sync.start()
+    
+    def _start_write_behind(self):
+        """啟用延遲寫入：變更先寫入本機日誌，背景批次寫入試算表"""
+        journal = MutationJournal(os.getenv("WRITE_BEHIND_JOURNAL", "food_agent_journal.jsonl"))
+        self.write_behind = WriteBehindQueue(
+            self.worksheet,
+            journal,
+            SHEET_HEADERS,
+            flush_interval=float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "2")),
+            max_batch=int(os.getenv("WRITE_BEHIND_MAX_BATCH", "200")),
+            row_lock=self._row_lock.exclusive,
+        )
+        self.write_behind.start()
+        logger.info("📝 已啟用 Google Sheets 延遲寫入模式")
+    
+    def close(self):
+        """停止背景同步與延遲寫入，並把剩下的變更寫入試算表"""
+        if self.sheet_sync:
+            self.sheet_sync.stop()
+        if self.write_behind:
+            self.write_behind.stop(flush=True)
+    
+    def _wrap_worksheet(self, worksheet) -> QuotaAwareWorksheet:
+        """以配額感知客戶端包裝 worksheet"""
+        return QuotaAwareWorksheet(
+            worksheet,
+            read_per_minute=float(os.getenv("SHEETS_READ_PER_MINUTE", "60")),
+            write_per_minute=float(os.getenv("SHEETS_WRITE_PER_MINUTE", "60")),
+            max_retries=int(os.getenv("SHEETS_MAX_RETRIES", "5")),
+        )
     
     def _initialize_client(self):
         """初始化 Google Sheets 客戶端"""
@@ -47,12 +186,16 @@ class GoogleSheetsStorage:
             
             # 開啟或創建試算表
             try:
-                self.worksheet = self.client.open(self.sheet_name).worksheet(self.worksheet_name)
+                self.worksheet = self._wrap_worksheet(
+                    self.client.open(self.sheet_name).worksheet(self.worksheet_name)
+                )
                 logger.info(f"✅ 成功連接到 Google Sheets: {self.sheet_name}")
             except gspread.SpreadsheetNotFound:
                 # 如果試算表不存在，創建新的
                 spreadsheet = self.client.create(self.sheet_name)
-                self.worksheet = spreadsheet.add_worksheet(title=self.worksheet_name, rows=1000, cols=10)
+                self.worksheet = self._wrap_worksheet(
+                    spreadsheet.add_worksheet(title=self.worksheet_name, rows=1000, cols=10)
+                )
                 self._setup_headers()
                 logger.info(f"✅ 創建新的 Google Sheets: {self.sheet_name}")
             
@@ -64,28 +207,299 @@ class GoogleSheetsStorage:
     def _setup_headers(self):
         """設定試算表標題行"""
         if self.worksheet:
-            headers = ["ID", "名稱", "數量", "單位", "到期日", "存放位置", "備註", "創建時間", "更新時間"]
-            self.worksheet.append_row(headers)
+            self.worksheet.append_row(SHEET_HEADERS)
             logger.info("📋 已設定試算表標題行")
     
-    def _get_next_id(self) -> int:
-        """獲取下一個 ID"""
+    def _check_ready(self) -> Optional[str]:
         if not self.worksheet:
-            return 1
+            return "❌ Google Sheets 未初始化"
+        return None
+    
+    def _ensure_index(self) -> InventoryIndex:
+        """確保索引已載入，只有第一次（或失效後）才讀取整張試算表"""
+        if not self.index.loaded:
+            with self._load_lock:
+                if not self.index.loaded:
+                    self._load_index()
+        return self.index
+
+    def _load_index(self):
+        """讀取整張試算表重建索引"""
+        records = self.worksheet.get_all_records(expected_headers=SHEET_HEADERS)
+        self.index.load(records)
+        logger.info(f"📥 已載入 {len(records)} 筆食材到記憶體索引")
+        self._after_index_change()
+
+    def _after_index_change(self):
+        """索引以試算表內容重建或同步後：重新套用尚未寫入的變更，並讓 ID 發放器跳過手動新增的 ID"""
+        if self.write_behind:
+            self._apply_pending_to_index()
+        max_id = self.index.max_id()
+        if not self.id_allocator.seeded or max_id > self.id_allocator.high_water:
+            self.id_allocator.seed(max_id)
+
+    def _apply_pending_to_index(self):
+        """把尚未寫入試算表的變更重新套用到剛載入的索引（冪等）"""
+        for op in self.write_behind.pending_ops():
+            if op["op"] == "add":
+                ingredient = Ingredient.from_row(op["row"])
+                if ingredient is not None and self.index.get(ingredient.id) is None:
+                    self.index.add(ingredient)
+            elif op["op"] == "update":
+                self.index.update(op["id"], fields_from_headers(op["fields"]))
+            elif op["op"] == "delete":
+                self.index.remove(op["id"])
+
+    def refresh_index(self):
+        """捨棄記憶體索引，下次讀取時重新從試算表載入"""
+        self.index.invalidate()
+
+    def get_records(self) -> List[Ingredient]:
+        """依試算表順序回傳所有食材記錄（從記憶體索引讀取）"""
+        if not self.worksheet:
+            raise RuntimeError("Google Sheets 未初始化")
+        return self._ensure_index().records()
+
+    def inventory_version(self) -> Optional[int]:
+        if not self.worksheet:
+            return None
+        return self._ensure_index().version
+
+    def _find_expiring(self, today: date, days: int):
+        """以到期日索引做範圍查詢"""
+        return self._ensure_index().expiring_within(today, days)
+
+    def find_ingredient(self, identifier: str) -> Optional[Ingredient]:
+        """依 ID 或名稱查找食材記錄"""
+        if not self.worksheet:
+            raise RuntimeError("Google Sheets 未初始化")
+        index = self._ensure_index()
+        identifier = str(identifier).strip()
+        try:
+            return index.get(int(identifier))
+        except ValueError:
+            return index.find_by_name(identifier) or index.lookup_name(identifier)
+
+    def search_ingredients(self, query: str, limit: int = 5) -> List[Ingredient]:
+        """依名稱相似度排序的候選食材（從記憶體索引查詢）"""
+        if not self.worksheet:
+            return []
+        return [ingredient for ingredient, _ in self._ensure_index().search_names(query, limit)]
+
+    @contextmanager
+    def _locked_ids(self, ingredient_ids):
+        """鎖住這些食材 ID（依固定順序取得，避免死結）"""
+        stripes = sorted({ingredient_id % ID_LOCK_STRIPES for ingredient_id in ingredient_ids})
+        for stripe in stripes:
+            self._id_locks[stripe].acquire()
+        try:
+            yield
+        finally:
+            for stripe in reversed(stripes):
+                self._id_locks[stripe].release()
+
+    def _read_id_versions(self) -> List[Tuple[Optional[int], str]]:
+        """以一次請求讀取 ID 與更新時間欄，依試算表順序回傳每一列的 (食材ID, 版本)"""
+        ids, versions = self.worksheet.batch_get(LOCATE_RANGES)
+        rows = []
+        for offset, cells in enumerate(ids[1:]):
+            version_cells = versions[offset + 1] if offset + 1 < len(versions) else []
+            rows.append((parse_id(cells[0]) if cells else None,
+                         str(version_cells[0]) if version_cells else ""))
+        return rows
+
+    def _locate_rows(self) -> Dict[int, Tuple[int, str]]:
+        """寫入前讀取 ID 與更新時間欄，回傳 {食材ID: (列號, 版本)}
         
+        列號以寫入當下的試算表為準，不依賴可能已因其他刪除而位移的索引。
+        """
+        return {
+            ingredient_id: (position + InventoryIndex.FIRST_DATA_ROW, version)
+            for position, (ingredient_id, version) in enumerate(self._read_id_versions())
+            if ingredient_id is not None
+        }
+
+    def _check_index_versions(self, expected_versions: Dict[int, str]):
+        """與記憶體索引中的版本比對，索引中已是其他版本時拋出 ConflictError"""
+        for ingredient_id, expected in expected_versions.items():
+            current = self.index.get(ingredient_id)
+            if expected is not None and current is not None and current.updated_at != str(expected):
+                raise ConflictError(ingredient_id)
+
+    def _refresh_row(self, ingredient_id: int, row: int):
+        """版本不符時重新讀取該列，讓下一次重試使用最新的資料"""
+        fresh = Ingredient.from_row(self.worksheet.row_values(row))
+        current = self.index.get(ingredient_id)
+        if fresh is not None and current is not None:
+            self.index.update(ingredient_id, current.changes_from(fresh))
+
+    def _sheet_revision(self) -> Optional[str]:
+        """試算表的修訂資訊（Drive 檔案的 version 與 modifiedTime），無法取得時回傳 None
+
+        這是 Drive API 的請求，不消耗 Sheets 的讀取配額。
+        """
+        spreadsheet = getattr(self.worksheet, 'spreadsheet', None)
+        http_client = getattr(spreadsheet, 'client', None)
+        if http_client is None:
+            return None
         try:
-            # 獲取所有記錄
-            records = self.worksheet.get_all_records()
-            if not records:
-                return 1
-            
-            # 找到最大的 ID
-            max_id = max(int(record.get('ID', 0)) for record in records)
-            return max_id + 1
+            response = http_client.request(
+                "get", DRIVE_FILE_URL.format(spreadsheet.id),
+                params={"fields": "version,modifiedTime", "supportsAllDrives": True},
+            )
+            metadata = response.json()
         except Exception as e:
-            logger.error(f"❌ 獲取 ID 失敗: {str(e)}")
-            return 1
+            logger.warning(f"⚠️ 讀取試算表修訂資訊失敗，改為直接比對: {str(e)}")
+            return None
+        return f"{metadata.get('version')}@{metadata.get('modifiedTime')}"
+
+    def sync(self, full: bool = False) -> Dict[str, Any]:
+        """把試算表上的變更（包括手動編輯）同步到記憶體索引
+
+        修訂資訊與上次同步相同時不讀取任何儲存格；否則讀取 ID 與更新時間欄
+        和索引比對，只用一次 batch_get 讀取版本不同或新出現的列，讀取量取決於變更的列數。
+        手動編輯以「更新時間」判斷，需要試算表的 onEdit 程式在編輯時更新這一欄
+        （見 GOOGLE_SHEETS_SETUP.md）。full=True 時重新載入整張試算表。
+
+        回傳 {'mode': 'unchanged' | 'delta' | 'full' | 'not_loaded', 'changed_rows': 變更列數}，
+        full 時 changed_rows 為重新載入的列數。
+        """
+        if not self.worksheet:
+            raise RuntimeError("Google Sheets 未初始化")
+        if not self.index.loaded:
+            # 還沒載入過，下次讀取時會讀取整張試算表
+            return {'mode': 'not_loaded', 'changed_rows': 0}
+
+        # 同步期間不允許其他寫入，比對時索引與試算表之間只差手動編輯
+        with self._row_lock.exclusive():
+            revision = None if full else self._sheet_revision()
+            if not full and revision is not None and revision == self._synced_revision:
+                return {'mode': 'unchanged', 'changed_rows': 0}
+
+            changed = None if full else self._sync_changed_rows()
+            if changed is None:
+                self._load_index()
+                mode, changed = 'full', len(self.index)
+            else:
+                mode = 'delta'
+                if changed:
+                    self._after_index_change()
+
+            self._synced_revision = revision
+            return {'mode': mode, 'changed_rows': changed}
+
+    def _sync_changed_rows(self) -> Optional[int]:
+        """比對 ID 與更新時間欄，只讀取有變更的列並套用到索引
+
+        回傳變更的列數（新增、修改與刪除）；變更太分散或讀取期間又被修改時回傳 None，
+        由呼叫端改為讀取整張試算表。
+        """
+        sheet_rows = self._read_id_versions()
+        current_rows = self.index.rows()
+
+        stale = []
+        for position, (ingredient_id, version) in enumerate(sheet_rows):
+            if ingredient_id is None:
+                continue
+            current = self.index.get(ingredient_id)
+            if current is None or current.updated_at != version:
+                stale.append(position)
+
+        sheet_ids = [ingredient_id for ingredient_id, _ in sheet_rows]
+        current_ids = [ingredient.id if ingredient else None for ingredient in current_rows]
+        # 結尾沒有 ID 的列不影響其他列的列號
+        while sheet_ids and sheet_ids[-1] is None:
+            sheet_ids.pop()
+        while current_ids and current_ids[-1] is None:
+            current_ids.pop()
+        same_layout = sheet_ids == current_ids
+        if not stale and same_layout:
+            return 0
+
+        # 相鄰的列合併成一個範圍
+        runs = []
+        for position in stale:
+            if runs and runs[-1][1] == position - 1:
+                runs[-1][1] = position
+            else:
+                runs.append([position, position])
+        if len(runs) > SYNC_MAX_RANGES:
+            return None
+
+        fresh = {}
+        if runs:
+            first_row = InventoryIndex.FIRST_DATA_ROW
+            ranges = [f"A{start + first_row}:{LAST_COL}{end + first_row}" for start, end in runs]
+            for (start, end), values in zip(runs, self.worksheet.batch_get(ranges)):
+                for offset, position in enumerate(range(start, end + 1)):
+                    ingredient = Ingredient.from_row(values[offset] if offset < len(values) else [])
+                    if ingredient is None or ingredient.id != sheet_rows[position][0]:
+                        # 兩次讀取之間又被修改
+                        return None
+                    fresh[position] = ingredient
+
+        removed = len({i for i in current_ids if i is not None} - {i for i in sheet_ids if i is not None})
+        if same_layout:
+            for ingredient in fresh.values():
+                self.index.update(ingredient.id, self.index.get(ingredient.id).changes_from(ingredient))
+        else:
+            # 有列被新增、刪除或搬移：沿用未變更的記錄重建索引，不需要重新解析
+            self.index.replace_rows([
+                fresh.get(position) or (self.index.get(ingredient_id) if ingredient_id is not None else None)
+                for position, ingredient_id in enumerate(sheet_ids)
+            ])
+        return len(fresh) + removed
+
+    def _get_next_id(self) -> int:
+        """獲取下一個 ID（從記憶體發放，不讀取試算表）"""
+        if not self.id_allocator.seeded:
+            self._ensure_index()
+        return self.id_allocator.next_id()
     
+    def _append_rows(self, index: InventoryIndex, ingredients: List[Ingredient]):
+        """添加到試算表（或寫入延遲寫入日誌），成功後同步到索引
+        
+        新增列不會移動其他列，可以與更新並行；延遲寫入時日誌順序必須與索引一致。
+        """
+        if self.write_behind:
+            with self._row_lock.exclusive():
+                for ingredient in ingredients:
+                    self.write_behind.enqueue({"op": "add", "row": ingredient.to_row()})
+                    index.add(ingredient)
+        else:
+            with self._row_lock.shared():
+                # 不論幾筆都只發出一次請求
+                self._append_new_rows(ingredients)
+                for ingredient in ingredients:
+                    index.add(ingredient)
+    
+    def _append_new_rows(self, ingredients: List[Ingredient]):
+        """新增列；回應 5xx 時先確認這些 ID 是否已經寫入，沒有才重試，避免重複的列"""
+        ids = {ingredient.id for ingredient in ingredients}
+
+        def attempt(retry: int):
+            if retry and ids & {ingredient_id for ingredient_id, _ in self._read_id_versions()}:
+                logger.info(f"ℹ️ 上一次新增已經寫入試算表: {sorted(ids)}")
+                return
+            self.worksheet.append_rows([ingredient.to_row() for ingredient in ingredients],
+                                       value_input_option='RAW')
+
+        self.worksheet.retry_unsafe_write("append_rows", attempt)
+
+    def _delete_row(self, ingredient_id: int, row: int):
+        """刪除食材所在的列；回應 5xx 時依 ID 重新定位再重試，已經不存在表示上一次已刪除"""
+        def attempt(retry: int):
+            target = row
+            if retry:
+                located = self._locate_rows().get(ingredient_id)
+                if located is None:
+                    logger.info(f"ℹ️ 上一次刪除已經生效: ID {ingredient_id}")
+                    return
+                target = located[0]
+            self.worksheet.delete_rows(target)
+
+        self.worksheet.retry_unsafe_write("delete_rows", attempt)
+
     def add_ingredient(self, name: str, quantity: float = 1, unit: str = None, 
                       expires_at: str = None, location: str = None, notes: str = None) -> str:
         """添加食材到 Google Sheets"""
@@ -93,25 +507,17 @@ class GoogleSheetsStorage:
             return "❌ Google Sheets 未初始化"
         
         try:
+            index = self._ensure_index()
+            
             # 獲取下一個 ID
             ingredient_id = self._get_next_id()
             
             # 準備資料
-            current_time = date.today().isoformat()
-            row_data = [
-                ingredient_id,
-                name,
-                quantity,
-                unit or "",
-                expires_at or "",
-                location or "",
-                notes or "",
-                current_time,
-                current_time
-            ]
-            
-            # 添加到試算表
-            self.worksheet.append_row(row_data)
+            ingredient = Ingredient.create(
+                id=ingredient_id, name=name, quantity=quantity, unit=unit, expires_at=expires_at,
+                location=location, notes=notes, created_at=date.today().isoformat(), updated_at=new_version()
+            )
+            self._append_rows(index, [ingredient])
             
             logger.info(f"✅ 已添加食材到 Google Sheets: {name}")
             return f"✅ 已添加食材: {name} {quantity}{unit or ''} (ID: {ingredient_id})"
@@ -121,130 +527,160 @@ class GoogleSheetsStorage:
             logger.error(error_msg)
             return error_msg
     
-    def get_ingredient_list(self) -> str:
-        """從 Google Sheets 獲取食材列表"""
+    def add_ingredients(self, items: List[Dict[str, Any]]) -> str:
+        """一次添加多項食材：連續發放一段 ID，並以單次 append_rows 寫入所有列"""
         if not self.worksheet:
             return "❌ Google Sheets 未初始化"
         
-        try:
-            # 獲取所有記錄，指定預期的標題
-            expected_headers = ["ID", "名稱", "數量", "單位", "到期日", "存放位置", "備註", "創建時間", "更新時間"]
-            records = self.worksheet.get_all_records(expected_headers=expected_headers)
-            
-            if not records:
-                return "📦 目前沒有食材庫存"
-            
-            result = "📦 食材庫存列表:\n"
-            for i, record in enumerate(records, 1):
-                name = record.get('名稱', '')
-                quantity = record.get('數量', '')
-                unit = record.get('單位', '')
-                expires_at = record.get('到期日', '')
-                location = record.get('存放位置', '')
-                
-                result += f"{i}. {name} {quantity}{unit} (到期: {expires_at}, 存放: {location})\n"
-            
-            logger.info(f"✅ 從 Google Sheets 獲取 {len(records)} 筆食材記錄")
-            return result
-            
-        except Exception as e:
-            error_msg = f"❌ 獲取食材列表失敗: {str(e)}"
-            logger.error(error_msg)
-            return error_msg
-    
-    def check_expiring_ingredients(self, days: int = 3) -> str:
-        """檢查即將過期的食材"""
-        if not self.worksheet:
-            return "❌ Google Sheets 未初始化"
+        if not items:
+            return "ℹ️ 沒有需要添加的食材"
         
         try:
-            expected_headers = ["ID", "名稱", "數量", "單位", "到期日", "存放位置", "備註", "創建時間", "更新時間"]
-            records = self.worksheet.get_all_records(expected_headers=expected_headers)
-            today = date.today()
-            expiring_soon = []
-            
-            for record in records:
-                expires_at_str = record.get('到期日', '')
-                if expires_at_str:
-                    try:
-                        expires_date = date.fromisoformat(expires_at_str)
-                        days_left = (expires_date - today).days
-                        if days_left <= days:
-                            expiring_soon.append((record, days_left))
-                    except ValueError:
-                        continue
+            index = self._ensure_index()
+            ingredient_ids = self.id_allocator.allocate(len(items))
             
-            if not expiring_soon:
-                return "✅ 沒有即將過期的食材"
+            created_at = date.today().isoformat()
+            version = new_version()
+            ingredients = [Ingredient.create(id=ingredient_id, created_at=created_at, updated_at=version, **item)
+                           for ingredient_id, item in zip(ingredient_ids, items)]
+            self._append_rows(index, ingredients)
             
-            result = f"⚠️ 即將過期的食材 (未來{days}天內):\n"
-            for record, days_left in expiring_soon:
-                name = record.get('名稱', '')
-                result += f"- {name} 還有 {days_left} 天到期\n"
-            
-            logger.info(f"✅ 檢查到 {len(expiring_soon)} 項即將過期的食材")
-            return result
+            logger.info(f"✅ 已添加 {len(items)} 項食材到 Google Sheets")
+            return self._format_added(items, ingredient_ids)
             
         except Exception as e:
-            error_msg = f"❌ 檢查過期食材失敗: {str(e)}"
+            error_msg = f"❌ 添加食材失敗: {str(e)}"
             logger.error(error_msg)
             return error_msg
     
-    def delete_ingredient(self, ingredient_id: int) -> str:
-        """刪除食材"""
+    def delete_ingredient(self, ingredient_id: int, expected_version: str = None) -> str:
+        """刪除食材（寫入當下依 ID 找到列號，expected_version 不符時拋出 ConflictError）"""
         if not self.worksheet:
             return "❌ Google Sheets 未初始化"
         
         try:
-            records = self.worksheet.get_all_records()
+            index = self._ensure_index()
             
-            # 找到要刪除的記錄
-            for i, record in enumerate(records, 2):  # 從第2行開始（第1行是標題）
-                if int(record.get('ID', 0)) == ingredient_id:
-                    self.worksheet.delete_rows(i)
-                    logger.info(f"✅ 已刪除食材 ID: {ingredient_id}")
-                    return f"✅ 已刪除食材 ID: {ingredient_id}"
+            # 刪除列會讓之後的列號位移，期間不允許其他寫入
+            with self._row_lock.exclusive():
+                current = index.get(ingredient_id)
+                if self.write_behind:
+                    # 延遲寫入時日誌依序套用，以索引中的版本為準
+                    if current is None:
+                        return f"❌ 找不到 ID 為 {ingredient_id} 的食材"
+                    if expected_version is not None and current.updated_at != str(expected_version):
+                        raise ConflictError(ingredient_id)
+                    self.write_behind.enqueue({"op": "delete", "id": ingredient_id})
+                else:
+                    if expected_version is not None:
+                        self._check_index_versions({ingredient_id: expected_version})
+                    located = self._locate_rows().get(ingredient_id)
+                    if located is None:
+                        # 已被其他行程刪除
+                        index.remove(ingredient_id)
+                        return f"❌ 找不到 ID 為 {ingredient_id} 的食材"
+                    row, version = located
+                    if expected_version is not None and version != str(expected_version):
+                        self._refresh_row(ingredient_id, row)
+                        raise ConflictError(ingredient_id)
+                    self._delete_row(ingredient_id, row)
+                index.remove(ingredient_id)
             
-            return f"❌ 找不到 ID 為 {ingredient_id} 的食材"
+            name = current.name if current is not None else ""
+            logger.info(f"✅ 已刪除食材: {name} (ID: {ingredient_id})")
+            return f"✅ 已刪除食材: {name} (ID: {ingredient_id})"
             
+        except ConflictError:
+            raise
         except Exception as e:
             error_msg = f"❌ 刪除食材失敗: {str(e)}"
             logger.error(error_msg)
             return error_msg
     
-    def update_ingredient(self, ingredient_id: int, **kwargs) -> str:
-        """更新食材資訊"""
+    def _build_row_updates(self, row: int, kwargs: Dict[str, Any], updated_at: str):
+        """把一筆邏輯修改轉成 batch_update 的儲存格範圍與索引的屬性修改"""
+        data = []
+        changes = {}
+        for field, col in UPDATABLE_FIELDS.items():
+            if field in kwargs:
+                value = format_date(kwargs[field]) if field == 'expires_at' else kwargs[field]
+                data.append({'range': rowcol_to_a1(row, col), 'values': [[value]]})
+                changes[field] = value
+        
+        # 更新時間
+        data.append({'range': rowcol_to_a1(row, VERSION_COL), 'values': [[updated_at]]})
+        changes['updated_at'] = updated_at
+        return data, changes
+    
+    def update_ingredients(self, updates: Dict[int, Dict[str, Any]],
+                           expected_versions: Dict[int, str] = None) -> str:
+        """批次更新多筆食材，所有欄位在一次 batch_update 請求中寫入
+        
+        updates 的格式為 {食材ID: {'quantity': 2, 'location': '冷凍', ...}}，
+        欄位名稱與 update_ingredient 的參數相同。寫入前重新讀取 ID 與更新時間欄
+        決定列號，expected_versions 中任一筆版本不符時拋出 ConflictError，不寫入任何欄位。
+        """
         if not self.worksheet:
             return "❌ Google Sheets 未初始化"
         
+        if not updates:
+            return "ℹ️ 沒有需要更新的食材"
+        
         try:
-            records = self.worksheet.get_all_records()
+            index = self._ensure_index()
+            updated_at = new_version()
+            expected_versions = expected_versions or {}
             
-            # 找到要更新的記錄
-            for i, record in enumerate(records, 2):
-                if int(record.get('ID', 0)) == ingredient_id:
-                    # 更新欄位
-                    if 'name' in kwargs:
-                        self.worksheet.update_cell(i, 2, kwargs['name'])  # 名稱
-                    if 'quantity' in kwargs:
-                        self.worksheet.update_cell(i, 3, kwargs['quantity'])  # 數量
-                    if 'unit' in kwargs:
-                        self.worksheet.update_cell(i, 4, kwargs['unit'])  # 單位
-                    if 'expires_at' in kwargs:
-                        self.worksheet.update_cell(i, 5, kwargs['expires_at'])  # 到期日
-                    if 'location' in kwargs:
-                        self.worksheet.update_cell(i, 6, kwargs['location'])  # 存放位置
-                    if 'notes' in kwargs:
-                        self.worksheet.update_cell(i, 7, kwargs['notes'])  # 備註
+            if self.write_behind:
+                # 延遲寫入時日誌依序套用，以索引中的版本為準
+                with self._row_lock.exclusive():
+                    for ingredient_id in updates:
+                        current = index.get(ingredient_id)
+                        if current is None:
+                            return f"❌ 找不到 ID 為 {ingredient_id} 的食材"
+                        expected = expected_versions.get(ingredient_id)
+                        if expected is not None and current.updated_at != str(expected):
+                            raise ConflictError(ingredient_id)
+                    for ingredient_id, kwargs in updates.items():
+                        _, changes = self._build_row_updates(index.row_of(ingredient_id), kwargs, updated_at)
+                        self.write_behind.enqueue({"op": "update", "id": ingredient_id,
+                                                   "fields": headers_from_fields(changes)})
+                        index.update(ingredient_id, changes)
+            else:
+                # 更新儲存格不會移動列，不同食材的更新可以並行
+                with self._row_lock.shared(), self._locked_ids(updates):
+                    # 本行程已寫入較新的版本時不必讀取試算表就能判定衝突
+                    self._check_index_versions(expected_versions)
+                    located = self._locate_rows()
+                    data = []
+                    pending = {}
+                    for ingredient_id, kwargs in updates.items():
+                        if ingredient_id not in located:
+                            # 已被其他行程刪除
+                            index.remove(ingredient_id)
+                            return f"❌ 找不到 ID 為 {ingredient_id} 的食材"
+                        row, version = located[ingredient_id]
+                        expected = expected_versions.get(ingredient_id)
+                        if expected is not None and version != str(expected):
+                            self._refresh_row(ingredient_id, row)
+                            raise ConflictError(ingredient_id)
+                        
+                        row_data, changes = self._build_row_updates(row, kwargs, updated_at)
+                        data.extend(row_data)
+                        pending[ingredient_id] = changes
                     
-                    # 更新時間
-                    self.worksheet.update_cell(i, 9, date.today().isoformat())  # 更新時間
+                    # 單次請求寫入所有修改；RAW 讓版本字串原樣寫入、讀回時可以直接比對
+                    self.worksheet.batch_update(data, value_input_option='RAW')
                     
-                    logger.info(f"✅ 已更新食材 ID: {ingredient_id}")
-                    return f"✅ 已更新食材 ID: {ingredient_id}"
+                    for ingredient_id, changes in pending.items():
+                        index.update(ingredient_id, changes)
             
-            return f"❌ 找不到 ID 為 {ingredient_id} 的食材"
+            ids = ", ".join(str(ingredient_id) for ingredient_id in updates)
+            logger.info(f"✅ 已更新食材 ID: {ids}")
+            return f"✅ 已更新食材 ID: {ids}"
             
+        except ConflictError:
+            raise
         except Exception as e:
             error_msg = f"❌ 更新食材失敗: {str(e)}"
             logger.error(error_msg)
@@ -252,10 +688,13 @@ class GoogleSheetsStorage:
 
 # 創建全局實例（延遲初始化）
 google_sheets_storage = None
+_google_sheets_storage_lock = threading.Lock()
 
 def get_google_sheets_storage():
-    """獲取 Google Sheets 儲存實例（延遲初始化）"""
+    """獲取 Google Sheets 儲存實例（延遲初始化，多執行緒下只認證一次）"""
     global google_sheets_storage
     if google_sheets_storage is None:
-        google_sheets_storage = GoogleSheetsStorage()
+        with _google_sheets_storage_lock:
+            if google_sheets_storage is None:
+                google_sheets_storage = GoogleSheetsStorage()
     return google_sheets_storage
@@ -0,0 +1,105 @@
+# id_allocator.py
+import os
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from typing import List
+
+try:
+    import fcntl
+except ImportError:  # Windows：只能保證單一行程內不重複
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class IdAllocator:
+    """食材 ID 發放器
+
+    啟動時以試算表中的最大 ID 播種一次，之後直接從記憶體發放，
+    不需要每次新增都讀取試算表。已發放的最高水位會寫入本機狀態檔，
+    重啟後也不會重複使用已刪除食材的 ID。
+
+    多個 worker 行程共用同一個狀態檔：發放時以檔案鎖（state_path + ".lock"）
+    互斥，並在鎖內重新讀取狀態檔，從檔案與記憶體中較大的水位之後發放。
+    """
+
+    def __init__(self, state_path: str, key: str):
+        self.state_path = state_path
+        self.key = key
+        self._lock = threading.Lock()
+        self._high_water = self._load_high_water()
+        self.seeded = False
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ 讀取 ID 狀態檔失敗: {str(e)}")
+            return {}
+
+    def _load_high_water(self) -> int:
+        try:
+            return int(self._load_state().get(self.key, 0))
+        except (TypeError, ValueError):
+            return 0
+
+    @contextmanager
+    def _file_lock(self):
+        """跨行程的互斥鎖（狀態檔以原子替換寫入，所以鎖在另一個檔案上）"""
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.state_path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _persist(self):
+        """以暫存檔 + 原子替換寫入最高水位，避免寫到一半的狀態檔"""
+        state = self._load_state()
+        state[self.key] = self._high_water
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+
+    @property
+    def high_water(self) -> int:
+        """目前發放過（或播種）的最大 ID"""
+        with self._lock:
+            return self._high_water
+
+    def seed(self, max_existing_id: int):
+        """以試算表目前的最大 ID 播種，取試算表、狀態檔與記憶體中最大的值"""
+        with self._lock, self._file_lock():
+            stored = self._load_high_water()
+            high_water = max(self._high_water, stored, max_existing_id)
+            self._high_water = high_water
+            if high_water > stored:
+                self._persist()
+            self.seeded = True
+            logger.info(f"🔢 ID 發放器已就緒，下一個 ID: {self._high_water + 1}")
+
+    def allocate(self, count: int = 1) -> List[int]:
+        """一次發放 count 個連續 ID，持久化後才回傳"""
+        if count < 1:
+            return []
+        with self._lock, self._file_lock():
+            # 其他行程可能已經發放過更大的 ID
+            start = max(self._high_water, self._load_high_water()) + 1
+            self._high_water = start + count - 1
+            self._persist()
+            return list(range(start, start + count))
+
+    def next_id(self) -> int:
+        """發放單一 ID"""
+        return self.allocate(1)[0]
@@ -0,0 +1,164 @@
+# ingredient.py
+from dataclasses import dataclass, fields, replace
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+# 屬性名稱 → 試算表標題（依 A~I 欄的順序）
+INGREDIENT_HEADERS = {
+    'id': 'ID',
+    'name': '名稱',
+    'quantity': '數量',
+    'unit': '單位',
+    'expires_at': '到期日',
+    'location': '存放位置',
+    'notes': '備註',
+    'created_at': '創建時間',
+    'updated_at': '更新時間',
+}
+
+# 試算表標題 → 屬性名稱
+HEADER_FIELDS = {header: field for field, header in INGREDIENT_HEADERS.items()}
+
+
+def parse_id(value: Any) -> Optional[int]:
+    """把 ID 欄位轉成整數，無法轉換時回傳 None"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_date(value: Any) -> Optional[date]:
+    """把到期日欄位轉成 date，空白或格式錯誤時回傳 None"""
+    if isinstance(value, date):
+        return value
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(str(value).strip())
+    except ValueError:
+        return None
+
+
+def format_date(value: Any) -> str:
+    """把到期日轉成 YYYY-MM-DD 文字（寫入儲存時使用），空白或格式錯誤時為空字串"""
+    parsed = parse_date(value)
+    return parsed.isoformat() if parsed else ""
+
+
+def parse_quantity(value: Any) -> float:
+    """把數量欄位轉成 float，空白或格式錯誤時視為 0"""
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def format_quantity(quantity: float) -> str:
+    """顯示用的數量：整數不顯示小數點"""
+    return str(int(quantity)) if float(quantity).is_integer() else str(quantity)
+
+
+@dataclass(frozen=True, slots=True)
+class Ingredient:
+    """一筆食材記錄
+
+    載入時只解析與驗證一次（數量為 float、到期日為 date），之後各處直接讀取屬性。
+    物件不可變，修改時以 with_changes 產生新物件，讀取端拿到的永遠是一致的快照。
+    updated_at 同時是記錄的版本（見 storage_backend.new_version）。
+    """
+
+    id: int
+    name: str
+    quantity: float = 1.0
+    unit: str = ""
+    expires_at: Optional[date] = None
+    location: str = ""
+    notes: str = ""
+    created_at: str = ""
+    updated_at: str = ""
+
+    @classmethod
+    def create(cls, id: int, name: Any, quantity: Any = 1, unit: Any = None, expires_at: Any = None,
+               location: Any = None, notes: Any = None, created_at: Any = None,
+               updated_at: Any = None) -> "Ingredient":
+        """由未經處理的欄位值（試算表、資料庫或工具參數）建立"""
+        return cls(
+            id=int(id),
+            name=str(name or "").strip(),
+            quantity=parse_quantity(quantity),
+            unit=str(unit or ""),
+            expires_at=parse_date(expires_at),
+            location=str(location or ""),
+            notes=str(notes or ""),
+            created_at=str(created_at or ""),
+            updated_at=str(updated_at or ""),
+        )
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> Optional["Ingredient"]:
+        """由以試算表標題為鍵的 dict（get_all_records 的一列）建立，ID 無效時回傳 None"""
+        ingredient_id = parse_id(record.get('ID'))
+        if ingredient_id is None:
+            return None
+        values = {field: record.get(header) for header, field in HEADER_FIELDS.items()}
+        values['id'] = ingredient_id
+        return cls.create(**values)
+
+    @classmethod
+    def from_row(cls, row: List[Any]) -> Optional["Ingredient"]:
+        """由試算表的一列（依 A~I 欄順序的值）建立，ID 無效時回傳 None"""
+        return cls.from_record(dict(zip(INGREDIENT_HEADERS.values(), row)))
+
+    def to_row(self) -> List[Any]:
+        """依 A~I 欄順序輸出，寫入試算表用"""
+        return [getattr(self, field) if field != 'expires_at' else self.expires_at_text
+                for field in INGREDIENT_HEADERS]
+
+    @property
+    def expires_at_text(self) -> str:
+        return self.expires_at.isoformat() if self.expires_at else ""
+
+    @property
+    def quantity_text(self) -> str:
+        return format_quantity(self.quantity)
+
+    def days_left(self, today: date) -> Optional[int]:
+        """距離到期日的天數，沒有到期日時回傳 None"""
+        return (self.expires_at - today).days if self.expires_at else None
+
+    def with_changes(self, **changes: Any) -> "Ingredient":
+        """回傳套用修改後的新物件，修改值會以與載入時相同的規則解析"""
+        if not changes:
+            return self
+        parsed = {}
+        for field, value in changes.items():
+            if field == 'quantity':
+                value = parse_quantity(value)
+            elif field == 'expires_at':
+                value = parse_date(value)
+            elif field == 'id':
+                value = int(value)
+            else:
+                value = str(value or "")
+            parsed[field] = value
+        return replace(self, **parsed)
+
+    def changes_from(self, other: "Ingredient") -> Dict[str, Any]:
+        """與另一筆記錄不同的欄位（不含 ID），用於以重新讀取的資料更新索引"""
+        return {
+            field.name: getattr(other, field.name)
+            for field in fields(self)
+            if field.name != 'id' and getattr(self, field.name) != getattr(other, field.name)
+        }
+
+
+def fields_from_headers(values: Dict[str, Any]) -> Dict[str, Any]:
+    """把以試算表標題為鍵的欄位轉成以屬性名稱為鍵"""
+    return {HEADER_FIELDS[header]: value for header, value in values.items() if header in HEADER_FIELDS}
+
+
+def headers_from_fields(values: Dict[str, Any]) -> Dict[str, Any]:
+    """把以屬性名稱為鍵的欄位轉成以試算表標題為鍵（寫入試算表或延遲寫入日誌用）"""
+    return {INGREDIENT_HEADERS[field]: value.isoformat() if isinstance(value, date) else value
+            for field, value in values.items() if field in INGREDIENT_HEADERS}
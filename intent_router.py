@@ -0,0 +1,186 @@
+# intent_router.py
+import re
+import logging
+from typing import Any, Dict, NamedTuple, Optional
+
+import tools
+from storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+
+class Intent(NamedTuple):
+    """規則比對的結果：要呼叫的工具與傳給工具的參數"""
+    tool_name: str
+    tool_input: Dict[str, Any]
+
+
+CHINESE_DIGITS = {"零": 0, "一": 1, "二": 2, "兩": 2, "三": 3, "四": 4, "五": 5,
+                  "六": 6, "七": 7, "八": 8, "九": 9}
+
+NUMBER = r"\d+(?:\.\d+)?|[零一二兩三四五六七八九十百半]+"
+UNIT = r"顆|個|瓶|盒|條|根|片|包|罐|杯|袋|塊|串|把|隻|份|打|毫升|ml|mL|公升|L|公克|克|g|公斤|kg"
+LOCATION = r"冷藏|冷凍|室溫"
+
+# 含有這些字的訊息需要 LLM 理解上下文、換算日期或分數（「三分之一」），不走快速路徑
+AMBIGUOUS_WORDS = re.compile(r"它|這個|那個|剛剛|剛才|明天|後天|今天|昨天|下週|下周|禮拜|星期|號|到期|過期|天後|月|年|和|跟|、|，|,|分之")
+
+# 只有單位、沒有食材名稱（「吃了3顆」）
+UNIT_ONLY_PATTERN = re.compile(rf"^(?:{UNIT})$")
+
+LIST_PATTERN = re.compile(r"^(?:查看|查詢|看看|看|顯示|列出)?(?:一下)?(?:我的|目前的?|現在的?)?(?:食材)?(?:庫存|列表|清單)(?:列表|清單)?$")
+EXPIRING_PATTERN = re.compile(r"^(?:檢查|查看|查詢|看看)?(?:一下)?(?:(?P<days>\d+)天內)?(?:即將|快要?)?(?:過期|到期)(?:的)?(?:食材)?$")
+DELETE_ID_PATTERN = re.compile(r"^(?:刪除|移除)\s*(?:ID|id)?\s*(\d+)$")
+DELETE_NAME_PATTERN = re.compile(r"^(?:刪除|移除)\s*(?P<name>[^\d\s]+)$")
+FINISHED_PATTERN = re.compile(r"^(?:把)?(?P<name>[^\d\s]+?)(?:全部|都|全)(?:吃光|吃完|用光|用完|喝光|喝完)了?$")
+REDUCE_PATTERN = re.compile(
+    rf"^(?:我)?(?:吃了|吃掉|用了|用掉|喝了|喝掉|減少|刪除|移除)\s*(?P<qty>{NUMBER})\s*(?P<unit>{UNIT})?\s*(?:的)?(?P<name>[^\d\s]+)$"
+)
+ADD_PATTERN = re.compile(
+    rf"^(?:我)?(?:新增|添加|加入|買了)\s*(?:(?P<qty1>{NUMBER})\s*(?P<unit1>{UNIT})\s*)?(?P<name>[^\d\s]+?)"
+    rf"\s*(?:(?P<qty2>{NUMBER})\s*(?P<unit2>{UNIT})?)?\s*(?:(?:放|放在|放到|存放在?)?(?P<location>{LOCATION}))?$"
+)
+UPDATE_QUANTITY_PATTERN = re.compile(
+    rf"^把(?P<name>[^\d\s]+?)(?:的)?(?:數量)?(?:改成|改為|更新為|更新成)\s*(?P<qty>{NUMBER})\s*(?P<unit>{UNIT})?$"
+)
+UPDATE_LOCATION_PATTERN = re.compile(
+    rf"^把(?P<name>[^\d\s]+?)(?:移到|放到|改放|改放到|移至)(?P<location>{LOCATION})$"
+)
+
+
+def parse_number(text: str) -> Optional[float]:
+    """把阿拉伯數字或簡單的中文數字（如「三」、「十二」、「半」）轉成數值"""
+    if not text:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        pass
+
+    if text == "半":
+        return 0.5
+
+    total = 0
+    current = 0
+    for ch in text:
+        if ch in CHINESE_DIGITS:
+            current = CHINESE_DIGITS[ch]
+        elif ch == "十":
+            total += (current or 1) * 10
+            current = 0
+        elif ch == "百":
+            total += (current or 1) * 100
+            current = 0
+        else:
+            return None
+    return float(total + current)
+
+
+def is_ingredient_name(name: str) -> bool:
+    """規則擷取到的名稱看起來像食材名稱（不是單位或分數的一部分）"""
+    return bool(name) and not UNIT_ONLY_PATTERN.match(name) and not name.startswith("分之")
+
+
+def unit_matches_stored(name: str, unit: Optional[str]) -> bool:
+    """訊息中的單位與庫存記錄的單位相同（或訊息沒有單位）
+
+    單位不同時（例如庫存以毫升記錄，訊息說「半瓶」）數量需要換算，交給 LLM Agent。
+    找不到食材時回傳 True，由工具回覆找不到；無法查詢庫存時回傳 False。
+    """
+    if not unit:
+        return True
+    try:
+        ingredient = get_storage().find_ingredient(name)
+    except Exception as e:
+        logger.warning(f"⚠️ 無法確認 {name} 的單位，交給 Agent 處理: {str(e)}")
+        return False
+    if ingredient is None:
+        return True
+    return (ingredient.unit or "").strip().lower() == unit.lower()
+
+
+def match_intent(text: str) -> Optional[Intent]:
+    """以規則辨識常見指令，無法確定時回傳 None 交給 LLM Agent 處理
+
+    減少數量時若帶有單位，會查詢庫存確認單位與記錄相同。
+    """
+    text = text.strip()
+    if not text:
+        return None
+
+    if LIST_PATTERN.match(text):
+        return Intent("get_ingredient_list", {})
+
+    match = EXPIRING_PATTERN.match(text)
+    if match:
+        days = match.group("days")
+        return Intent("check_expiring_ingredients", {"days": int(days)} if days else {})
+
+    match = DELETE_ID_PATTERN.match(text)
+    if match:
+        return Intent("delete_ingredient", {"identifier": int(match.group(1))})
+
+    if AMBIGUOUS_WORDS.search(text):
+        return None
+
+    match = REDUCE_PATTERN.match(text)
+    if match and is_ingredient_name(match.group("name")):
+        quantity = parse_number(match.group("qty"))
+        if not unit_matches_stored(match.group("name"), match.group("unit")):
+            return None
+        if quantity:
+            return Intent("reduce_ingredient_quantity", {"identifier": match.group("name"), "amount": quantity})
+
+    match = FINISHED_PATTERN.match(text)
+    if match and is_ingredient_name(match.group("name")):
+        return Intent("delete_ingredient", {"identifier": match.group("name")})
+
+    match = DELETE_NAME_PATTERN.match(text)
+    if match and is_ingredient_name(match.group("name")):
+        return Intent("delete_ingredient", {"identifier": match.group("name")})
+
+    match = UPDATE_QUANTITY_PATTERN.match(text)
+    if match and is_ingredient_name(match.group("name")):
+        quantity = parse_number(match.group("qty"))
+        if quantity is not None:
+            return Intent("update_ingredient", {
+                "identifier": match.group("name"), "quantity": quantity, "unit": match.group("unit"),
+            })
+
+    match = UPDATE_LOCATION_PATTERN.match(text)
+    if match and is_ingredient_name(match.group("name")):
+        return Intent("update_ingredient", {"identifier": match.group("name"), "location": match.group("location")})
+
+    match = ADD_PATTERN.match(text)
+    if match and not (match.group("qty1") and match.group("qty2")) and is_ingredient_name(match.group("name")):
+        quantity_text = match.group("qty1") or match.group("qty2")
+        quantity = parse_number(quantity_text) if quantity_text else 1
+        if quantity:
+            return Intent("add_ingredient", {
+                "name": match.group("name"),
+                "quantity": quantity,
+                "unit": match.group("unit1") or match.group("unit2"),
+                "location": match.group("location"),
+            })
+
+    return None
+
+
+TOOL_FUNCTIONS = {
+    "add_ingredient": tools.add_ingredient,
+    "get_ingredient_list": tools.get_ingredient_list,
+    "check_expiring_ingredients": tools.check_expiring_ingredients,
+    "delete_ingredient": tools.delete_ingredient,
+    "reduce_ingredient_quantity": tools.reduce_ingredient_quantity,
+    "update_ingredient": tools.update_ingredient,
+}
+
+
+def route_message(text: str) -> Optional[str]:
+    """快速路徑：辨識得出的指令直接呼叫工具並回傳結果，否則回傳 None"""
+    intent = match_intent(text)
+    if intent is None:
+        return None
+
+    logger.info(f"⚡ 快速路徑: '{text}' → {intent.tool_name}({intent.tool_input})")
+    return TOOL_FUNCTIONS[intent.tool_name](**intent.tool_input)
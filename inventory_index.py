@@ -0,0 +1,202 @@
+# inventory_index.py
+import bisect
+import threading
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from ingredient import Ingredient
+from name_index import NameIndex, normalize_name
+
+
+class InventoryIndex:
+    """食材庫存的行程內索引
+
+    從試算表載入一次後，所有讀取都從記憶體取得；每次寫入試算表成功後
+    同步更新索引，保持與試算表一致。記錄在載入時解析成不可變的 Ingredient，
+    讀取端直接拿到物件本身，不需要複製也不需要重複解析。提供 ID、正規化名稱的雜湊查詢，
+    以及 ID → 試算表列號的對照；另外以 (到期日, ID) 排序的串列作為到期日索引，
+    「N 天內到期」可以用二分搜尋在 O(log n + k) 內完成。名稱找不到完全相符時，
+    以 NameIndex 做模糊比對（n-gram、簡繁轉換、同義詞）。
+    每次變更都會遞增 version，供上層判斷快取是否仍有效。
+    """
+
+    # 第1列是標題，記錄從第2列開始
+    FIRST_DATA_ROW = 2
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # 依試算表順序；ID 無法解析的列以 None 佔位，列號才會與試算表一致
+        self._rows: List[Optional[Ingredient]] = []
+        self._by_id: Dict[int, Ingredient] = {}
+        self._by_name: Dict[str, List[int]] = {}
+        self._row_of: Dict[int, int] = {}
+        self._expiry: List[Tuple[date, int]] = []
+        self._names = NameIndex()
+        self.loaded = False
+        self.version = 0
+
+    def load(self, records: List[Dict[str, Any]]):
+        """以完整的試算表記錄（get_all_records 的結果）重建索引"""
+        self.replace_rows([Ingredient.from_record(record) for record in records])
+
+    def replace_rows(self, rows: List[Optional[Ingredient]]):
+        """以已解析的列（依試算表順序，ID 無效的列為 None）重建索引"""
+        with self._lock:
+            self._rows = list(rows)
+            self._rebuild()
+            self.loaded = True
+            self.version += 1
+
+    def invalidate(self):
+        """標記索引失效，下次讀取時重新載入"""
+        with self._lock:
+            self.loaded = False
+
+    def _rebuild(self):
+        self._by_id = {}
+        self._by_name = {}
+        self._row_of = {}
+        self._expiry = []
+        self._names.clear()
+        for position, ingredient in enumerate(self._rows):
+            if ingredient is not None:
+                self._index_ingredient(ingredient, position, sort_expiry=False)
+        self._expiry.sort()
+
+    def _index_ingredient(self, ingredient: Ingredient, position: int, sort_expiry: bool = True):
+        self._by_id[ingredient.id] = ingredient
+        self._row_of[ingredient.id] = position + self.FIRST_DATA_ROW
+        self._index_name(ingredient)
+        self._index_expiry(ingredient, sort_expiry)
+
+    def _index_name(self, ingredient: Ingredient):
+        self._by_name.setdefault(normalize_name(ingredient.name), []).append(ingredient.id)
+        self._names.add(ingredient.id, ingredient.name)
+
+    def _unindex_name(self, ingredient: Ingredient):
+        key = normalize_name(ingredient.name)
+        ids = self._by_name.get(key)
+        if ids is not None:
+            if ingredient.id in ids:
+                ids.remove(ingredient.id)
+            if not ids:
+                del self._by_name[key]
+        self._names.remove(ingredient.id)
+
+    def _index_expiry(self, ingredient: Ingredient, sort_expiry: bool = True):
+        if ingredient.expires_at is None:
+            return
+        if sort_expiry:
+            bisect.insort(self._expiry, (ingredient.expires_at, ingredient.id))
+        else:
+            self._expiry.append((ingredient.expires_at, ingredient.id))
+
+    def _unindex_expiry(self, ingredient: Ingredient):
+        if ingredient.expires_at is None:
+            return
+        entry = (ingredient.expires_at, ingredient.id)
+        position = bisect.bisect_left(self._expiry, entry)
+        if position < len(self._expiry) and self._expiry[position] == entry:
+            del self._expiry[position]
+
+    # ---------- 讀取 ----------
+
+    def records(self) -> List[Ingredient]:
+        """依試算表順序回傳所有食材"""
+        with self._lock:
+            return [ingredient for ingredient in self._rows if ingredient is not None]
+
+    def rows(self) -> List[Optional[Ingredient]]:
+        """依試算表順序回傳每一列（ID 無效的列為 None），列號為位置 + FIRST_DATA_ROW"""
+        with self._lock:
+            return list(self._rows)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def get(self, ingredient_id: int) -> Optional[Ingredient]:
+        """依 ID 查詢"""
+        with self._lock:
+            return self._by_id.get(ingredient_id)
+
+    def find_by_name(self, name: str) -> Optional[Ingredient]:
+        """依正規化名稱查詢，同名時回傳試算表中最前面的一筆"""
+        with self._lock:
+            ids = self._by_name.get(normalize_name(name))
+            if not ids:
+                return None
+            return self._by_id[min(ids, key=self._row_of.__getitem__)]
+
+    def search_names(self, query: str, limit: int = 5) -> List[Tuple[Ingredient, float]]:
+        """模糊查詢名稱，回傳依相似度排序的 (食材, 分數)"""
+        with self._lock:
+            return [(self._by_id[ingredient_id], score)
+                    for ingredient_id, score in self._names.search(query, limit)]
+
+    def lookup_name(self, query: str) -> Optional[Ingredient]:
+        """名稱鍵完全相同（忽略簡繁與同義詞差異）的食材，不做模糊比對"""
+        with self._lock:
+            ingredient_id = self._names.lookup(query)
+            return self._by_id[ingredient_id] if ingredient_id is not None else None
+
+    def row_of(self, ingredient_id: int) -> Optional[int]:
+        """回傳食材所在的試算表列號"""
+        with self._lock:
+            return self._row_of.get(ingredient_id)
+
+    def expiring_within(self, today: date, days: int) -> List[Tuple[Ingredient, int]]:
+        """回傳到期日不晚於 today + days 的 (食材, 剩餘天數)，依到期日排序"""
+        with self._lock:
+            until = today + timedelta(days=days)
+            end = bisect.bisect_right(self._expiry, (until, float('inf')))
+            return [
+                (self._by_id[ingredient_id], (expires_date - today).days)
+                for expires_date, ingredient_id in self._expiry[:end]
+            ]
+
+    def max_id(self) -> int:
+        """目前最大的 ID，沒有記錄時為 0"""
+        with self._lock:
+            return max(self._by_id, default=0)
+
+    # ---------- 寫入後同步 ----------
+
+    def add(self, ingredient: Ingredient):
+        """新增食材（對應試算表的 append_row）"""
+        with self._lock:
+            self._rows.append(ingredient)
+            self._index_ingredient(ingredient, len(self._rows) - 1)
+            self.version += 1
+
+    def update(self, ingredient_id: int, changes: Dict[str, Any]):
+        """更新食材欄位，changes 以 Ingredient 的屬性名稱為鍵"""
+        with self._lock:
+            current = self._by_id.get(ingredient_id)
+            if current is None:
+                return
+            updated = current.with_changes(**changes)
+            if updated.name != current.name:
+                self._unindex_name(current)
+                self._index_name(updated)
+            if updated.expires_at != current.expires_at:
+                self._unindex_expiry(current)
+                self._index_expiry(updated)
+            self._by_id[ingredient_id] = updated
+            self._rows[self._row_of[ingredient_id] - self.FIRST_DATA_ROW] = updated
+            self.version += 1
+
+    def remove(self, ingredient_id: int):
+        """移除食材（對應試算表的 delete_rows），之後的列號往前移一列"""
+        with self._lock:
+            row = self._row_of.pop(ingredient_id, None)
+            if row is None:
+                return
+            ingredient = self._by_id.pop(ingredient_id)
+            self._unindex_name(ingredient)
+            self._unindex_expiry(ingredient)
+            position = row - self.FIRST_DATA_ROW
+            del self._rows[position]
+            for later in self._rows[position:]:
+                if later is not None:
+                    self._row_of[later.id] -= 1
+            self.version += 1
@@ -0,0 +1,87 @@
+# line_messaging.py
+import logging
+from typing import List
+
+import requests
+from linebot.http_client import HttpClient, RequestsHttpClient, RequestsHttpResponse
+
+logger = logging.getLogger(__name__)
+
+# LINE 文字訊息的字數上限
+LINE_TEXT_MAX_CHARS = 5000
+
+# 一次 reply / push 最多的訊息數
+LINE_MAX_MESSAGES = 5
+
+
+class SessionHttpClient(RequestsHttpClient):
+    """以同一個 requests.Session 呼叫 LINE API，重複使用 keep-alive 連線
+
+    line-bot-sdk 預設的 RequestsHttpClient 每個請求都用 requests.get / post，
+    每次回覆都要重新建立 TCP 與 TLS 連線。
+    """
+
+    def __init__(self, timeout=HttpClient.DEFAULT_TIMEOUT):
+        super().__init__(timeout)
+        self.session = requests.Session()
+
+    def _request(self, method: str, url: str, timeout=None, **kwargs) -> RequestsHttpResponse:
+        response = self.session.request(method, url, timeout=self.timeout if timeout is None else timeout, **kwargs)
+        return RequestsHttpResponse(response)
+
+    def get(self, url, headers=None, params=None, stream=False, timeout=None):
+        return self._request("GET", url, headers=headers, params=params, stream=stream, timeout=timeout)
+
+    def post(self, url, headers=None, data=None, timeout=None):
+        return self._request("POST", url, headers=headers, data=data, timeout=timeout)
+
+    def delete(self, url, headers=None, data=None, timeout=None):
+        return self._request("DELETE", url, headers=headers, data=data, timeout=timeout)
+
+    def put(self, url, headers=None, data=None, timeout=None):
+        return self._request("PUT", url, headers=headers, data=data, timeout=timeout)
+
+    def connect(self, url: str, timeout: float) -> bool:
+        """先對 url 發一個 HEAD 請求，讓連線池保留一條已完成握手的連線；失敗時回傳 False"""
+        try:
+            self.session.head(url, timeout=timeout)
+            return True
+        except requests.RequestException as e:
+            logger.warning(f"⚠️ 無法預先連線到 {url}: {str(e)}")
+            return False
+
+
+def split_text(text: str, max_chars: int = LINE_TEXT_MAX_CHARS,
+               max_messages: int = LINE_MAX_MESSAGES) -> List[str]:
+    """把長訊息依行切成多則 LINE 文字訊息（每則最多 max_chars 字，最多 max_messages 則）
+
+    超過 max_messages 則時，最後一則以提示結尾，其餘內容不送出。
+    """
+    text = text.rstrip("\n") or text
+    if len(text) <= max_chars:
+        return [text]
+
+    chunks: List[str] = []
+    current: List[str] = []
+    length = 0
+    for line in text.split("\n"):
+        # 單行超過上限時直接切開
+        while len(line) > max_chars:
+            if current:
+                chunks.append("\n".join(current))
+                current, length = [], 0
+            chunks.append(line[:max_chars])
+            line = line[max_chars:]
+        if current and length + 1 + len(line) > max_chars:
+            chunks.append("\n".join(current))
+            current, length = [], 0
+        length += len(line) + (1 if current else 0)
+        current.append(line)
+    if current:
+        chunks.append("\n".join(current))
+
+    if len(chunks) > max_messages:
+        footer = "\n…內容太長，其餘部分未顯示"
+        chunks = chunks[:max_messages]
+        chunks[-1] = chunks[-1][:max_chars - len(footer)] + footer
+    return chunks
@@ -0,0 +1,185 @@
+# name_index.py
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# 簡體 → 繁體（只收錄食材名稱常用、簡繁寫法不同的字）
+_FOLD_PAIRS = (
+    "鸡雞 鸭鴨 鹅鵝 猪豬 鱼魚 虾蝦 贝貝 蛎蠣 鲑鮭 鳕鱈 鲭鯖 鲔鮪 鳗鰻 鲍鮑 乌烏 龙龍 "
+    "凤鳳 杨楊 柠檸 苹蘋 萝蘿 卜蔔 葱蔥 姜薑 笋筍 芦蘆 荞蕎 麦麥 丝絲 饺餃 馄餛 饨飩 "
+    "馒饅 头頭 饼餅 干乾 面麵 饭飯 汤湯 酱醬 盐鹽 鲜鮮 优優 冻凍 热熱 凉涼 绿綠 红紅 "
+    "黄黃 蓝藍 叶葉 罗羅 兰蘭 莲蓮 荚莢 枣棗 猕獼 颗顆 条條 块塊 两兩 饮飲 烧燒 腊臘 "
+    "肠腸 焖燜 炖燉 卤滷 浆漿 卷捲 丽麗 异異 蕃番 酝醞 酿釀"
+)
+_FOLD_TABLE = str.maketrans({pair[0]: pair[1] for pair in _FOLD_PAIRS.split()})
+
+# 同義詞：每組的第一個是標準名稱（以繁體書寫）
+SYNONYM_GROUPS = [
+    ["馬鈴薯", "土豆", "洋芋"],
+    ["番茄", "西紅柿"],
+    ["優格", "酸奶", "優酪乳"],
+    ["起司", "芝士", "乳酪"],
+    ["吐司", "土司"],
+    ["地瓜", "番薯", "紅薯"],
+    ["高麗菜", "捲心菜", "卷心菜", "包心菜", "甘藍"],
+    ["花椰菜", "西蘭花", "青花菜"],
+    ["奇異果", "獼猴桃"],
+    ["鳳梨", "菠蘿"],
+    ["玉米", "玉蜀黍"],
+    ["鮭魚", "三文魚"],
+    ["豆漿", "豆奶"],
+]
+
+# 名稱相似度的門檻，低於此分數的不列為候選
+MIN_SCORE = 0.5
+
+# 出現在太多名稱中的 n-gram（例如「肉」）不用來擴大候選，只用來縮小候選
+MAX_POSTING = 1000
+
+
+def normalize_name(name: Any) -> str:
+    """正規化食材名稱（全形轉半形、去除空白、英文轉小寫）"""
+    text = unicodedata.normalize("NFKC", str(name or ""))
+    return "".join(text.split()).lower()
+
+
+def fold_name(name) -> str:
+    """正規化名稱後把簡體字轉成繁體"""
+    return normalize_name(name).translate(_FOLD_TABLE)
+
+
+def _build_synonyms() -> Tuple[Dict[str, str], Optional["re.Pattern"]]:
+    aliases = {}
+    for group in SYNONYM_GROUPS:
+        canonical = fold_name(group[0])
+        for alias in group[1:]:
+            aliases[fold_name(alias)] = canonical
+    if not aliases:
+        return aliases, None
+    # 較長的別名優先，避免「土豆」先於「土豆泥」之類的誤判
+    pattern = re.compile("|".join(re.escape(alias) for alias in sorted(aliases, key=len, reverse=True)))
+    return aliases, pattern
+
+
+_ALIASES, _ALIAS_PATTERN = _build_synonyms()
+
+
+def name_key(name) -> str:
+    """比對用的名稱鍵：正規化、簡繁轉換，並把同義詞換成標準名稱"""
+    key = fold_name(name)
+    if _ALIAS_PATTERN is not None:
+        key = _ALIAS_PATTERN.sub(lambda match: _ALIASES[match.group(0)], key)
+    return key
+
+
+def _grams(key: str) -> Set[str]:
+    """字元 unigram 與 bigram（中文食材名稱通常只有 2~4 個字）"""
+    grams = set(key)
+    grams.update(key[i:i + 2] for i in range(len(key) - 1))
+    return grams
+
+
+def similarity(query_key: str, candidate_key: str, query_grams: Set[str] = None,
+               candidate_grams: Set[str] = None) -> float:
+    """兩個名稱鍵的相似度（0~1）
+
+    查詢包含在候選名稱中時（「蛋」與「雞蛋」）至少 0.6，越接近越高；
+    否則為 n-gram 的 Dice 係數。反過來（「蘋果汁」包含「蘋果」）不加分，
+    較長的查詢通常是另一種食材。
+    """
+    if query_key == candidate_key:
+        return 1.0
+    if not query_key or not candidate_key:
+        return 0.0
+    query_grams = query_grams if query_grams is not None else _grams(query_key)
+    candidate_grams = candidate_grams if candidate_grams is not None else _grams(candidate_key)
+    score = 2 * len(query_grams & candidate_grams) / (len(query_grams) + len(candidate_grams))
+    if query_key in candidate_key:
+        score = max(score, 0.6 + 0.4 * len(query_key) / len(candidate_key))
+    return score
+
+
+class NameIndex:
+    """食材名稱的模糊查詢索引
+
+    以名稱鍵（name_key）的字元 n-gram 建立倒排索引，查詢時只對共用 n-gram 的
+    名稱計分，不需要掃描整個庫存。隨每次寫入增量更新；本身不加鎖，
+    由持有它的索引或儲存後端在自己的鎖內呼叫。
+
+    模糊查詢（search）只用來列出候選；lookup 只接受名稱鍵完全相同的名稱
+    （大小寫、全半形、簡繁與同義詞的差異），刪除與修改不會套用到猜測的食材。
+    """
+
+    def __init__(self):
+        self._keys: Dict[int, str] = {}
+        self._by_key: Dict[str, Set[int]] = {}
+        self._grams: Dict[int, Set[str]] = {}
+        self._postings: Dict[str, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def clear(self):
+        self._keys.clear()
+        self._by_key.clear()
+        self._grams.clear()
+        self._postings.clear()
+
+    def add(self, ingredient_id: int, name):
+        """加入或更新一筆名稱"""
+        self.remove(ingredient_id)
+        key = name_key(name)
+        grams = _grams(key)
+        self._keys[ingredient_id] = key
+        self._by_key.setdefault(key, set()).add(ingredient_id)
+        self._grams[ingredient_id] = grams
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(ingredient_id)
+
+    def remove(self, ingredient_id: int):
+        key = self._keys.pop(ingredient_id, None)
+        if key is not None:
+            ids = self._by_key[key]
+            ids.discard(ingredient_id)
+            if not ids:
+                del self._by_key[key]
+        for gram in self._grams.pop(ingredient_id, ()):
+            ids = self._postings.get(gram)
+            if ids is None:
+                continue
+            ids.discard(ingredient_id)
+            if not ids:
+                del self._postings[gram]
+
+    def search(self, query, limit: int = 5) -> List[Tuple[int, float]]:
+        """回傳依相似度排序的 (食材ID, 分數)，同分時 ID 小的在前"""
+        query_key = name_key(query)
+        if not query_key:
+            return []
+        query_grams = _grams(query_key)
+
+        postings = sorted((self._postings[gram] for gram in query_grams if gram in self._postings), key=len)
+        if not postings:
+            return []
+        # 由少到多合併候選；常見的 n-gram 只用來縮小已經過多的候選
+        candidates = set(postings[0])
+        for ids in postings[1:]:
+            if len(ids) <= MAX_POSTING:
+                candidates.update(ids)
+            elif len(candidates) > MAX_POSTING:
+                candidates = (candidates & ids) or candidates
+            else:
+                break
+
+        ranked = []
+        for ingredient_id in candidates:
+            score = similarity(query_key, self._keys[ingredient_id], query_grams, self._grams[ingredient_id])
+            if score >= MIN_SCORE:
+                ranked.append((ingredient_id, score))
+        ranked.sort(key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+    def lookup(self, query) -> Optional[int]:
+        """名稱鍵與查詢完全相同的食材 ID（例如「土豆」對應「馬鈴薯」），有多筆時取 ID 最小的一筆"""
+        ids = self._by_key.get(name_key(query))
+        return min(ids) if ids else None
@@ -0,0 +1,366 @@
+# notifier.py
+import os
+import json
+import time
+import uuid
+import random
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from linebot.models import TextSendMessage
+from linebot.exceptions import LineBotApiError
+
+from line_messaging import LINE_TEXT_MAX_CHARS
+from observability import span
+from sheets_client import RETRYABLE_STATUS, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# LINE multicast 一次最多的收件人數
+MULTICAST_MAX_RECIPIENTS = 500
+
+# 產生 X-Line-Retry-Key（UUID）的命名空間：同一輪、同一批收件人的重試使用相同的 key
+RETRY_KEY_NAMESPACE = uuid.UUID("6f1d7c52-3f0e-4b7a-9a55-2f4c1a8e9b10")
+
+SUBSCRIBE_COMMANDS = {"訂閱提醒", "subscribe"}
+UNSUBSCRIBE_COMMANDS = {"取消提醒", "取消訂閱提醒", "unsubscribe"}
+
+
+class SubscriberRegistry:
+    """到期提醒的訂閱者名單
+
+    保存在本機 JSON 狀態檔（暫存檔 + 原子替換），重啟後仍然存在；
+    同時記錄最後一次送出每日提醒的日期，避免重啟後同一天重複發送，
+    以及當天尚未送達的批次（訊息、收件人與 retry key），重送時只補送這些批次。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        state = self._load_state()
+        self._user_ids: Dict[str, float] = dict(state.get("subscribers", {}))
+        self._last_sent: Optional[str] = state.get("last_sent")
+        self._pending: Optional[Dict[str, Any]] = state.get("pending")
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ 讀取訂閱者名單失敗: {str(e)}")
+            return {}
+
+    def _persist(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"subscribers": self._user_ids, "last_sent": self._last_sent, "pending": self._pending}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self._user_ids)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._user_ids
+
+    def subscribe(self, user_id: str) -> bool:
+        """加入訂閱，已經訂閱時回傳 False"""
+        with self._lock:
+            if user_id in self._user_ids:
+                return False
+            self._user_ids[user_id] = time.time()
+            self._persist()
+            return True
+
+    def unsubscribe(self, user_id: str) -> bool:
+        """取消訂閱，原本沒有訂閱時回傳 False"""
+        with self._lock:
+            if self._user_ids.pop(user_id, None) is None:
+                return False
+            self._persist()
+            return True
+
+    def user_ids(self) -> List[str]:
+        """依訂閱順序回傳所有訂閱者"""
+        with self._lock:
+            return list(self._user_ids)
+
+    @property
+    def last_sent(self) -> Optional[str]:
+        return self._last_sent
+
+    def mark_sent(self, day: date):
+        with self._lock:
+            self._last_sent = day.isoformat()
+            self._pending = None
+            self._persist()
+
+    def pending(self, day: date) -> Optional[Dict[str, Any]]:
+        """day 當天尚未送達的 {"text": 訊息, "batches": [{"key": retry key, "user_ids": [...]}]}"""
+        with self._lock:
+            if not self._pending or self._pending.get("day") != day.isoformat():
+                return None
+            return {"text": self._pending["text"], "batches": list(self._pending["batches"])}
+
+    def set_pending(self, day: date, text: str, batches: List[Dict[str, Any]]):
+        """記錄 day 當天發送失敗的批次，重送時沿用相同的收件人與 retry key"""
+        with self._lock:
+            self._pending = {"day": day.isoformat(), "text": text, "batches": batches}
+            self._persist()
+
+
+def plan_batches(user_ids: List[str], run_key: str) -> List[Dict[str, Any]]:
+    """把收件人依 ID 排序後每 MULTICAST_MAX_RECIPIENTS 人分成一批
+
+    每批的 retry key 由 run_key 與該批收件人決定；重送時沿用第一次的分批與 key，
+    不會因為之間有人訂閱或取消訂閱而改變。
+    """
+    ordered = sorted(set(user_ids))
+    batches = []
+    for start in range(0, len(ordered), MULTICAST_MAX_RECIPIENTS):
+        batch = ordered[start:start + MULTICAST_MAX_RECIPIENTS]
+        key = str(uuid.uuid5(RETRY_KEY_NAMESPACE, f"{run_key}:{','.join(batch)}"))
+        batches.append({"key": key, "user_ids": batch})
+    return batches
+
+
+def build_digest(storage: Any, days: int) -> Optional[str]:
+    """每日到期提醒的訊息內容，沒有即將過期的食材時回傳 None"""
+    expiring = storage.get_expiring_records(days)
+    if not expiring:
+        return None
+
+    header = "🍎 食材過期提醒\n\n"
+    text = header + storage.format_expiring(expiring, days)
+    if len(text) <= LINE_TEXT_MAX_CHARS:
+        return text
+
+    # 超過 LINE 的字數上限時只列出最早到期的部分
+    lines = text.rstrip("\n").split("\n")
+    kept = []
+    length = 0
+    for shown, line in enumerate(lines):
+        footer = f"\n…還有 {len(lines) - shown} 項"
+        if length + len(line) + 1 + len(footer) > LINE_TEXT_MAX_CHARS:
+            return "\n".join(kept) + footer
+        kept.append(line)
+        length += len(line) + 1
+    return "\n".join(kept)
+
+
+class LineMulticaster:
+    """以 LINE multicast 發送同一則訊息給大量用戶
+
+    - 每 MULTICAST_MAX_RECIPIENTS 人一個請求（分批方式見 plan_batches）
+    - 以權杖桶限制每分鐘的請求數
+    - 429 / 5xx / 連線錯誤以指數退避加隨機抖動重試（有 Retry-After 時優先採用）
+    - 每一批帶固定的 X-Line-Retry-Key，重試不會重複發送；LINE 回應 409 且帶有
+      accepted request ID 時表示先前已經送達，視為成功
+    """
+
+    def __init__(self, line_bot_api: Any, requests_per_minute: float = 6000, max_retries: int = 5,
+                 base_delay: float = 1.0, max_delay: float = 60.0,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.line_bot_api = line_bot_api
+        self.bucket = TokenBucket(requests_per_minute, capacity=max(1.0, requests_per_minute / 60), sleep=sleep)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+
+    def send(self, user_ids: List[str], text: str, run_key: str) -> Dict[str, Any]:
+        """分批發送，回傳送達與失敗的人數；run_key 相同的重送會由 LINE 去除重複"""
+        return self.send_batches(plan_batches(user_ids, run_key), text)
+
+    def send_batches(self, batches: List[Dict[str, Any]], text: str) -> Dict[str, Any]:
+        """發送 plan_batches 產生的批次，失敗的批次原樣放在 failed_batches 供重送"""
+        message = TextSendMessage(text=text)
+        result = {"batches": 0, "delivered": 0, "failed": 0, "retries": 0,
+                  "failed_user_ids": [], "failed_batches": []}
+        for batch in batches:
+            recipients = batch["user_ids"]
+            result["batches"] += 1
+            try:
+                result["retries"] += self._send_batch(recipients, message, batch["key"])
+                result["delivered"] += len(recipients)
+            except Exception as e:
+                logger.error(f"❌ LINE multicast 發送失敗（{len(recipients)} 位用戶）: {str(e)}")
+                result["failed"] += len(recipients)
+                result["failed_user_ids"].extend(recipients)
+                result["failed_batches"].append(batch)
+        return result
+
+    def _send_batch(self, batch: List[str], message: TextSendMessage, retry_key: str) -> int:
+        """發送一批，回傳重試次數；無法重試或超過重試次數時拋出例外"""
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            try:
+                with span("line_multicast", recipients=len(batch)):
+                    self.line_bot_api.multicast(batch, message, retry_key=retry_key)
+                return attempt
+            except LineBotApiError as e:
+                if e.status_code == 409 and getattr(e, "accepted_request_id", None):
+                    logger.info(f"ℹ️ LINE 已接受過這一批（retry key {retry_key}），略過重送")
+                    return attempt
+                if e.status_code not in RETRYABLE_STATUS or attempt >= self.max_retries:
+                    raise
+                delay = self._retry_after(e)
+                status = e.status_code
+            except (OSError, IOError) as e:
+                # 連線錯誤（requests 的例外也是 IOError 的子類別）
+                if attempt >= self.max_retries:
+                    raise
+                delay = None
+                status = type(e).__name__
+
+            if delay is None:
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+            attempt += 1
+            logger.warning(f"⚠️ LINE multicast 回應 {status}，{delay:.2f} 秒後第 {attempt} 次重試")
+            self._sleep(delay)
+
+    @staticmethod
+    def _retry_after(error: LineBotApiError) -> Optional[float]:
+        headers = getattr(error, "headers", None) or {}
+        for key, value in headers.items():
+            if key.lower() == "retry-after":
+                try:
+                    return float(value)
+                except (TypeError, ValueError):
+                    return None
+        return None
+
+
+class ExpiryNotifier:
+    """每日到期提醒排程
+
+    每天 notify_time（本機時間，HH:MM）計算一次到期摘要，以 LineMulticaster
+    發給所有訂閱者。已送出的日期記錄在 SubscriberRegistry，重啟後不會重複發送；
+    部分批次失敗時記錄這些批次，retry_interval 秒後只重送它們（沿用原本的訊息、
+    收件人分批與 retry key，其間取消訂閱的用戶不再發送，新訂閱的用戶從隔天開始）。
+    排程只應在一個行程中啟用（NOTIFY_ENABLED）。
+    """
+
+    def __init__(self, registry: SubscriberRegistry, multicaster: LineMulticaster,
+                 storage_getter: Callable[[], Any], notify_time: str = "09:00", days: int = 3,
+                 send_when_empty: bool = False, retry_interval: float = 900.0):
+        self.registry = registry
+        self.multicaster = multicaster
+        self.storage_getter = storage_getter
+        hour, minute = (int(part) for part in notify_time.split(":"))
+        self.notify_at = (hour, minute)
+        self.days = days
+        self.send_when_empty = send_when_empty
+        self.retry_interval = retry_interval
+        self._run_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._retry_at = 0.0
+        self._stats = {
+            'runs': 0,
+            'delivered': 0,
+            'failed': 0,
+            'retries': 0,
+            'last_run_seconds': 0.0,
+            'last_run_at': None,
+            'last_error': None,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._stats, subscribers=len(self.registry), last_sent=self.registry.last_sent)
+
+    def _due_today(self, now: datetime) -> bool:
+        return (now.hour, now.minute) >= self.notify_at and self.registry.last_sent != now.date().isoformat()
+
+    def run_once(self, force: bool = False) -> Dict[str, Any]:
+        """計算今天的摘要並發送；force=True 時不論今天是否已發送過都重新發送"""
+        with self._run_lock:
+            today = date.today()
+            if not force and self.registry.last_sent == today.isoformat():
+                return {"sent": False, "reason": "already_sent"}
+
+            started = time.monotonic()
+            pending = None if force else self.registry.pending(today)
+            if pending is not None:
+                # 只重送上次失敗的批次，key 不變，LINE 其實已收到的批次會回應 409
+                text = pending["text"]
+                batches = []
+                for batch in pending["batches"]:
+                    recipients = [user_id for user_id in batch["user_ids"] if user_id in self.registry]
+                    if recipients:
+                        batches.append({"key": batch["key"], "user_ids": recipients})
+            else:
+                user_ids = self.registry.user_ids()
+                if not user_ids:
+                    self.registry.mark_sent(today)
+                    return {"sent": False, "reason": "no_subscribers"}
+
+                # 摘要只計算一次，所有批次共用同一則訊息
+                text = build_digest(self.storage_getter(), self.days)
+                if text is None:
+                    if not self.send_when_empty:
+                        self.registry.mark_sent(today)
+                        return {"sent": False, "reason": "nothing_expiring"}
+                    text = "✅ 今天沒有即將過期的食材"
+
+                # 手動強制發送是新的一輪，使用新的 run key
+                run_key = f"{today.isoformat()}:{uuid.uuid4() if force else 'daily'}"
+                batches = plan_batches(user_ids, run_key)
+
+            result = self.multicaster.send_batches(batches, text)
+            if result["failed"]:
+                self.registry.set_pending(today, text, result["failed_batches"])
+            else:
+                self.registry.mark_sent(today)
+
+            self._stats['runs'] += 1
+            self._stats['delivered'] += result["delivered"]
+            self._stats['failed'] += result["failed"]
+            self._stats['retries'] += result["retries"]
+            self._stats['last_run_seconds'] = time.monotonic() - started
+            self._stats['last_run_at'] = time.time()
+            self._stats['last_error'] = f"{result['failed']} 位用戶發送失敗" if result["failed"] else None
+            logger.info(f"📣 已發送到期提醒給 {result['delivered']} 位用戶（{result['batches']} 批，"
+                        f"失敗 {result['failed']} 位）")
+            return {"sent": True, **result}
+
+    # ---------- 背景排程 ----------
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="expiry-notifier", daemon=True)
+            self._thread.start()
+            logger.info(f"⏰ 已啟用每日到期提醒（{self.notify_at[0]:02d}:{self.notify_at[1]:02d}）")
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _seconds_until_next(self, now: datetime) -> float:
+        target = now.replace(hour=self.notify_at[0], minute=self.notify_at[1], second=0, microsecond=0)
+        if target <= now:
+            target += timedelta(days=1)
+        return (target - now).total_seconds()
+
+    def _run(self):
+        while not self._stopped:
+            if self._due_today(datetime.now()) and time.monotonic() >= self._retry_at:
+                try:
+                    if self.run_once().get("failed"):
+                        self._retry_at = time.monotonic() + self.retry_interval
+                except Exception as e:
+                    self._stats['last_error'] = str(e)
+                    logger.error(f"❌ 發送到期提醒失敗，稍後重試: {str(e)}")
+                    self._retry_at = time.monotonic() + self.retry_interval
+            # 最多等一分鐘再檢查一次，系統時間調整或休眠後也不會錯過
+            self._wake.wait(timeout=min(self._seconds_until_next(datetime.now()), 60.0))
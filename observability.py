@@ -0,0 +1,359 @@
+# observability.py
+import time
+import uuid
+import logging
+import threading
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+# 延遲（秒）的預設分桶
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """只增不減的計數器"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        return self._values.get(key, 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram:
+    """分桶直方圖（累計分桶、總和與次數）"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values: Dict[Tuple, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels) -> int:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        counts, _ = self._values.get(key, ([0], 0.0))
+        return counts[-1]
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            for bound, count in zip(self.buckets, counts):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {counts[-1]}")
+        return lines
+
+
+# 收集器在輸出時才讀取數值，回傳 (名稱, 類型, 說明, 數值)
+Collector = Callable[[], Iterable[Tuple[str, str, str, float]]]
+
+
+class MetricsRegistry:
+    """指標註冊表，render() 輸出 Prometheus 文字格式"""
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: List[Collector] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for collector in list(self._collectors):
+            try:
+                collected = list(collector())
+            except Exception as e:
+                logger.error(f"❌ 讀取指標失敗: {str(e)}")
+                continue
+            for name, kind, documentation, value in collected:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+SPAN_DURATION = REGISTRY.histogram(
+    "food_agent_span_duration_seconds", "各階段耗時（webhook、agent、llm、tool、sheets）", ["span"])
+ERRORS = REGISTRY.counter(
+    "food_agent_errors_total", "各階段失敗次數", ["span"])
+SHEETS_CALLS_PER_REQUEST = REGISTRY.histogram(
+    "food_agent_sheets_calls_per_request", "每個請求發出的 Google Sheets API 次數", ["root"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50))
+LLM_TOKENS = REGISTRY.counter(
+    "food_agent_llm_tokens_total", "LLM 使用的 token 總數（type=cached 為 prompt 中命中供應商快取的部分）", ["type"])
+LLM_TOKENS_PER_CALL = REGISTRY.histogram(
+    "food_agent_llm_tokens_per_call", "每次 LLM 呼叫使用的 token 數", ["type"],
+    buckets=(100, 250, 500, 1000, 2000, 4000, 8000, 16000))
+AGENT_ITERATIONS = REGISTRY.histogram(
+    "food_agent_agent_iterations", "每則訊息的 Agent LLM 呼叫次數",
+    buckets=(1, 2, 3, 4, 5, 7, 10))
+
+
+# ==================== 追蹤 ====================
+
+class Span:
+    """一段計時區間；根區間結束時輸出整個追蹤的耗時摘要"""
+    __slots__ = ("name", "trace_id", "parent", "attrs", "started", "duration", "error", "children")
+
+    def __init__(self, name: str, trace_id: str, parent: Optional["Span"] = None, **attrs):
+        self.name = name
+        self.trace_id = trace_id
+        self.parent = parent
+        self.attrs = attrs
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.error: Optional[str] = None
+        self.children: List["Span"] = []
+
+    def fail(self, error: str):
+        """標記失敗（例如工具以「❌」字串回報錯誤）"""
+        self.error = error
+
+    def iter_spans(self) -> Iterable["Span"]:
+        yield self
+        for child in self.children:
+            yield from child.iter_spans()
+
+    def summary(self) -> str:
+        text = f"{self.name} {self.duration * 1000:.0f}ms"
+        if self.error:
+            text += " ❌"
+        if self.children:
+            text += " [" + ", ".join(child.summary() for child in self.children) + "]"
+        return text
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("food_agent_span", default=None)
+_trace_id: ContextVar[Optional[str]] = ContextVar("food_agent_trace_id", default=None)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span else _trace_id.get()
+
+
+@contextmanager
+def bind_trace(trace_id: str = None):
+    """設定之後建立的根區間所屬的追蹤 ID（跨背景工作池時沿用 webhook 的 ID）"""
+    token = _trace_id.set(trace_id or new_trace_id())
+    try:
+        yield _trace_id.get()
+    finally:
+        _trace_id.reset(token)
+
+
+def _finish(span: Span):
+    SPAN_DURATION.observe(span.duration, span=span.name)
+    if span.error:
+        ERRORS.inc(span=span.name)
+    if span.parent is not None:
+        span.parent.children.append(span)
+        return
+
+    sheets_calls = sum(1 for s in span.iter_spans() if s.name.startswith("sheets."))
+    SHEETS_CALLS_PER_REQUEST.observe(sheets_calls, root=span.name)
+    if span.children:
+        logger.info(f"🧭 trace {span.trace_id}: {span.summary()}（Sheets 請求 {sheets_calls} 次）")
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """建立計時區間，巢狀使用時自動成為目前區間的子區間"""
+    parent = _current_span.get()
+    trace_id = parent.trace_id if parent else (_trace_id.get() or new_trace_id())
+    current = Span(name, trace_id, parent, **attrs)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.fail(type(e).__name__)
+        raise
+    finally:
+        current.duration = time.perf_counter() - current.started
+        _current_span.reset(token)
+        _finish(current)
+
+
+def record_span(name: str, duration: float, error: str = None, **attrs):
+    """記錄一段已經結束的區間（用於以回呼計時的 LLM 呼叫）"""
+    parent = _current_span.get()
+    finished = Span(name, parent.trace_id if parent else (_trace_id.get() or new_trace_id()), parent, **attrs)
+    finished.duration = duration
+    finished.error = error
+    _finish(finished)
+
+
+def traced(name: str):
+    """以計時區間包裝函式；回傳「❌」開頭的字串時視為失敗"""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name) as current:
+                result = fn(*args, **kwargs)
+                if isinstance(result, str) and result.startswith("❌"):
+                    current.fail("error_reply")
+                return result
+        return wrapper
+    return decorator
+
+
+# ==================== LangChain 回呼 ====================
+
+class AgentMetricsCallback(BaseCallbackHandler):
+    """記錄每次 LLM 呼叫的耗時與 token 數，以及一則訊息的 Agent 迭代次數
+
+    每次 invoke 建立一個新的實例。
+    """
+
+    def __init__(self):
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self._started: Dict[Any, float] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id):
+        with self._lock:
+            self._started[run_id] = time.perf_counter()
+
+    def _elapsed(self, run_id) -> float:
+        with self._lock:
+            started = self._started.pop(run_id, None)
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        prompt_tokens, completion_tokens, cached_tokens = _token_usage(response)
+        with self._lock:
+            self.llm_calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.cached_tokens += cached_tokens
+        LLM_TOKENS.inc(prompt_tokens, type="prompt")
+        LLM_TOKENS.inc(completion_tokens, type="completion")
+        LLM_TOKENS.inc(cached_tokens, type="cached")
+        LLM_TOKENS_PER_CALL.observe(prompt_tokens, type="prompt")
+        LLM_TOKENS_PER_CALL.observe(completion_tokens, type="completion")
+        record_span("llm", self._elapsed(run_id), tokens=prompt_tokens + completion_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self.llm_calls += 1
+        record_span("llm", self._elapsed(run_id), error=type(error).__name__)
+
+    def cached_ratio(self) -> float:
+        """prompt token 中命中快取的比例"""
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+    def finish(self):
+        """一則訊息處理完畢時呼叫，記錄迭代次數"""
+        AGENT_ITERATIONS.observe(self.llm_calls)
+
+
+def _token_usage(response: Any) -> Tuple[int, int, int]:
+    """從 LLMResult 取出 (prompt_tokens, completion_tokens, cached_tokens)"""
+    usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+    if usage:
+        details = usage.get("prompt_tokens_details") or {}
+        return (
+            int(usage.get("prompt_tokens", 0) or 0),
+            int(usage.get("completion_tokens", 0) or 0),
+            int(details.get("cached_tokens", 0) or 0),
+        )
+
+    prompt_tokens = completion_tokens = cached_tokens = 0
+    for generations in getattr(response, "generations", []) or []:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            prompt_tokens += int(metadata.get("input_tokens", 0) or 0)
+            completion_tokens += int(metadata.get("output_tokens", 0) or 0)
+            details = metadata.get("input_token_details") or {}
+            cached_tokens += int(details.get("cache_read", 0) or 0)
+    return prompt_tokens, completion_tokens, cached_tokens
@@ -0,0 +1,146 @@
+# parse_cache.py
+import os
+import json
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """正規化用戶輸入：全形轉半形、合併空白、英文轉小寫"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return " ".join(text.split()).lower()
+
+
+class ParseCache:
+    """文字解析結果的 LRU 快取
+
+    鍵是（正規化文字, 參考日期），因為「明天」這類相對日期每天換算的結果不同。
+    設定 path 時每個新項目附加一行到 JSON Lines 檔，重啟後仍可命中；檔案行數
+    超過容量的兩倍時才以目前的項目重寫（壓縮），寫入成本不隨快取大小成長。
+    載入時丟棄參考日期早於 min_date 的舊項目。
+    """
+
+    def __init__(self, max_size: int = 1024, path: Optional[str] = None):
+        self.max_size = max_size
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 檔案中的行數（包括已被覆蓋或淘汰的項目）
+        self._log_lines = 0
+
+    def _key(self, text: str, reference_date: str) -> Tuple[str, str]:
+        return (normalize_text(text), reference_date)
+
+    def get(self, text: str, reference_date: str) -> Optional[Dict[str, Any]]:
+        """查詢快取，命中時把項目移到最近使用的一端"""
+        key = self._key(text, reference_date)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(value)
+
+    def put(self, text: str, reference_date: str, value: Dict[str, Any]):
+        """寫入快取，超過容量時淘汰最久未使用的項目"""
+        key = self._key(text, reference_date)
+        with self._lock:
+            self._entries[key] = dict(value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            if self.path:
+                if self._log_lines >= 2 * self.max_size:
+                    self._compact()
+                else:
+                    self._append(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        """命中統計"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def load(self, min_date: Optional[str] = None):
+        """從 JSON Lines 檔載入快取（同一個鍵以最後一行為準）"""
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                content = f.read()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.error(f"❌ 讀取解析快取失敗: {str(e)}")
+            return
+
+        if content.lstrip().startswith("["):
+            # 舊版快取檔是整個 JSON 陣列
+            try:
+                items = json.loads(content)
+            except ValueError as e:
+                logger.error(f"❌ 讀取解析快取失敗: {str(e)}")
+                items = []
+        else:
+            items = []
+            for line in content.splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    items.append(json.loads(line))
+                except ValueError:
+                    # 寫到一半就中斷的最後一行
+                    logger.warning(f"⚠️ 略過無法解析的快取記錄: {line[:80]}")
+
+        with self._lock:
+            for item in items:
+                if min_date and item["date"] < min_date:
+                    continue
+                key = (item["text"], item["date"])
+                self._entries[key] = item["value"]
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            # 丟掉過期、重複或舊格式的內容
+            if len(items) != len(self._entries) or content.lstrip().startswith("["):
+                self._compact()
+            else:
+                self._log_lines = len(items)
+        logger.info(f"📥 已載入 {len(self._entries)} 筆解析快取")
+
+    def _append(self, key: Tuple[str, str], value: Dict[str, Any]):
+        """把一個項目附加到檔案結尾（呼叫端需持有鎖）"""
+        text, reference_date = key
+        line = json.dumps({"text": text, "date": reference_date, "value": value}, ensure_ascii=False)
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self._log_lines += 1
+        except OSError as e:
+            logger.error(f"❌ 寫入解析快取失敗: {str(e)}")
+
+    def _compact(self):
+        """以暫存檔 + 原子替換，只寫入目前的項目（呼叫端需持有鎖）"""
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for (text, reference_date), value in self._entries.items():
+                    f.write(json.dumps({"text": text, "date": reference_date, "value": value},
+                                       ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.path)
+            self._log_lines = len(self._entries)
+        except OSError as e:
+            logger.error(f"❌ 寫入解析快取失敗: {str(e)}")
@@ -1,13 +1,18 @@
 # parser_chain.py
 import os
 import logging
+import threading
 from datetime import date, timedelta
+from typing import List
 from pydantic import BaseModel, Field
 from langchain_core.prompts import PromptTemplate
 from langchain.output_parsers import PydanticOutputParser
 from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
 
+from observability import AgentMetricsCallback
+from parse_cache import ParseCache
+
 # Load environment variables
 load_dotenv()
 
@@ -30,50 +35,94 @@ class AddIngredient(BaseModel):
     location: str | None = Field(None, description="冷藏/冷凍/室溫")
     notes: str | None = Field(None, description="其他備註")
 
-parser_struct = PydanticOutputParser(pydantic_object=AddIngredient)
+class AddIngredientList(BaseModel):
+    items: List[AddIngredient] = Field(..., description="輸入中提到的所有食材，每種食材一筆")
+
+parser_struct = PydanticOutputParser(pydantic_object=AddIngredientList)
 
+# 固定的說明與格式在前，每次請求的日期與輸入在後，讓供應商可以快取提示詞前綴
 prompt = PromptTemplate(
     template=(
         "你是食材輸入解析助手，請把使用者輸入轉成結構化JSON。\n"
-        "若有相對日期（明天、後天、下週三），請換算成 YYYY-MM-DD，今天是 {today}。\n"
-        "輸入：{user_text}\n"
-        "{format_instructions}"
+        "輸入可能一次提到多種食材（例如「牛奶兩瓶、雞蛋一盒」），每種食材各輸出一筆到 items。\n"
+        "若有相對日期（明天、後天、下週三），請依下方提供的今天日期換算成 YYYY-MM-DD。\n"
+        "{format_instructions}\n"
+        "今天是 {today}。\n"
+        "輸入：{user_text}"
     ),
-    input_variables=["user_text"],
+    input_variables=["user_text", "today"],
     partial_variables={
         "format_instructions": parser_struct.get_format_instructions(),
-        "today": date.today().isoformat(),
     },
 )
 
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-langchain_chain = prompt | llm | parser_struct
+# LLM 與 chain 在第一次解析時才建立
+_langchain_chain = None
+_langchain_chain_lock = threading.Lock()
 
-def parse_text_to_ingredient(user_text: str) -> AddIngredient:
-    """呼叫 LangChain 解析文字，回傳結構化 AddIngredient 物件"""
+def get_langchain_chain():
+    """獲取解析用的 LangChain chain（延遲初始化，多執行緒下只建立一次）"""
+    global _langchain_chain
+    if _langchain_chain is None:
+        with _langchain_chain_lock:
+            if _langchain_chain is None:
+                llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+                _langchain_chain = prompt | llm | parser_struct
+    return _langchain_chain
+
+# 解析結果快取（設定 PARSER_CACHE_PATH 時寫入磁碟）
+parse_cache = ParseCache(
+    max_size=int(os.getenv("PARSER_CACHE_SIZE", "1024")),
+    path=os.getenv("PARSER_CACHE_PATH") or None,
+)
+parse_cache.load(min_date=date.today().isoformat())
+
+def _reference_date() -> str:
+    """prompt 換算相對日期時使用的「今天」（每次請求重新取得，跨日也正確）"""
+    return date.today().isoformat()
+
+def parse_text_to_ingredients(user_text: str) -> List[AddIngredient]:
+    """呼叫 LangChain 解析文字，一次 LLM 呼叫回傳輸入中所有食材的 AddIngredient 物件"""
     logger.info(f"🔍 收到用戶輸入: '{user_text}'")
     
+    reference_date = _reference_date()
+    cached = parse_cache.get(user_text, reference_date)
+    if cached is not None:
+        logger.info(f"⚡ 解析快取命中: '{user_text}' ({parse_cache.stats()})")
+        # 舊版快取檔中的項目是單一食材
+        return [AddIngredient(**item) for item in cached.get("items", [cached])]
+    
     try:
         # 記錄發送給 GPT 的 prompt
-        formatted_prompt = prompt.format(user_text=user_text)
+        formatted_prompt = prompt.format(user_text=user_text, today=reference_date)
         logger.info(f"📤 發送給 GPT 的 prompt:\n{formatted_prompt}")
         
         # 呼叫 LangChain
         logger.info("🤖 正在呼叫 OpenAI GPT-4o-mini...")
-        result = langchain_chain.invoke({"user_text": user_text})
+        callback = AgentMetricsCallback()
+        result = get_langchain_chain().invoke(
+            {"user_text": user_text, "today": reference_date},
+            config={"callbacks": [callback]}
+        )
         
         # 記錄 GPT 的回應
-        logger.info(f"✅ GPT 解析成功:")
-        logger.info(f"   - 名稱: {result.name}")
-        logger.info(f"   - 數量: {result.quantity}")
-        logger.info(f"   - 單位: {result.unit}")
-        logger.info(f"   - 到期日: {result.expires_at}")
-        logger.info(f"   - 存放位置: {result.location}")
-        logger.info(f"   - 備註: {result.notes}")
+        logger.info(f"✅ GPT 解析成功，共 {len(result.items)} 項食材（tokens {callback.prompt_tokens}+"
+                    f"{callback.completion_tokens}，快取命中 {callback.cached_ratio():.0%}）:")
+        for item in result.items:
+            logger.info(f"   - 名稱: {item.name}，數量: {item.quantity}，單位: {item.unit}，"
+                        f"到期日: {item.expires_at}，存放位置: {item.location}，備註: {item.notes}")
         
-        return result
+        parse_cache.put(user_text, reference_date, result.model_dump())
+        return result.items
         
     except Exception as e:
         logger.error(f"❌ GPT 解析失敗: {str(e)}")
         logger.error(f"   輸入文字: '{user_text}'")
         raise e
+
+def parse_text_to_ingredient(user_text: str) -> AddIngredient:
+    """解析只含一種食材的輸入，回傳第一筆 AddIngredient"""
+    items = parse_text_to_ingredients(user_text)
+    if not items:
+        raise ValueError(f"無法從輸入解析出食材: '{user_text}'")
+    return items[0]
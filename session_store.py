@@ -0,0 +1,107 @@
+# session_store.py
+import time
+import threading
+import logging
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """粗估文字的 token 數：中日韓文字約一字一個 token，其餘約四個字元一個 token"""
+    cjk = sum(1 for ch in text if ord(ch) >= 0x2E80)
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class _Session:
+    __slots__ = ("messages", "tokens", "last_active")
+
+    def __init__(self):
+        self.messages: Deque[Dict[str, str]] = deque()
+        self.tokens = 0
+        self.last_active = time.monotonic()
+
+
+class SessionStore:
+    """依 LINE user_id 保存最近對話的記憶體儲存
+
+    - LRU：超過 max_users 時淘汰最久未使用的用戶
+    - TTL：閒置超過 ttl_seconds 的對話視為過期
+    - 每位用戶最多保留 max_messages 則訊息，且總 token 數不超過 max_tokens
+      （最新一則訊息一定保留）
+
+    get_history 回傳 [{"role": "user" | "assistant", "content": ...}]，
+    可以直接傳給 FoodAgent.process_user_message 的 chat_history。
+    """
+
+    def __init__(self, max_users: int = 5000, ttl_seconds: float = 1800,
+                 max_messages: int = 10, max_tokens: int = 1000):
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _is_expired(self, session: _Session, now: float) -> bool:
+        return now - session.last_active > self.ttl_seconds
+
+    def _evict_expired(self, now: float):
+        """由最久未使用的一端開始移除過期對話"""
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if not self._is_expired(session, now):
+                break
+            del self._sessions[user_id]
+
+    def get_history(self, user_id: str) -> List[Dict[str, str]]:
+        """取得用戶最近的對話紀錄"""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is None:
+                return []
+            if self._is_expired(session, now):
+                del self._sessions[user_id]
+                return []
+            return list(session.messages)
+
+    def append(self, user_id: str, role: str, content: str):
+        """加入一則訊息，並依訊息數與 token 預算裁掉最舊的訊息"""
+        now = time.monotonic()
+        tokens = estimate_tokens(content)
+        with self._lock:
+            self._evict_expired(now)
+
+            session = self._sessions.get(user_id)
+            if session is None:
+                session = self._sessions[user_id] = _Session()
+                while len(self._sessions) > self.max_users:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(user_id)
+
+            session.messages.append({"role": role, "content": content})
+            session.tokens += tokens
+            session.last_active = now
+
+            # 只裁掉較舊的訊息：最新一則即使單獨超過 token 預算也保留
+            while len(session.messages) > 1 and (
+                len(session.messages) > self.max_messages or session.tokens > self.max_tokens
+            ):
+                dropped = session.messages.popleft()
+                session.tokens -= estimate_tokens(dropped["content"])
+
+    def append_turn(self, user_id: str, user_text: str, reply: str):
+        """記錄一輪對話（用戶訊息與助手回覆）"""
+        self.append(user_id, "user", user_text)
+        self.append(user_id, "assistant", reply)
+
+    def clear(self, user_id: str):
+        """清除用戶的對話紀錄"""
+        with self._lock:
+            self._sessions.pop(user_id, None)
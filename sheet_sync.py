@@ -0,0 +1,94 @@
+# sheet_sync.py
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SheetSync:
+    """Google Sheets 的背景增量同步
+
+    有人直接在試算表上編輯時，記憶體索引不會知道。背景執行緒每 interval 秒
+    呼叫 storage.sync()：試算表的修訂資訊沒有變就不讀取任何儲存格，
+    有變更時只讀取 ID 與更新時間欄以及版本不同的列。手動編輯要更新「更新時間」
+    （試算表的 onEdit 程式）才會被同步，沒有更新的編輯可以用 run_once(full=True) 同步。
+    interval 為 0 時不啟動背景執行緒，只能透過 run_once()（/admin/resync）手動同步。
+    """
+
+    def __init__(self, storage: Any, interval: float = 60.0):
+        self.storage = storage
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stopped = False
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {
+            'syncs': 0,
+            'unchanged_syncs': 0,
+            'delta_syncs': 0,
+            'full_syncs': 0,
+            'changed_rows': 0,
+            'failed_syncs': 0,
+            'last_sync_seconds': 0.0,
+            'last_synced_at': None,
+            'last_error': None,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """同步次數、讀取的變更列數與最近一次同步的耗時"""
+        with self._lock:
+            return dict(self._stats, interval_seconds=self.interval)
+
+    def run_once(self, full: bool = False) -> Dict[str, Any]:
+        """立即同步一次並回傳結果，失敗時拋出例外"""
+        started = time.monotonic()
+        try:
+            result = self.storage.sync(full=full)
+        except Exception as e:
+            with self._lock:
+                self._stats['failed_syncs'] += 1
+                self._stats['last_error'] = str(e)
+            raise
+
+        with self._lock:
+            self._stats['syncs'] += 1
+            mode_key = f"{result['mode']}_syncs"
+            if mode_key in self._stats:
+                self._stats[mode_key] += 1
+            self._stats['changed_rows'] += result['changed_rows']
+            self._stats['last_sync_seconds'] = time.monotonic() - started
+            self._stats['last_synced_at'] = time.time()
+            self._stats['last_error'] = None
+        if result['changed_rows']:
+            logger.info(f"🔄 已從 Google Sheets 同步 {result['changed_rows']} 筆變更（{result['mode']}）")
+        return result
+
+    # ---------- 背景同步 ----------
+
+    def start(self):
+        """啟動背景同步執行緒（interval 為 0 時不啟動）"""
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name="sheets-sync", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        delay = self.interval
+        while not self._wake.wait(timeout=delay):
+            try:
+                self.run_once()
+                delay = self.interval
+            except Exception as e:
+                # 失敗時逐步拉長間隔，避免在配額耗盡時持續重試
+                logger.error(f"❌ 同步 Google Sheets 失敗，稍後重試: {str(e)}")
+                delay = min(delay * 2, max(self.interval, 600.0))
+            if self._stopped:
+                return
@@ -0,0 +1,270 @@
+# sheets_client.py
+import time
+import random
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from observability import span
+
+logger = logging.getLogger(__name__)
+
+# 會消耗讀取配額的 gspread Worksheet 方法
+READ_METHODS = {
+    'get_all_records', 'get_all_values', 'get_values', 'get', 'batch_get',
+    'col_values', 'row_values', 'acell', 'cell', 'find', 'findall',
+}
+
+# 會消耗寫入配額的 gspread Worksheet 方法
+WRITE_METHODS = {
+    'append_row', 'append_rows', 'insert_row', 'insert_rows', 'update', 'update_cell',
+    'update_cells', 'batch_update', 'delete_rows', 'clear', 'batch_clear',
+}
+
+# 寫入固定範圍的方法，重複執行結果相同，5xx 時可以直接重試
+IDEMPOTENT_WRITE_METHODS = {'update', 'update_cell', 'update_cells', 'batch_update', 'clear', 'batch_clear'}
+
+# 可以重試的 HTTP 狀態碼
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    """從 gspread APIError（或其他帶 response 的例外）取出 HTTP 狀態碼"""
+    code = getattr(error, 'code', None)
+    if isinstance(code, int):
+        return code
+    response = getattr(error, 'response', None)
+    code = getattr(response, 'status_code', None)
+    return code if isinstance(code, int) else None
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """讀取 Retry-After 標頭（秒）"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """權杖桶限流器，rate_per_minute 為每分鐘補充的權杖數"""
+
+    def __init__(self, rate_per_minute: float, capacity: float = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """取得一個權杖，必要時等待；回傳等待的秒數"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(self._clock())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+
+class _Flight:
+    """進行中的讀取請求，讓相同的並行讀取共用結果"""
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class QuotaAwareWorksheet:
+    """包裝 gspread Worksheet 的配額感知客戶端
+
+    - 讀取與寫入各自使用一個權杖桶限流
+    - 遇到 429 / 5xx 時以指數退避加隨機抖動重試（有 Retry-After 時優先採用）
+    - 新增列、刪除列等不可重複執行的寫入只重試 429（請求未被處理）；5xx 時請求可能
+      已經生效，直接拋出，由呼叫端以 retry_unsafe_write 確認後再重試
+    - 相同參數的並行讀取只發出一次 HTTP 請求（single-flight）
+    - metrics() 回傳限流與重試統計
+
+    其他屬性與方法直接轉交給原本的 worksheet。
+    """
+
+    def __init__(self, worksheet: Any, read_per_minute: float = 60, write_per_minute: float = 60,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 32.0,
+                 sleep: Callable[[float], None] = time.sleep):
+        self._worksheet = worksheet
+        self._buckets = {
+            'read': TokenBucket(read_per_minute, sleep=sleep),
+            'write': TokenBucket(write_per_minute, sleep=sleep),
+        }
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._flights: Dict[tuple, _Flight] = {}
+        self._flights_lock = threading.Lock()
+        self._write_generation = 0
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'read_calls': 0,
+            'write_calls': 0,
+            'coalesced_reads': 0,
+            'throttled_calls': 0,
+            'throttle_wait_seconds': 0.0,
+            'retries': 0,
+            'rate_limited_responses': 0,
+            'server_error_responses': 0,
+            'backoff_seconds': 0.0,
+            'failed_calls': 0,
+        }
+
+    @property
+    def wrapped(self) -> Any:
+        """原本的 gspread Worksheet"""
+        return self._worksheet
+
+    def metrics(self) -> Dict[str, Any]:
+        """限流與重試統計"""
+        with self._metrics_lock:
+            return dict(self._metrics)
+
+    def _count(self, key: str, amount: float = 1):
+        with self._metrics_lock:
+            self._metrics[key] += amount
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._worksheet, name)
+        if not callable(attr):
+            return attr
+        if name in READ_METHODS:
+            return lambda *args, **kwargs: self._read(name, attr, args, kwargs)
+        if name in WRITE_METHODS:
+            return lambda *args, **kwargs: self._write(name, attr, args, kwargs)
+        return attr
+
+    def delete_rows_batch(self, rows: Iterable[int]) -> Any:
+        """以一次 spreadsheets.batchUpdate 請求刪除多列
+
+        由下往上刪除，相鄰的列合併成一個範圍；與 delete_rows 相同，5xx 時不直接重試。
+        """
+        runs: List[List[int]] = []
+        for row in sorted(set(rows), reverse=True):
+            if runs and runs[-1][0] == row + 1:
+                runs[-1][0] = row
+            else:
+                runs.append([row, row])
+        if not runs:
+            return None
+        body = {"requests": [
+            {"deleteDimension": {"range": {
+                "sheetId": self._worksheet.id, "dimension": "ROWS", "startIndex": start - 1, "endIndex": end,
+            }}}
+            for start, end in runs
+        ]}
+        return self._write('delete_rows', self._worksheet.spreadsheet.batch_update, (body,), {})
+
+    def _read(self, name: str, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        # 寫入後開始的讀取不會共用寫入前就已發出的請求
+        key = (name, repr(args), repr(sorted(kwargs.items())), self._write_generation)
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            self._count('coalesced_reads')
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._call('read', name, fn, args, kwargs)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def _write(self, name: str, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        with self._flights_lock:
+            self._write_generation += 1
+        return self._call('write', name, fn, args, kwargs)
+
+    def _call(self, quota: str, name: str, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        """限流後呼叫，可重試的錯誤以指數退避重試"""
+        with span(f"sheets.{name}"):
+            return self._call_with_retry(quota, name, fn, args, kwargs)
+
+    def _call_with_retry(self, quota: str, name: str, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        attempt = 0
+        while True:
+            waited = self._buckets[quota].acquire()
+            if waited:
+                self._count('throttled_calls')
+                self._count('throttle_wait_seconds', waited)
+            self._count(f'{quota}_calls')
+
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                status = _status_code(e)
+                if status not in RETRYABLE_STATUS:
+                    raise
+                if status == 429:
+                    self._count('rate_limited_responses')
+                else:
+                    self._count('server_error_responses')
+                    if quota == 'write' and name not in IDEMPOTENT_WRITE_METHODS:
+                        logger.warning(f"⚠️ Google Sheets {name} 回應 HTTP {status}，寫入可能已生效，不直接重試")
+                        raise
+                if attempt >= self.max_retries:
+                    self._count('failed_calls')
+                    logger.error(f"❌ Google Sheets {name} 重試 {attempt} 次後仍失敗 (HTTP {status})")
+                    raise
+
+                attempt += 1
+                self._backoff(name, status, attempt, _retry_after(e))
+
+    def _backoff(self, name: str, status: int, attempt: int, retry_after: Optional[float]):
+        """第 attempt 次重試前的等待（有 Retry-After 時優先採用）"""
+        delay = retry_after
+        if delay is None:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+        self._count('retries')
+        self._count('backoff_seconds', delay)
+        logger.warning(f"⚠️ Google Sheets {name} 回應 HTTP {status}，{delay:.2f} 秒後第 {attempt} 次重試")
+        self._sleep(delay)
+
+    def retry_unsafe_write(self, name: str, attempt: Callable[[int], Any]) -> Any:
+        """重試不可重複執行的寫入（新增列、刪除列）
+
+        attempt(retry) 執行一次寫入；回應 5xx 時上一次的請求可能已經生效，
+        所以重試時（retry > 0）attempt 必須先讀取試算表確認，還沒生效才再次寫入。
+        """
+        retry = 0
+        while True:
+            try:
+                return attempt(retry)
+            except Exception as e:
+                status = _status_code(e)
+                if status not in RETRYABLE_STATUS or status == 429 or retry >= self.max_retries:
+                    raise
+                retry += 1
+                self._backoff(name, status, retry, _retry_after(e))
@@ -0,0 +1,330 @@
+# sqlite_storage.py
+import os
+import sqlite3
+import logging
+import threading
+from datetime import date, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+
+from ingredient import Ingredient, INGREDIENT_HEADERS, format_date
+from name_index import NameIndex, normalize_name
+from storage_backend import (
+    InventoryStorage, InventoryPage, ConflictError, FIELD_HEADERS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE,
+    new_version, page_sort_key, encode_cursor, decode_cursor,
+)
+
+logger = logging.getLogger(__name__)
+
+# 資料表欄位與 Ingredient 的屬性同名
+COLUMNS = list(INGREDIENT_HEADERS)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingredients (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    quantity REAL,
+    unit TEXT NOT NULL DEFAULT '',
+    expires_at TEXT NOT NULL DEFAULT '',
+    location TEXT NOT NULL DEFAULT '',
+    notes TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL DEFAULT '',
+    updated_at TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_ingredients_name_key ON ingredients(name_key);
+CREATE INDEX IF NOT EXISTS idx_ingredients_expires_at ON ingredients(expires_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+"""
+
+SELECT_COLUMNS = ", ".join(COLUMNS)
+
+
+class SQLiteStorage(InventoryStorage):
+    """本機 SQLite 資料儲存類別
+
+    多個 worker 行程可以共用同一個資料庫檔案：每次寫入都會遞增 meta 表中的
+    庫存版本，PRAGMA data_version 改變（其他連線寫入過）時重新讀取版本並
+    重建名稱索引，查詢快取與 ETag 不會停留在舊的內容。
+    """
+
+    backend_name = "SQLite"
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("SQLITE_PATH", "food_agent.db")
+        self._lock = threading.Lock()
+        self._version = 0
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        if self.path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        # 讓查詢可以用與 Python 相同的規則比對存放位置
+        self.conn.create_function("normalize_name", 1, normalize_name, deterministic=True)
+        # 名稱模糊查詢索引（與資料表同步，寫入交易成功時更新）
+        self._names = NameIndex()
+        self._data_version = None
+        with self._lock:
+            self._sync_version()
+        logger.info(f"✅ 成功連接到 SQLite: {self.path}")
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def _row_to_ingredient(self, row: sqlite3.Row) -> Ingredient:
+        return Ingredient.create(**{column: row[column] for column in COLUMNS})
+
+    def _sync_version(self) -> int:
+        """其他連線寫入過時重新讀取庫存版本並重建名稱索引，回傳目前版本（需持有 self._lock）
+
+        data_version 只在其他連線提交時改變，本連線自己的寫入由 _bump_version 記錄。
+        """
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self._version = self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+            self._names.clear()
+            for row in self.conn.execute("SELECT id, name FROM ingredients"):
+                self._names.add(row['id'], row['name'])
+        return self._version
+
+    def _bump_version(self):
+        """在寫入交易中遞增庫存版本（需持有 self._lock）"""
+        self.conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+        self._version = self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def _query(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def get_records(self) -> List[Ingredient]:
+        """依 ID 順序回傳所有食材記錄"""
+        rows = self._query(f"SELECT {SELECT_COLUMNS} FROM ingredients ORDER BY id")
+        return [self._row_to_ingredient(row) for row in rows]
+
+    def find_ingredient(self, identifier: str) -> Optional[Ingredient]:
+        """依 ID 或名稱查找食材記錄"""
+        identifier = str(identifier).strip()
+        try:
+            rows = self._query(f"SELECT {SELECT_COLUMNS} FROM ingredients WHERE id = ?", (int(identifier),))
+        except ValueError:
+            rows = self._query(
+                f"SELECT {SELECT_COLUMNS} FROM ingredients WHERE name_key = ? ORDER BY id LIMIT 1",
+                (normalize_name(identifier),)
+            )
+            if not rows:
+                with self._lock:
+                    self._sync_version()
+                    ingredient_id = self._names.lookup(identifier)
+                if ingredient_id is not None:
+                    rows = self._query(f"SELECT {SELECT_COLUMNS} FROM ingredients WHERE id = ?", (ingredient_id,))
+        return self._row_to_ingredient(rows[0]) if rows else None
+
+    def search_ingredients(self, query: str, limit: int = 5) -> List[Ingredient]:
+        """依名稱相似度排序的候選食材"""
+        with self._lock:
+            self._sync_version()
+            ranked = self._names.search(query, limit)
+            if not ranked:
+                return []
+            ids = [ingredient_id for ingredient_id, _ in ranked]
+            rows = self.conn.execute(
+                f"SELECT {SELECT_COLUMNS} FROM ingredients WHERE id IN ({', '.join('?' * len(ids))})", ids
+            ).fetchall()
+        ingredients = {row['id']: self._row_to_ingredient(row) for row in rows}
+        return [ingredients[ingredient_id] for ingredient_id in ids if ingredient_id in ingredients]
+
+    def inventory_version(self) -> Optional[int]:
+        with self._lock:
+            return self._sync_version()
+
+    def _find_expiring(self, today: date, days: int) -> List[Tuple[Ingredient, int]]:
+        """以到期日索引做範圍查詢"""
+        until = (today + timedelta(days=days)).isoformat()
+        rows = self._query(
+            f"SELECT {SELECT_COLUMNS} FROM ingredients "
+            f"WHERE expires_at != '' AND expires_at <= ? ORDER BY expires_at, id",
+            (until,)
+        )
+        expiring_soon = []
+        for row in rows:
+            ingredient = self._row_to_ingredient(row)
+            if ingredient.expires_at is not None:
+                expiring_soon.append((ingredient, ingredient.days_left(today)))
+        return expiring_soon
+
+    def list_ingredients(self, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None, location: str = None,
+                         name_prefix: str = None, expiring_first: bool = False) -> InventoryPage:
+        """以游標分頁列出食材：篩選、排序與翻頁都在查詢中完成，只讀取一頁的記錄"""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        after = decode_cursor(cursor, expiring_first) if cursor else None
+
+        conditions, params = [], []
+        if location:
+            conditions.append("normalize_name(location) = ?")
+            params.append(normalize_name(location))
+        if name_prefix:
+            prefix = normalize_name(name_prefix)
+            conditions.append("name_key LIKE ? ESCAPE '\\'")
+            params.append(prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+
+        if expiring_first:
+            sort_key = "(expires_at = ''), expires_at, id"
+            after_condition = "((expires_at = ''), expires_at, id) > (?, ?, ?)"
+        else:
+            sort_key = "id"
+            after_condition = "id > ?"
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        page_where = f"WHERE {' AND '.join(conditions + [after_condition])}" if after else where
+        page_params = params + list(after) if after else params
+        with self._lock:
+            total = self.conn.execute(f"SELECT COUNT(*) FROM ingredients {where}", params).fetchone()[0]
+            remaining = self.conn.execute(
+                f"SELECT COUNT(*) FROM ingredients {page_where}", page_params
+            ).fetchone()[0] if after else total
+            rows = self.conn.execute(
+                f"SELECT {SELECT_COLUMNS} FROM ingredients {page_where} ORDER BY {sort_key} LIMIT ?",
+                page_params + [limit]
+            ).fetchall()
+
+        items = [self._row_to_ingredient(row) for row in rows]
+        next_cursor = encode_cursor(page_sort_key(items[-1], expiring_first)) if items and remaining > limit else None
+        return InventoryPage(items, total, total - remaining, next_cursor)
+
+    def add_ingredient(self, name: str, quantity: float = 1, unit: str = None,
+                       expires_at: str = None, location: str = None, notes: str = None) -> str:
+        """添加食材到 SQLite"""
+        try:
+            current_time = date.today().isoformat()
+            with self._lock, self.conn:
+                cursor = self.conn.execute(
+                    "INSERT INTO ingredients (name, name_key, quantity, unit, expires_at, location, notes, "
+                    "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (name, normalize_name(name), quantity, unit or "", format_date(expires_at),
+                     location or "", notes or "", current_time, new_version())
+                )
+                ingredient_id = cursor.lastrowid
+                self._names.add(ingredient_id, name)
+                self._bump_version()
+
+            logger.info(f"✅ 已添加食材到 SQLite: {name}")
+            return f"✅ 已添加食材: {name} {quantity}{unit or ''} (ID: {ingredient_id})"
+
+        except Exception as e:
+            error_msg = f"❌ 添加食材失敗: {str(e)}"
+            logger.error(error_msg)
+            return error_msg
+
+    def add_ingredients(self, items: List[Dict[str, Any]]) -> str:
+        """一次添加多項食材（單一交易）"""
+        if not items:
+            return "ℹ️ 沒有需要添加的食材"
+
+        try:
+            current_time = date.today().isoformat()
+            version = new_version()
+            ingredient_ids = []
+            with self._lock, self.conn:
+                for item in items:
+                    cursor = self.conn.execute(
+                        "INSERT INTO ingredients (name, name_key, quantity, unit, expires_at, location, notes, "
+                        "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (item['name'], normalize_name(item['name']), item.get('quantity', 1),
+                         item.get('unit') or "", format_date(item.get('expires_at')), item.get('location') or "",
+                         item.get('notes') or "", current_time, version)
+                    )
+                    ingredient_ids.append(cursor.lastrowid)
+                for ingredient_id, item in zip(ingredient_ids, items):
+                    self._names.add(ingredient_id, item['name'])
+                self._bump_version()
+
+            logger.info(f"✅ 已添加 {len(items)} 項食材到 SQLite")
+            return self._format_added(items, ingredient_ids)
+
+        except Exception as e:
+            error_msg = f"❌ 添加食材失敗: {str(e)}"
+            logger.error(error_msg)
+            return error_msg
+
+    def _check_version(self, ingredient_id: int, expected_version: Optional[str]) -> sqlite3.Row:
+        """在交易中確認記錄存在且版本相符，回傳記錄的名稱與版本（需持有 self._lock）"""
+        row = self.conn.execute("SELECT name, updated_at FROM ingredients WHERE id = ?", (ingredient_id,)).fetchone()
+        if row is None:
+            raise LookupError(f"找不到 ID 為 {ingredient_id} 的食材")
+        if expected_version is not None and str(row['updated_at']) != str(expected_version):
+            raise ConflictError(ingredient_id)
+        return row
+
+    def delete_ingredient(self, ingredient_id: int, expected_version: str = None) -> str:
+        """刪除食材"""
+        try:
+            with self._lock, self.conn:
+                name = self._check_version(ingredient_id, expected_version)['name']
+                self.conn.execute("DELETE FROM ingredients WHERE id = ?", (ingredient_id,))
+                self._names.remove(ingredient_id)
+                self._bump_version()
+
+            logger.info(f"✅ 已刪除食材: {name} (ID: {ingredient_id})")
+            return f"✅ 已刪除食材: {name} (ID: {ingredient_id})"
+
+        except ConflictError:
+            raise
+        except LookupError as e:
+            return f"❌ {str(e)}"
+        except Exception as e:
+            error_msg = f"❌ 刪除食材失敗: {str(e)}"
+            logger.error(error_msg)
+            return error_msg
+
+    def update_ingredients(self, updates: Dict[int, Dict[str, Any]],
+                           expected_versions: Dict[int, str] = None) -> str:
+        """批次更新多筆食材（單一交易，版本不符時整筆回滾）"""
+        if not updates:
+            return "ℹ️ 沒有需要更新的食材"
+
+        try:
+            updated_at = new_version()
+            expected_versions = expected_versions or {}
+            with self._lock, self.conn:
+                for ingredient_id, kwargs in updates.items():
+                    self._check_version(ingredient_id, expected_versions.get(ingredient_id))
+                    assignments = []
+                    params = []
+                    for field in FIELD_HEADERS:
+                        if field in kwargs:
+                            assignments.append(f"{field} = ?")
+                            # 到期日統一存成 YYYY-MM-DD，以文字比較做範圍查詢與排序
+                            params.append(format_date(kwargs[field]) if field == 'expires_at' else kwargs[field])
+                    if 'name' in kwargs:
+                        assignments.append("name_key = ?")
+                        params.append(normalize_name(kwargs['name']))
+                    assignments.append("updated_at = ?")
+                    params.append(updated_at)
+
+                    # 找不到或版本不符時拋出例外，離開 with 區塊時回滾整筆交易
+                    self.conn.execute(
+                        f"UPDATE ingredients SET {', '.join(assignments)} WHERE id = ?",
+                        (*params, ingredient_id)
+                    )
+                for ingredient_id, kwargs in updates.items():
+                    if 'name' in kwargs:
+                        self._names.add(ingredient_id, kwargs['name'])
+                self._bump_version()
+
+            ids = ", ".join(str(ingredient_id) for ingredient_id in updates)
+            logger.info(f"✅ 已更新食材 ID: {ids}")
+            return f"✅ 已更新食材 ID: {ids}"
+
+        except ConflictError:
+            raise
+        except LookupError as e:
+            return f"❌ {str(e)}"
+        except Exception as e:
+            error_msg = f"❌ 更新食材失敗: {str(e)}"
+            logger.error(error_msg)
+            return error_msg
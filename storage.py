@@ -0,0 +1,57 @@
+# storage.py
+import os
+import logging
+import threading
+from typing import Optional
+
+from storage_backend import InventoryStorage
+
+logger = logging.getLogger(__name__)
+
+# 創建全局實例（延遲初始化）
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def create_storage(backend: str = None) -> InventoryStorage:
+    """依 STORAGE_BACKEND 環境變數（sheets / sqlite）建立儲存後端"""
+    backend = (backend or os.getenv("STORAGE_BACKEND", "sheets")).strip().lower()
+
+    if backend == "sqlite":
+        from sqlite_storage import SQLiteStorage
+        return SQLiteStorage()
+
+    if backend in ("sheets", "google_sheets"):
+        from google_sheets_storage import get_google_sheets_storage
+        return get_google_sheets_storage()
+
+    raise ValueError(f"不支援的儲存後端: {backend}")
+
+
+def get_storage() -> InventoryStorage:
+    """獲取食材儲存實例（延遲初始化）"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage()
+                logger.info(f"🗄️ 使用儲存後端: {_storage.backend_name}")
+    return _storage
+
+
+def set_storage(storage: InventoryStorage):
+    """替換全局儲存實例（例如基準測試使用假工作表）"""
+    global _storage
+    with _storage_lock:
+        _storage = storage
+
+
+def current_storage() -> Optional[InventoryStorage]:
+    """已建立的儲存實例；尚未建立時回傳 None，不會觸發初始化"""
+    return _storage
+
+
+def close_storage():
+    """關閉已建立的儲存實例（應用程式結束時呼叫）"""
+    if _storage is not None:
+        _storage.close()
@@ -0,0 +1,403 @@
+# storage_backend.py
+import json
+import time
+import base64
+import bisect
+import random
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+from ingredient import Ingredient, INGREDIENT_HEADERS
+from name_index import normalize_name
+
+logger = logging.getLogger(__name__)
+
+# 食材記錄欄位（與 Google Sheets 的標題行相同）
+RECORD_HEADERS = list(INGREDIENT_HEADERS.values())
+
+# 可更新欄位：參數名稱 → 記錄欄位
+FIELD_HEADERS = {
+    'name': '名稱',
+    'quantity': '數量',
+    'unit': '單位',
+    'expires_at': '到期日',
+    'location': '存放位置',
+    'notes': '備註',
+}
+
+# 記錄版本：每次寫入都會更新的「更新時間」欄位
+VERSION_HEADER = '更新時間'
+
+# 版本衝突時重新讀取並重試的次數
+MAX_CONFLICT_RETRIES = 3
+
+# 衝突重試前的基本等待秒數（每次加倍並加入隨機抖動，避免同時重試再次衝突）
+CONFLICT_BACKOFF_SECONDS = 0.02
+
+# 食材列表每頁的預設與最大筆數（避免單一回覆超過 LINE 的字數上限或塞滿 LLM 的上下文）
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# 即將過期查詢的結果最多快取幾種 days（超過時移除最久沒用到的）
+EXPIRING_CACHE_SIZE = 16
+
+
+@dataclass
+class InventoryPage:
+    """食材列表的一頁
+
+    offset 是這一頁之前（符合篩選條件）的筆數，用來延續編號；
+    next_cursor 為 None 表示已經是最後一頁。
+    """
+    items: List[Ingredient]
+    total: int
+    offset: int
+    next_cursor: Optional[str]
+
+
+def page_sort_key(ingredient: Ingredient, expiring_first: bool) -> tuple:
+    """列表的排序鍵：預設依 ID，expiring_first 時依到期日（沒有到期日的排最後）再依 ID"""
+    if not expiring_first:
+        return (ingredient.id,)
+    expires_at = ingredient.expires_at
+    return (int(expires_at is None), expires_at.isoformat() if expires_at else "", ingredient.id)
+
+
+def encode_cursor(sort_key: tuple) -> str:
+    """把上一頁最後一筆的排序鍵編碼成游標"""
+    data = json.dumps(list(sort_key), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, expiring_first: bool) -> tuple:
+    """解析游標，格式錯誤或與排序方式不符時拋出 ValueError"""
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(data)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"無效的分頁游標：{cursor}") from e
+    if expiring_first:
+        valid = (isinstance(key, list) and len(key) == 3 and key[0] in (0, 1)
+                 and isinstance(key[1], str) and isinstance(key[2], int))
+    else:
+        valid = isinstance(key, list) and len(key) == 1 and isinstance(key[0], int)
+    if not valid:
+        raise ValueError(f"無效的分頁游標：{cursor}")
+    return tuple(key)
+
+
+def new_version() -> str:
+    """新的記錄版本（精確到微秒的更新時間）"""
+    return datetime.now().isoformat(sep=" ", timespec="microseconds")
+
+
+def conflict_backoff(attempt: int):
+    """版本衝突後、重新讀取前的等待"""
+    time.sleep(random.uniform(0, CONFLICT_BACKOFF_SECONDS * (2 ** attempt)))
+
+
+class ConflictError(Exception):
+    """寫入時記錄的版本與讀取時不同（已被其他寫入者修改）"""
+
+    def __init__(self, ingredient_id: int):
+        self.ingredient_id = ingredient_id
+        super().__init__(f"食材 ID {ingredient_id} 已被其他寫入者修改")
+
+
+class InventoryStorage(ABC):
+    """食材儲存後端介面
+
+    子類別實作基本的讀寫操作（記錄以 Ingredient 表示），
+    列表、過期檢查與減少數量等組合操作由這裡共用。
+    所有對外方法都回傳給用戶看的訊息字串，失敗時以「❌」開頭。
+
+    delete_ingredient / update_ingredients 可以帶入讀取時的版本（Ingredient.updated_at），
+    寫入時版本不同會拋出 ConflictError，由呼叫端重新讀取後重試。
+    """
+
+    backend_name = ""
+
+    def _check_ready(self) -> Optional[str]:
+        """後端無法使用時回傳錯誤訊息"""
+        return None
+
+    def close(self):
+        """釋放資源（例如寫完尚未寫入的變更），預設不做任何事"""
+
+    def warm_up(self) -> Optional[str]:
+        """預先連線並載入庫存（/readyz 使用），後端無法使用時回傳錯誤訊息"""
+        error = self._check_ready()
+        if error:
+            return error
+        self.get_records()
+        return None
+
+    @abstractmethod
+    def get_records(self) -> List[Ingredient]:
+        """回傳所有食材記錄"""
+
+    @abstractmethod
+    def find_ingredient(self, identifier: str) -> Optional[Ingredient]:
+        """依 ID 或名稱查找食材記錄；名稱只接受正規化後相同的寫法（簡繁、同義詞），不做模糊比對"""
+
+    def search_ingredients(self, query: str, limit: int = 5) -> List[Ingredient]:
+        """依名稱相似度排序的候選食材，預設不支援模糊查詢"""
+        return []
+
+    def not_found_message(self, identifier: str) -> str:
+        """找不到食材時的訊息，附上名稱相近的候選讓用戶（或 Agent）直接選擇"""
+        message = f"❌ 找不到食材：{identifier}"
+        try:
+            candidates = self.search_ingredients(str(identifier).strip())
+        except Exception as e:
+            logger.error(f"❌ 查詢相近食材失敗: {str(e)}")
+            candidates = []
+        if candidates:
+            message += "\n你是不是要找：" + "、".join(
+                f"{ingredient.name} (ID: {ingredient.id})" for ingredient in candidates
+            )
+        return message
+
+    @abstractmethod
+    def add_ingredient(self, name: str, quantity: float = 1, unit: str = None,
+                       expires_at: str = None, location: str = None, notes: str = None) -> str:
+        """添加食材"""
+
+    def add_ingredients(self, items: List[Dict[str, Any]]) -> str:
+        """一次添加多項食材，items 的欄位與 add_ingredient 的參數相同
+
+        預設逐筆呼叫 add_ingredient，後端可覆寫為單次批次寫入。
+        """
+        if not items:
+            return "ℹ️ 沒有需要添加的食材"
+        results = [self.add_ingredient(**item) for item in items]
+        return "\n".join(results)
+
+    @staticmethod
+    def _format_added(items: List[Dict[str, Any]], ingredient_ids: List[int]) -> str:
+        """批次添加成功的回覆訊息"""
+        lines = [f"✅ 已添加 {len(items)} 項食材:"]
+        for item, ingredient_id in zip(items, ingredient_ids):
+            lines.append(f"- {item['name']} {item.get('quantity', 1)}{item.get('unit') or ''} (ID: {ingredient_id})")
+        return "\n".join(lines)
+
+    @abstractmethod
+    def delete_ingredient(self, ingredient_id: int, expected_version: str = None) -> str:
+        """刪除食材；expected_version 與目前版本不同時拋出 ConflictError"""
+
+    @abstractmethod
+    def update_ingredients(self, updates: Dict[int, Dict[str, Any]],
+                           expected_versions: Dict[int, str] = None) -> str:
+        """批次更新多筆食材，格式為 {食材ID: {'quantity': 2, ...}}
+
+        expected_versions（{食材ID: 版本}）中的版本與目前版本不同時拋出 ConflictError，
+        不會寫入任何欄位。
+        """
+
+    def update_ingredient(self, ingredient_id: int, expected_version: str = None, **kwargs) -> str:
+        """更新食材資訊"""
+        expected_versions = {ingredient_id: expected_version} if expected_version is not None else None
+        return self.update_ingredients({ingredient_id: kwargs}, expected_versions)
+
+    def inventory_version(self) -> Optional[int]:
+        """庫存版本號，每次變更都會改變；回傳 None 表示不快取查詢結果"""
+        return None
+
+    def _find_expiring(self, today: date, days: int) -> List[Tuple[Ingredient, int]]:
+        """找出 days 天內到期的食材，預設實作為線性掃描"""
+        expiring_soon = []
+        for ingredient in self.get_records():
+            days_left = ingredient.days_left(today)
+            if days_left is not None and days_left <= days:
+                expiring_soon.append((ingredient, days_left))
+        expiring_soon.sort(key=lambda item: (item[0].expires_at, item[0].id))
+        return expiring_soon
+
+    def get_expiring_records(self, days: int = 3, location: str = None) -> List[Tuple[Ingredient, int]]:
+        """回傳 (記錄, 剩餘天數)，結果快取到日期改變或庫存變更為止
+
+        快取最多保留 EXPIRING_CACHE_SIZE 種 days，超過時移除最久沒用到的。
+        location 只保留存放位置相符的食材（在快取的結果上過濾）。
+        """
+        today = date.today()
+        version = self.inventory_version()
+        if version is None:
+            expiring = self._find_expiring(today, days)
+        else:
+            cache = getattr(self, '_expiring_cache', None)
+            if cache is None or cache[0] != (today, version):
+                cache = ((today, version), OrderedDict())
+                self._expiring_cache = cache
+
+            results = cache[1]
+            if days in results:
+                results.move_to_end(days)
+            else:
+                results[days] = self._find_expiring(today, days)
+                while len(results) > EXPIRING_CACHE_SIZE:
+                    results.popitem(last=False)
+            expiring = results[days]
+
+        if location:
+            location = normalize_name(location)
+            expiring = [item for item in expiring if normalize_name(item[0].location) == location]
+        return expiring
+
+    @staticmethod
+    def format_expiring(expiring: List[Tuple[Ingredient, int]], days: int) -> str:
+        """即將過期食材的回覆訊息"""
+        if not expiring:
+            return "✅ 沒有即將過期的食材"
+
+        lines = [f"⚠️ 即將過期的食材 (未來{days}天內):"]
+        lines.extend(f"- {ingredient.name} 還有 {days_left} 天到期" for ingredient, days_left in expiring)
+        return "\n".join(lines) + "\n"
+
+    def list_ingredients(self, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None, location: str = None,
+                         name_prefix: str = None, expiring_first: bool = False) -> InventoryPage:
+        """以游標分頁列出食材
+
+        location 只保留存放位置相符的食材，name_prefix 只保留名稱以它開頭的食材
+        （兩者都先正規化）；expiring_first 時依到期日排序。
+        cursor 是上一頁回傳的 next_cursor，編碼了上一頁最後一筆的排序鍵，
+        翻頁期間有新增或刪除也不會重複或漏掉其他食材。
+
+        預設在 get_records() 的結果上篩選與排序，後端可覆寫為直接查詢。
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        after = decode_cursor(cursor, expiring_first) if cursor else None
+
+        location = normalize_name(location) if location else None
+        prefix = normalize_name(name_prefix) if name_prefix else None
+        keyed = []
+        for ingredient in self.get_records():
+            if location is not None and normalize_name(ingredient.location) != location:
+                continue
+            if prefix is not None and not normalize_name(ingredient.name).startswith(prefix):
+                continue
+            keyed.append((page_sort_key(ingredient, expiring_first), ingredient))
+        keyed.sort(key=lambda item: item[0])
+
+        start = bisect.bisect_right([key for key, _ in keyed], after) if after is not None else 0
+        page = keyed[start:start + limit]
+        next_cursor = encode_cursor(page[-1][0]) if page and start + limit < len(keyed) else None
+        return InventoryPage([ingredient for _, ingredient in page], len(keyed), start, next_cursor)
+
+    @staticmethod
+    def format_page(page: InventoryPage, title: str = "📦 食材庫存列表") -> str:
+        """食材列表一頁的回覆訊息，還有下一頁時附上游標"""
+        if page.total == 0:
+            return "📦 沒有符合條件的食材"
+        if not page.items:
+            return "📦 已經沒有更多食材了"
+
+        first = page.offset + 1
+        last = page.offset + len(page.items)
+        lines = [f"{title} (第 {first}-{last} 項，共 {page.total} 項):"]
+        lines.extend(
+            f"{i}. {ingredient.name} {ingredient.quantity_text}{ingredient.unit} "
+            f"(到期: {ingredient.expires_at_text}, 存放: {ingredient.location})"
+            for i, ingredient in enumerate(page.items, first)
+        )
+        if page.next_cursor:
+            lines.append(f"➡️ 還有 {page.total - last} 項，回覆「下一頁」繼續查看 (cursor: {page.next_cursor})")
+        return "\n".join(lines) + "\n"
+
+    def get_ingredient_list(self, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None, location: str = None,
+                            name_prefix: str = None, expiring_first: bool = False) -> str:
+        """獲取食材列表（一頁）"""
+        error = self._check_ready()
+        if error:
+            return error
+
+        try:
+            page = self.list_ingredients(limit=limit, cursor=cursor, location=location,
+                                         name_prefix=name_prefix, expiring_first=expiring_first)
+            if page.total == 0 and not (location or name_prefix):
+                return "📦 目前沒有食材庫存"
+
+            logger.info(f"✅ 從 {self.backend_name} 獲取 {len(page.items)}/{page.total} 筆食材記錄")
+            return self.format_page(page)
+
+        except ValueError as e:
+            return f"❌ {str(e)}"
+
+        except Exception as e:
+            error_msg = f"❌ 獲取食材列表失敗: {str(e)}"
+            logger.error(error_msg)
+            return error_msg
+
+    def check_expiring_ingredients(self, days: int = 3) -> str:
+        """檢查即將過期的食材"""
+        error = self._check_ready()
+        if error:
+            return error
+
+        try:
+            expiring_soon = self.get_expiring_records(days)
+            logger.info(f"✅ 檢查到 {len(expiring_soon)} 項即將過期的食材")
+            return self.format_expiring(expiring_soon, days)
+
+        except Exception as e:
+            error_msg = f"❌ 檢查過期食材失敗: {str(e)}"
+            logger.error(error_msg)
+            return error_msg
+
+    def reduce_ingredient_quantity(self, identifier: str, amount: float) -> str:
+        """減少食材數量，數量變為 0 時刪除該食材
+
+        以讀取時的版本寫入，其他寫入者先修改時重新讀取最新數量再計算。
+        """
+        error = self._check_ready()
+        if error:
+            return error
+
+        try:
+            for attempt in range(MAX_CONFLICT_RETRIES + 1):
+                target = self.find_ingredient(identifier)
+                if not target:
+                    return self.not_found_message(identifier)
+
+                ingredient_id = target.id
+                name = target.name
+                version = target.updated_at
+
+                # 獲取當前數量
+                current_quantity = target.quantity
+                new_quantity = current_quantity - amount
+
+                if new_quantity < 0:
+                    return f"❌ 無法減少 {amount} 個，當前只有 {current_quantity} 個 {name}"
+
+                try:
+                    if new_quantity == 0:
+                        # 如果數量變為0，直接刪除該食材
+                        result = self.delete_ingredient(ingredient_id, expected_version=version)
+                    else:
+                        # 更新數量
+                        result = self.update_ingredient(ingredient_id, expected_version=version, quantity=new_quantity)
+                except ConflictError:
+                    logger.warning(f"⚠️ 食材 {name} 已被其他寫入者修改，重新讀取後重試（第 {attempt + 1} 次）")
+                    conflict_backoff(attempt)
+                    continue
+
+                if result.startswith("❌"):
+                    return result
+
+                if new_quantity == 0:
+                    logger.info(f"✅ 已完全刪除食材: {name}")
+                    return f"✅ 已完全刪除食材: {name}"
+
+                logger.info(f"✅ 已減少食材數量: {name} 從 {current_quantity} 減少到 {new_quantity}")
+                return f"✅ 已減少食材數量: {name} 從 {current_quantity} 減少到 {new_quantity}"
+
+            return f"❌ 食材 {identifier} 同時被多次修改，請稍後再試"
+
+        except Exception as e:
+            error_msg = f"❌ 減少食材數量失敗: {str(e)}"
+            logger.error(error_msg)
+            return error_msg
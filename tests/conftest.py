@@ -0,0 +1,77 @@
+# tests/conftest.py
+import os
+import sys
+from datetime import date
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from storage_backend import RECORD_HEADERS
+
+# 預設庫存：蘋果 / 豬肉 / 雞蛋 / 牛奶（ID 1~4）
+INVENTORY = [
+    ("蘋果", 5, "顆", "冷藏"),
+    ("豬肉", 1, "盒", "冷凍"),
+    ("雞蛋", 12, "顆", "冷藏"),
+    ("牛奶", 1, "瓶", "冷藏"),
+]
+
+
+def sheet_rows(items=INVENTORY):
+    """試算表內容（含標題列）"""
+    today = date.today().isoformat()
+    rows = [list(RECORD_HEADERS)]
+    for i, (name, quantity, unit, location) in enumerate(items, 1):
+        rows.append([i, name, quantity, unit, "", location, "", today, f"{today} 00:00:0{i}"])
+    return rows
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    """每個測試使用自己的狀態檔，關閉背景同步與延遲寫入，不限制 Sheets 請求速率"""
+    monkeypatch.setenv("ID_STATE_FILE", str(tmp_path / "ids.json"))
+    monkeypatch.setenv("SHEETS_SYNC_INTERVAL", "0")
+    monkeypatch.setenv("SHEETS_WRITE_BEHIND", "false")
+    monkeypatch.setenv("WRITE_BEHIND_JOURNAL", str(tmp_path / "journal.jsonl"))
+    monkeypatch.setenv("SHEETS_READ_PER_MINUTE", "1000000")
+    monkeypatch.setenv("SHEETS_WRITE_PER_MINUTE", "1000000")
+
+
+@pytest.fixture
+def sqlite_storage(tmp_path):
+    from sqlite_storage import SQLiteStorage
+
+    storage = SQLiteStorage(str(tmp_path / "food_agent.db"))
+    storage.add_ingredients([
+        {"name": name, "quantity": quantity, "unit": unit, "location": location}
+        for name, quantity, unit, location in INVENTORY
+    ])
+    yield storage
+    storage.close()
+
+
+@pytest.fixture
+def worksheet():
+    pytest.importorskip("gspread")
+    from fake_sheets import FakeWorksheet
+
+    return FakeWorksheet(sheet_rows())
+
+
+@pytest.fixture
+def sheets_storage(worksheet):
+    from google_sheets_storage import GoogleSheetsStorage
+
+    storage = GoogleSheetsStorage(worksheet=worksheet, write_behind=False, sync_interval=0)
+    storage.worksheet.base_delay = 0
+    yield storage
+    storage.close()
+
+
+@pytest.fixture(params=["sqlite", "sheets"])
+def storage(request):
+    """兩種儲存後端各跑一次"""
+    return request.getfixturevalue(f"{request.param}_storage")
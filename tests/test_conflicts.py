@@ -0,0 +1,61 @@
+# tests/test_conflicts.py
+import pytest
+
+
+def interfere_once(monkeypatch, storage, change):
+    """第一次查找食材後、寫入前，讓另一個寫入者先修改記錄"""
+    find_ingredient = storage.find_ingredient
+    calls = []
+
+    def find_then_interfere(identifier):
+        target = find_ingredient(identifier)
+        if not calls:
+            change()
+        calls.append(identifier)
+        return target
+
+    monkeypatch.setattr(storage, "find_ingredient", find_then_interfere)
+    return calls
+
+
+def test_reduce_retries_on_concurrent_update(storage, monkeypatch):
+    calls = interfere_once(monkeypatch, storage, lambda: storage.update_ingredient(1, quantity=10))
+
+    assert storage.reduce_ingredient_quantity("蘋果", 2) == "✅ 已減少食材數量: 蘋果 從 10.0 減少到 8.0"
+    assert len(calls) == 2
+    assert storage.find_ingredient("1").quantity == 8
+
+
+def test_stale_write_raises_conflict_error(storage):
+    from storage_backend import ConflictError
+
+    stale = storage.find_ingredient("1")
+    storage.update_ingredient(1, quantity=10)
+    with pytest.raises(ConflictError):
+        storage.update_ingredient(1, expected_version=stale.updated_at, quantity=1)
+    with pytest.raises(ConflictError):
+        storage.delete_ingredient(1, expected_version=stale.updated_at)
+    assert storage.find_ingredient("1").quantity == 10
+
+
+def test_hand_edit_on_the_sheet_is_detected_before_writing(sheets_storage, worksheet, monkeypatch):
+    def hand_edit():
+        worksheet.rows[1][2] = 30
+        worksheet.rows[1][8] = "2099-01-01 00:00:00.000"
+
+    interfere_once(monkeypatch, sheets_storage, hand_edit)
+
+    assert sheets_storage.reduce_ingredient_quantity("蘋果", 2) == "✅ 已減少食材數量: 蘋果 從 30.0 減少到 28.0"
+    assert worksheet.rows[1][2] == 28
+
+
+def test_update_tool_retries_on_concurrent_update(storage, monkeypatch):
+    pytest.importorskip("langchain")
+    import storage as storage_module
+    import tools
+
+    monkeypatch.setattr(storage_module, "_storage", storage)
+    interfere_once(monkeypatch, storage, lambda: storage.update_ingredient(1, location="冷凍"))
+
+    assert tools.update_ingredient("蘋果", location="室溫").startswith("✅ 已修改食材: 蘋果")
+    assert storage.find_ingredient("1").location == "室溫"
@@ -0,0 +1,71 @@
+# tests/test_expiring_api.py
+import os
+from datetime import date, timedelta
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+pytest.importorskip("langchain")
+
+from fastapi.testclient import TestClient
+
+import storage
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path, sqlite_storage):
+    """以 SQLite 庫存啟動 API（匯入 app 時需要 LINE 的設定，日誌寫到暫存目錄）"""
+    monkeypatch.setenv("LINE_CHANNEL_SECRET", os.getenv("LINE_CHANNEL_SECRET", "test-secret"))
+    monkeypatch.setenv("LINE_CHANNEL_ACCESS_TOKEN", os.getenv("LINE_CHANNEL_ACCESS_TOKEN", "test-token"))
+    monkeypatch.chdir(tmp_path)
+    import app
+
+    monkeypatch.setattr(storage, "_storage", sqlite_storage)
+    monkeypatch.setitem(app._expiring_responses, "state", None)
+    return TestClient(app.app)
+
+
+def test_response_carries_an_etag(client):
+    response = client.get("/api/expiring-ingredients", params={"days": 3})
+    assert response.status_code == 200
+    assert response.headers["ETag"].startswith('"')
+    body = response.json()
+    assert body["success"] is True
+    assert body["days"] == 3
+
+
+def test_matching_if_none_match_returns_304(client):
+    etag = client.get("/api/expiring-ingredients").headers["ETag"]
+
+    response = client.get("/api/expiring-ingredients", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert client.get("/api/expiring-ingredients", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+
+
+def test_etag_changes_with_inventory_and_query(client, sqlite_storage):
+    etag = client.get("/api/expiring-ingredients", params={"days": 3}).headers["ETag"]
+    assert client.get("/api/expiring-ingredients", params={"days": 3, "location": "冷凍"}).headers["ETag"] != etag
+
+    tomorrow = (date.today() + timedelta(days=1)).isoformat()
+    sqlite_storage.add_ingredient("香蕉", 3, "根", expires_at=tomorrow, location="室溫")
+    response = client.get("/api/expiring-ingredients", params={"days": 3}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert [item["name"] for item in response.json()["items"]] == ["香蕉"]
+
+
+@pytest.mark.parametrize("days", [-1, 366, 10 ** 9])
+def test_days_out_of_range_is_rejected(client, days):
+    assert client.get("/api/expiring-ingredients", params={"days": days}).status_code == 422
+
+
+def test_cached_responses_are_bounded(client):
+    import app
+    from storage_backend import EXPIRING_CACHE_SIZE
+
+    for days in range(app.EXPIRING_RESPONSES_MAX + 10):
+        assert client.get("/api/expiring-ingredients", params={"days": days}).status_code == 200
+    assert len(app._expiring_responses["responses"]) == app.EXPIRING_RESPONSES_MAX
+    assert len(storage.get_storage()._expiring_cache[1]) == EXPIRING_CACHE_SIZE
@@ -0,0 +1,43 @@
+# tests/test_id_allocator.py
+import multiprocessing
+
+from id_allocator import IdAllocator
+
+
+def allocate_many(state_path, rounds):
+    allocator = IdAllocator(state_path, "sheet")
+    allocator.seed(0)
+    ids = []
+    for i in range(rounds):
+        ids.extend(allocator.allocate(1 + i % 3))
+    return ids
+
+
+def test_allocators_sharing_a_state_file_never_repeat(tmp_path):
+    state_path = str(tmp_path / "ids.json")
+    first = IdAllocator(state_path, "sheet")
+    second = IdAllocator(state_path, "sheet")
+    first.seed(4)
+    second.seed(4)
+
+    assert first.allocate(2) == [5, 6]
+    assert second.allocate(1) == [7]
+    assert first.next_id() == 8
+
+
+def test_seed_keeps_the_highest_mark(tmp_path):
+    state_path = str(tmp_path / "ids.json")
+    IdAllocator(state_path, "sheet").allocate(10)
+    allocator = IdAllocator(state_path, "sheet")
+    allocator.seed(3)
+    assert allocator.next_id() == 11
+
+
+def test_worker_processes_never_repeat(tmp_path):
+    state_path = str(tmp_path / "ids.json")
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        results = pool.starmap(allocate_many, [(state_path, 50)] * 4)
+
+    ids = [ingredient_id for result in results for ingredient_id in result]
+    assert len(ids) == len(set(ids)) == 4 * sum(1 + i % 3 for i in range(50))
+    assert max(ids) == len(ids)
@@ -0,0 +1,42 @@
+# tests/test_intent_router.py
+import pytest
+
+pytest.importorskip("langchain")
+
+import storage
+from intent_router import match_intent
+
+
+@pytest.fixture(autouse=True)
+def inventory(monkeypatch, sqlite_storage):
+    """減少數量的單位檢查會查詢庫存：牛奶以「瓶」、雞蛋以「顆」記錄"""
+    monkeypatch.setattr(storage, "_storage", sqlite_storage)
+
+
+@pytest.mark.parametrize("text", [
+    "吃了三分之一的蛋糕",
+    "用掉2分之1瓶牛奶",
+    "吃了3顆",
+    "喝了半瓶",
+    "刪除個",
+    "喝了500ml牛奶",
+    "吃了半盒雞蛋",
+    "吃了2個蘋果",
+])
+def test_unclear_messages_go_to_the_agent(text):
+    assert match_intent(text) is None
+
+
+@pytest.mark.parametrize("text, tool_name, tool_input", [
+    ("吃了3顆雞蛋", "reduce_ingredient_quantity", {"identifier": "雞蛋", "amount": 3.0}),
+    ("喝了半瓶牛奶", "reduce_ingredient_quantity", {"identifier": "牛奶", "amount": 0.5}),
+    ("用了1盒豬肉", "reduce_ingredient_quantity", {"identifier": "豬肉", "amount": 1.0}),
+    ("刪除 5", "delete_ingredient", {"identifier": 5}),
+    ("把香蕉全部吃完了", "delete_ingredient", {"identifier": "香蕉"}),
+    ("查看庫存", "get_ingredient_list", {}),
+])
+def test_clear_commands_use_the_fast_path(text, tool_name, tool_input):
+    intent = match_intent(text)
+    assert intent is not None
+    assert intent.tool_name == tool_name
+    assert intent.tool_input == tool_input
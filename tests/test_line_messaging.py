@@ -0,0 +1,49 @@
+# tests/test_line_messaging.py
+import pytest
+
+pytest.importorskip("linebot")
+
+from linebot import LineBotApi
+from linebot.models import TextSendMessage
+
+from fake_line_server import FakeLineServer
+from line_messaging import SessionHttpClient, split_text
+
+
+def test_session_client_sends_through_one_session():
+    with FakeLineServer() as server:
+        api = LineBotApi("fake-token", endpoint=server.url, http_client=SessionHttpClient)
+        assert api.http_client.connect(server.url, timeout=1)
+
+        api.push_message("U1", TextSendMessage(text="a"))
+        api.push_message("U2", TextSendMessage(text="b"))
+
+    assert dict(server.delivered) == {"U1": 1, "U2": 1}
+
+
+def test_connect_failure_is_reported_not_raised():
+    with FakeLineServer() as server:
+        url = server.url
+    assert SessionHttpClient().connect(url, timeout=0.5) is False
+
+
+def test_text_at_the_limit_stays_one_message():
+    assert split_text("a" * 10, max_chars=10) == ["a" * 10]
+    assert split_text("a" * 10 + "\n", max_chars=10) == ["a" * 10]
+
+
+def test_lines_are_kept_whole_when_they_fit():
+    text = "\n".join(["a" * 4, "b" * 4, "c" * 4])
+    assert split_text(text, max_chars=9) == ["a" * 4 + "\n" + "b" * 4, "c" * 4]
+
+
+def test_long_line_is_cut_without_empty_messages():
+    chunks = split_text("x" * 20 + "\nend", max_chars=10)
+    assert chunks == ["x" * 10, "x" * 10, "end"]
+
+
+def test_too_many_messages_end_with_a_notice():
+    chunks = split_text("\n".join("line%02d" % i for i in range(20)), max_chars=20, max_messages=3)
+    assert len(chunks) == 3
+    assert chunks[-1].endswith("…內容太長，其餘部分未顯示")
+    assert all(len(chunk) <= 20 for chunk in chunks)
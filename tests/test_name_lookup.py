@@ -0,0 +1,45 @@
+# tests/test_name_lookup.py
+from name_index import NameIndex, name_key, similarity
+
+
+def test_similarity_does_not_reward_longer_query():
+    # 「蘋果汁」包含「蘋果」，但它是另一種食材
+    assert similarity(name_key("蘋果汁"), name_key("蘋果")) < similarity(name_key("蘋"), name_key("蘋果"))
+    assert similarity(name_key("蛋"), name_key("雞蛋")) >= 0.6
+
+
+def test_lookup_only_accepts_equivalent_names():
+    index = NameIndex()
+    for ingredient_id, name in enumerate(["蘋果", "雞蛋", "牛奶", "馬鈴薯"], 1):
+        index.add(ingredient_id, name)
+
+    assert index.lookup("鸡蛋") == 2
+    assert index.lookup("土豆") == 4
+    for query in ("牛", "奶", "蘋果汁", "雞蛋糕"):
+        assert index.lookup(query) is None
+
+    index.remove(2)
+    assert index.lookup("雞蛋") is None
+
+
+def test_find_ingredient_never_guesses(storage):
+    for query in ("蘋果汁", "雞蛋糕", "牛", "奶"):
+        assert storage.find_ingredient(query) is None
+    assert storage.find_ingredient("鸡蛋").name == "雞蛋"
+
+
+def test_not_found_lists_candidates(storage):
+    message = storage.not_found_message("蘋果汁")
+    assert message.startswith("❌ 找不到食材：蘋果汁")
+    assert "你是不是要找：蘋果 (ID: 1)" in message
+
+
+def test_reduce_unknown_name_changes_nothing(storage):
+    result = storage.reduce_ingredient_quantity("雞蛋糕", 2)
+    assert result.startswith("❌ 找不到食材：雞蛋糕")
+    assert storage.find_ingredient("雞蛋").quantity == 12
+
+
+def test_delete_reply_names_the_item(storage):
+    assert storage.delete_ingredient(1) == "✅ 已刪除食材: 蘋果 (ID: 1)"
+    assert storage.find_ingredient("蘋果") is None
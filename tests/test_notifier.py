@@ -0,0 +1,63 @@
+# tests/test_notifier.py
+import pytest
+
+pytest.importorskip("linebot")
+
+from linebot import LineBotApi
+
+import notifier
+from fake_line_server import FakeLineServer
+from notifier import ExpiryNotifier, LineMulticaster, SubscriberRegistry
+
+
+@pytest.fixture
+def line_server(monkeypatch):
+    # 每兩人一批，少量訂閱者就能測到分批
+    monkeypatch.setattr(notifier, "MULTICAST_MAX_RECIPIENTS", 2)
+    with FakeLineServer() as server:
+        yield server
+
+
+def new_notifier(server, path, storage):
+    multicaster = LineMulticaster(LineBotApi("fake-token", endpoint=server.url), max_retries=0,
+                                  sleep=lambda seconds: None)
+    return ExpiryNotifier(SubscriberRegistry(str(path)), multicaster, lambda: storage, send_when_empty=True)
+
+
+def test_retry_sends_only_failed_batch_despite_subscription_changes(line_server, tmp_path, sqlite_storage):
+    path = tmp_path / "subscribers.json"
+    expiry = new_notifier(line_server, path, sqlite_storage)
+    for user_id in ("U1", "U2", "U3"):
+        expiry.registry.subscribe(user_id)
+
+    # 第一批（U1, U2）失敗，第二批（U3）送達
+    line_server.fail_next = 1
+    first = expiry.run_once()
+    assert first["failed_user_ids"] == ["U1", "U2"]
+    assert dict(line_server.delivered) == {"U3": 1}
+
+    # 重送前有人取消訂閱、有人新訂閱；重啟後從狀態檔讀回失敗的批次
+    expiry.registry.unsubscribe("U1")
+    expiry.registry.subscribe("U4")
+    expiry = new_notifier(line_server, path, sqlite_storage)
+    second = expiry.run_once()
+
+    assert second["failed"] == 0
+    assert dict(line_server.delivered) == {"U2": 1, "U3": 1}
+    assert line_server.requests[-1]["retry_key"] == line_server.requests[0]["retry_key"]
+    assert expiry.run_once() == {"sent": False, "reason": "already_sent"}
+
+
+def test_retry_without_changes_sends_one_request(line_server, tmp_path, sqlite_storage):
+    expiry = new_notifier(line_server, tmp_path / "subscribers.json", sqlite_storage)
+    for user_id in ("U1", "U2", "U3", "U4", "U5"):
+        expiry.registry.subscribe(user_id)
+
+    line_server.fail_next = 1
+    assert expiry.run_once()["failed"] == 2
+    assert line_server.calls["multicast"] == 3
+
+    assert expiry.run_once()["batches"] == 1
+    assert line_server.calls["multicast"] == 4
+    assert all(count == 1 for count in line_server.delivered.values())
+    assert len(line_server.delivered) == 5
@@ -0,0 +1,74 @@
+# tests/test_pagination.py
+import base64
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from storage_backend import decode_cursor, encode_cursor
+
+
+def raw_cursor(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor((42,)), expiring_first=False) == (42,)
+    assert decode_cursor(encode_cursor((0, "2026-10-18", 7)), expiring_first=True) == (0, "2026-10-18", 7)
+
+
+@pytest.mark.parametrize("cursor, expiring_first", [
+    ("!!!", False),
+    ("bm90IGpzb24", False),
+    (raw_cursor({"id": 1}), False),
+    (raw_cursor(["1"]), False),
+    (raw_cursor([1, 2]), False),
+    (raw_cursor([3]), True),
+    (raw_cursor([2, "2026-10-18", 1]), True),
+    (raw_cursor([0, "2026-10-18", "1"]), True),
+])
+def test_bad_cursors_are_rejected(cursor, expiring_first):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, expiring_first)
+
+
+def test_list_rejects_a_cursor_for_the_other_order(storage):
+    cursor = storage.list_ingredients(limit=2).next_cursor
+    with pytest.raises(ValueError):
+        storage.list_ingredients(limit=2, cursor=cursor, expiring_first=True)
+
+
+def walk(storage, changes, **kwargs):
+    """逐頁讀取，每讀完一頁就套用一個修改，回傳讀到的名稱"""
+    names, cursor = [], None
+    changes = list(changes)
+    while True:
+        page = storage.list_ingredients(limit=2, cursor=cursor, **kwargs)
+        names.extend(ingredient.name for ingredient in page.items)
+        if changes:
+            changes.pop(0)()
+        cursor = page.next_cursor
+        if cursor is None:
+            return names
+
+
+def test_paging_by_id_while_rows_change(storage):
+    storage.add_ingredients([{"name": name} for name in ("吐司", "鮭魚", "優格")])
+    names = walk(storage, [
+        lambda: storage.delete_ingredient(1),
+        lambda: (storage.delete_ingredient(6), storage.add_ingredient("香蕉")),
+    ])
+    # 已讀過的蘋果、尚未讀到的鮭魚被刪除，之後才新增的香蕉排在最後：其他食材都恰好出現一次
+    assert names == ["蘋果", "豬肉", "雞蛋", "牛奶", "吐司", "優格", "香蕉"]
+
+
+def test_paging_by_expiry_while_rows_change(storage):
+    today = date.today()
+    for offset, name in enumerate(("鮭魚", "優格", "吐司"), 1):
+        storage.add_ingredient(name, expires_at=(today + timedelta(days=offset)).isoformat())
+    names = walk(storage, [
+        lambda: storage.delete_ingredient(storage.find_ingredient("鮭魚").id),
+        lambda: storage.add_ingredient("香蕉", expires_at=today.isoformat()),
+    ], expiring_first=True)
+    # 新增到已讀範圍之前的香蕉不會出現，也不會讓其他食材重複或被跳過
+    assert names == ["鮭魚", "優格", "吐司", "蘋果", "豬肉", "雞蛋", "牛奶"]
@@ -0,0 +1,65 @@
+# tests/test_parse_cache.py
+import json
+
+from parse_cache import ParseCache
+
+VALUE = {"items": [{"name": "牛奶", "quantity": 1}]}
+
+
+def test_key_is_normalized_text_and_reference_date():
+    cache = ParseCache()
+    cache.put("買了 牛奶", "2026-10-18", VALUE)
+
+    assert cache.get("買了　　牛奶 ", "2026-10-18") == VALUE
+    assert cache.get("買了 牛奶", "2026-10-19") is None
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ParseCache(max_size=2)
+    cache.put("a", "2026-10-18", VALUE)
+    cache.put("b", "2026-10-18", VALUE)
+    cache.get("a", "2026-10-18")
+    cache.put("c", "2026-10-18", VALUE)
+
+    assert cache.get("b", "2026-10-18") is None
+    assert cache.get("a", "2026-10-18") == VALUE
+
+
+def test_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "parse_cache.jsonl")
+    cache = ParseCache(path=path)
+    cache.put("買了牛奶", "2026-10-17", VALUE)
+    cache.put("買了雞蛋", "2026-10-18", VALUE)
+
+    restarted = ParseCache(path=path)
+    restarted.load(min_date="2026-10-18")
+    assert restarted.get("買了雞蛋", "2026-10-18") == VALUE
+    assert restarted.get("買了牛奶", "2026-10-17") is None
+
+
+def test_put_appends_one_line_and_compacts_past_twice_the_size(tmp_path):
+    path = tmp_path / "parse_cache.jsonl"
+    cache = ParseCache(max_size=2, path=str(path))
+    for i in range(4):
+        cache.put(f"text {i}", "2026-10-18", VALUE)
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 4
+
+    cache.put("text 4", "2026-10-18", VALUE)
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["text"] for line in lines] == ["text 3", "text 4"]
+
+
+def test_torn_last_line_and_legacy_file_are_read(tmp_path):
+    path = tmp_path / "parse_cache.jsonl"
+    path.write_text(json.dumps({"text": "a", "date": "2026-10-18", "value": VALUE}) + "\n{\"text\": ",
+                    encoding="utf-8")
+    cache = ParseCache(path=str(path))
+    cache.load()
+    assert cache.get("a", "2026-10-18") == VALUE
+
+    path.write_text(json.dumps([{"text": "b", "date": "2026-10-18", "value": VALUE}]), encoding="utf-8")
+    cache = ParseCache(path=str(path))
+    cache.load()
+    assert cache.get("b", "2026-10-18") == VALUE
+    assert json.loads(path.read_text(encoding="utf-8").splitlines()[0])["text"] == "b"
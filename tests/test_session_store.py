@@ -0,0 +1,63 @@
+# tests/test_session_store.py
+import pytest
+
+import session_store
+from session_store import SessionStore, estimate_tokens
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可以手動前進的 time.monotonic"""
+    now = [1000.0]
+    monkeypatch.setattr(session_store.time, "monotonic", lambda: now[0])
+    return now
+
+
+def contents(store, user_id):
+    return [message["content"] for message in store.get_history(user_id)]
+
+
+def test_least_recently_used_user_is_evicted(clock):
+    store = SessionStore(max_users=2)
+    store.append("U1", "user", "a")
+    store.append("U2", "user", "b")
+    store.append("U1", "user", "c")
+    store.append("U3", "user", "d")
+
+    assert len(store) == 2
+    assert store.get_history("U2") == []
+    assert contents(store, "U1") == ["a", "c"]
+
+
+def test_idle_sessions_expire(clock):
+    store = SessionStore(ttl_seconds=60)
+    store.append("U1", "user", "a")
+    clock[0] += 30
+    store.append("U2", "user", "b")
+    clock[0] += 31
+
+    assert store.get_history("U1") == []
+    assert contents(store, "U2") == ["b"]
+    store.append("U2", "user", "c")
+    assert len(store) == 1
+
+
+def test_oldest_messages_are_trimmed_to_the_limits(clock):
+    store = SessionStore(max_messages=3, max_tokens=1000)
+    for text in ["1", "2", "3", "4"]:
+        store.append("U1", "user", text)
+    assert contents(store, "U1") == ["2", "3", "4"]
+
+    store = SessionStore(max_messages=10, max_tokens=estimate_tokens("蘋果牛奶") * 2)
+    store.append_turn("U1", "蘋果牛奶", "雞蛋豬肉")
+    store.append("U1", "user", "吐司")
+    assert contents(store, "U1") == ["雞蛋豬肉", "吐司"]
+
+
+def test_newest_message_is_kept_even_over_the_token_budget(clock):
+    store = SessionStore(max_tokens=10)
+    store.append("U1", "user", "你好")
+    long_reply = "庫存" * 50
+
+    store.append("U1", "assistant", long_reply)
+    assert contents(store, "U1") == [long_reply]
@@ -0,0 +1,50 @@
+# tests/test_sheet_sync.py
+import pytest
+
+pytest.importorskip("gspread")
+
+
+def test_sync_without_changes_changes_nothing(sheets_storage):
+    sheets_storage.get_records()
+    assert sheets_storage.sync() == {'mode': 'delta', 'changed_rows': 0}
+    assert sheets_storage.sync() == {'mode': 'delta', 'changed_rows': 0}
+
+
+def test_stamped_hand_edit_is_synced_after_own_writes(sheets_storage, worksheet):
+    sheets_storage.get_records()
+    sheets_storage.sync()
+    # 本行程寫入之後，有人修改了數量，onEdit 同時更新了「更新時間」
+    assert sheets_storage.update_ingredient(1, quantity=4).startswith("✅")
+    worksheet.rows[3][2] = 30
+    worksheet.rows[3][8] = "2099-01-01 00:00:00.000"
+
+    assert sheets_storage.sync() == {'mode': 'delta', 'changed_rows': 1}
+    assert sheets_storage.find_ingredient("雞蛋").quantity == 30
+    assert sheets_storage.find_ingredient("蘋果").quantity == 4
+
+
+def test_sync_reads_only_id_version_columns_and_changed_rows(sheets_storage, worksheet, monkeypatch):
+    sheets_storage.get_records()
+    worksheet.rows[2][2] = 3
+    worksheet.rows[2][8] = "2099-01-01 00:00:00.000"
+    ranges = []
+    batch_get = worksheet.batch_get
+    monkeypatch.setattr(worksheet, "batch_get", lambda r, **kwargs: ranges.append(list(r)) or batch_get(r, **kwargs))
+
+    assert sheets_storage.sync() == {'mode': 'delta', 'changed_rows': 1}
+    assert ranges == [["A:A", "I:I"], ["A3:I3"]]
+    assert sheets_storage.find_ingredient("豬肉").quantity == 3
+    assert worksheet.calls["get_all_records"] == 1
+
+
+def test_hand_added_and_deleted_rows_are_synced(sheets_storage, worksheet):
+    sheets_storage.get_records()
+    del worksheet.rows[2]
+    worksheet.rows.append([9, "鮭魚", 2, "片", "", "冷凍", "", "", ""])
+
+    assert sheets_storage.sync() == {'mode': 'delta', 'changed_rows': 2}
+    assert [ingredient.name for ingredient in sheets_storage.get_records()] == ["蘋果", "雞蛋", "牛奶", "鮭魚"]
+    assert sheets_storage.find_ingredient("豬肉") is None
+    # 新增的食材不會重複使用手動加入的 ID
+    sheets_storage.add_ingredient("吐司")
+    assert sheets_storage.find_ingredient("吐司").id == 10
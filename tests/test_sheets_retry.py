@@ -0,0 +1,81 @@
+# tests/test_sheets_retry.py
+import pytest
+
+pytest.importorskip("gspread")
+
+from sheets_client import QuotaAwareWorksheet
+
+
+def quota_aware(worksheet):
+    return QuotaAwareWorksheet(worksheet, read_per_minute=1000000, write_per_minute=1000000,
+                               max_retries=3, sleep=lambda seconds: None)
+
+
+def names(worksheet):
+    return [row[1] for row in worksheet.rows[1:]]
+
+
+def test_reads_retry_server_errors(worksheet):
+    client = quota_aware(worksheet)
+    worksheet.fail_next = 2
+    worksheet.fail_status = 503
+    assert client.get_all_values()[1][1] == "蘋果"
+    assert worksheet.calls["get_all_values"] == 3
+    assert client.metrics()["retries"] == 2
+
+
+def test_fixed_range_writes_retry_server_errors(worksheet):
+    client = quota_aware(worksheet)
+    worksheet.fail_next = 1
+    worksheet.fail_status = 500
+    client.batch_update([{"range": "C2", "values": [[3]]}])
+    assert worksheet.rows[1][2] == 3
+    assert worksheet.calls["batch_update"] == 2
+
+
+@pytest.mark.parametrize("method, args", [("delete_rows", (2,)), ("append_rows", ([[9, "鮭魚"]],))])
+def test_row_writes_do_not_retry_server_errors(worksheet, method, args):
+    client = quota_aware(worksheet)
+    worksheet.fail_next = 1
+    worksheet.fail_status = 500
+    worksheet.fail_after_write = True
+    with pytest.raises(Exception):
+        getattr(client, method)(*args)
+    assert worksheet.calls[method] == 1
+
+
+def test_row_writes_retry_rate_limits(worksheet):
+    client = quota_aware(worksheet)
+    worksheet.fail_next = 1
+    worksheet.fail_status = 429
+    client.delete_rows(2)
+    assert names(worksheet) == ["豬肉", "雞蛋", "牛奶"]
+
+
+def fail_once(worksheet, method, status, after_write=False):
+    worksheet.fail_next = 1
+    worksheet.fail_status = status
+    worksheet.fail_after_write = after_write
+    worksheet.fail_methods = {method}
+
+
+def test_delete_after_committed_server_error_keeps_next_row(sheets_storage, worksheet):
+    fail_once(worksheet, "delete_rows", 500, after_write=True)
+    assert sheets_storage.delete_ingredient(2) == "✅ 已刪除食材: 豬肉 (ID: 2)"
+    assert names(worksheet) == ["蘋果", "雞蛋", "牛奶"]
+
+
+def test_delete_retries_when_server_error_was_not_committed(sheets_storage, worksheet):
+    fail_once(worksheet, "delete_rows", 503)
+    assert sheets_storage.delete_ingredient(2).startswith("✅")
+    assert names(worksheet) == ["蘋果", "雞蛋", "牛奶"]
+    assert worksheet.calls["delete_rows"] == 2
+
+
+@pytest.mark.parametrize("committed", [True, False])
+def test_append_after_server_error_adds_one_row(sheets_storage, worksheet, committed):
+    fail_once(worksheet, "append_rows", 500, after_write=committed)
+    result = sheets_storage.add_ingredients([{"name": "鮭魚", "quantity": 1}, {"name": "吐司", "quantity": 1}])
+    assert result.startswith("✅")
+    assert names(worksheet) == ["蘋果", "豬肉", "雞蛋", "牛奶", "鮭魚", "吐司"]
+    assert sheets_storage.find_ingredient("鮭魚") is not None
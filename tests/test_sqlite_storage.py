@@ -0,0 +1,53 @@
+# tests/test_sqlite_storage.py
+from datetime import date, timedelta
+
+import pytest
+
+from sqlite_storage import SQLiteStorage
+
+
+@pytest.fixture
+def other_worker(sqlite_storage):
+    """同一個資料庫檔案的另一個連線（模擬另一個 worker 行程）"""
+    storage = SQLiteStorage(sqlite_storage.path)
+    yield storage
+    storage.close()
+
+
+def test_writes_from_another_connection_change_the_version(sqlite_storage, other_worker):
+    before = sqlite_storage.inventory_version()
+    other_worker.add_ingredient("鮭魚", 1, "片")
+    assert sqlite_storage.inventory_version() != before
+
+    before = sqlite_storage.inventory_version()
+    sqlite_storage.delete_ingredient(1)
+    assert sqlite_storage.inventory_version() != before
+    assert other_worker.inventory_version() == sqlite_storage.inventory_version()
+
+
+def test_expiring_cache_sees_other_writers(sqlite_storage, other_worker):
+    assert sqlite_storage.get_expiring_records(3) == []
+    tomorrow = (date.today() + timedelta(days=1)).isoformat()
+    other_worker.add_ingredient("鮭魚", 1, "片", expires_at=tomorrow)
+    assert [ingredient.name for ingredient, _ in sqlite_storage.get_expiring_records(3)] == ["鮭魚"]
+
+
+def test_name_index_sees_other_writers(sqlite_storage, other_worker):
+    other_worker.add_ingredient("鮭魚", 1, "片")
+    assert sqlite_storage.find_ingredient("鲑鱼").name == "鮭魚"
+    assert [ingredient.name for ingredient in sqlite_storage.search_ingredients("鮭")] == ["鮭魚"]
+
+    other_worker.delete_ingredient(sqlite_storage.find_ingredient("鮭魚").id)
+    assert sqlite_storage.search_ingredients("鮭") == []
+
+
+def test_basic_format_dates_are_stored_as_iso(storage):
+    tomorrow = date.today() + timedelta(days=1)
+    next_week = date.today() + timedelta(days=7)
+    storage.add_ingredient("鮭魚", 1, "片", expires_at=tomorrow.strftime("%Y%m%d"))
+    storage.add_ingredients([{"name": "優格", "quantity": 2, "unit": "杯", "expires_at": next_week.strftime("%Y%m%d")}])
+    storage.update_ingredient(1, expires_at=(tomorrow + timedelta(days=1)).strftime("%Y%m%d"))
+
+    expiring = storage.get_expiring_records(3)
+    assert [(ingredient.name, days) for ingredient, days in expiring] == [("鮭魚", 1), ("蘋果", 2)]
+    assert storage.find_ingredient("優格").expires_at == next_week
@@ -0,0 +1,68 @@
+# tests/test_worker_pool.py
+import threading
+
+from worker_pool import AgentWorkerPool
+
+
+def test_full_pool_rejects_new_work():
+    pool = AgentWorkerPool(max_workers=1, max_pending=1)
+    release = threading.Event()
+    try:
+        running = pool.submit(release.wait, 5)
+        queued = pool.submit(lambda: "queued")
+        assert running is not None and queued is not None
+        assert pool.submit(lambda: "rejected") is None
+        assert pool.submit_keyed("U1", lambda: "rejected") is None
+
+        release.set()
+        assert queued.result(5) == "queued"
+        assert pool.submit(lambda: "accepted").result(5) == "accepted"
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_keyed_jobs_run_in_order_one_at_a_time():
+    pool = AgentWorkerPool(max_workers=4, max_pending=100)
+    order = []
+    running = []
+    overlap = []
+    lock = threading.Lock()
+
+    def handle(user_id, i):
+        with lock:
+            if user_id in running:
+                overlap.append((user_id, i))
+            running.append(user_id)
+        threading.Event().wait(0.002)
+        with lock:
+            running.remove(user_id)
+            order.append((user_id, i))
+
+    try:
+        futures = [pool.submit_keyed(user_id, handle, user_id, i) for i in range(20) for user_id in ("U1", "U2")]
+        for future in futures:
+            future.result(5)
+    finally:
+        pool.shutdown()
+
+    assert overlap == []
+    for user_id in ("U1", "U2"):
+        assert [i for key, i in order if key == user_id] == list(range(20))
+
+
+def test_slow_user_does_not_block_other_users():
+    pool = AgentWorkerPool(max_workers=2, max_pending=10)
+    release = threading.Event()
+    try:
+        blocked = pool.submit_keyed("U1", release.wait, 5)
+        queued_behind = pool.submit_keyed("U1", lambda: "U1 second")
+        assert pool.submit_keyed("U2", lambda: "U2").result(5) == "U2"
+        assert not queued_behind.done()
+
+        release.set()
+        assert blocked.result(5) is True
+        assert queued_behind.result(5) == "U1 second"
+    finally:
+        release.set()
+        pool.shutdown()
@@ -0,0 +1,44 @@
+# tests/test_write_behind.py
+import threading
+
+import pytest
+
+pytest.importorskip("gspread")
+
+from google_sheets_storage import GoogleSheetsStorage
+
+
+@pytest.fixture
+def write_behind_storage(worksheet):
+    storage = GoogleSheetsStorage(worksheet=worksheet, write_behind=True, sync_interval=0)
+    # 不啟動背景執行緒，由測試呼叫 flush()
+    storage.write_behind.stop(flush=False)
+    storage.worksheet.base_delay = 0
+    yield storage
+    storage.close()
+
+
+def test_deletes_are_sent_as_one_request(write_behind_storage, worksheet):
+    for ingredient_id in (1, 2, 4):
+        assert write_behind_storage.delete_ingredient(ingredient_id).startswith("✅")
+
+    assert write_behind_storage.write_behind.flush()
+    assert worksheet.calls["spreadsheet_batch_update"] == 1
+    assert worksheet.calls["delete_rows"] == 0
+    assert [row[1] for row in worksheet.rows[1:]] == ["雞蛋"]
+
+
+def test_flush_waits_for_row_lock(write_behind_storage, worksheet):
+    write_behind_storage.delete_ingredient(2)
+    flushed = threading.Event()
+
+    with write_behind_storage._row_lock.exclusive():
+        flusher = threading.Thread(target=lambda: write_behind_storage.write_behind.flush() and flushed.set())
+        flusher.start()
+        assert not flushed.wait(0.2)
+        assert write_behind_storage.write_behind.stats()["queue_depth"] == 1
+        assert len(worksheet.rows) == 5
+
+    flusher.join(5)
+    assert flushed.is_set()
+    assert [row[1] for row in worksheet.rows[1:]] == ["蘋果", "雞蛋", "牛奶"]
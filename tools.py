@@ -1,13 +1,18 @@
 # tools.py
 import random
-import requests
 import logging
 from datetime import date, timedelta
 from typing import Dict, List, Any
-from langchain.tools import Tool
+from langchain.tools import StructuredTool
 from pydantic import BaseModel, Field
 
-from google_sheets_storage import get_google_sheets_storage
+from observability import traced
+from storage import get_storage
+from ingredient import parse_date
+from name_index import normalize_name
+from storage_backend import (
+    ConflictError, MAX_CONFLICT_RETRIES, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, conflict_backoff,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +26,34 @@ class IngredientInfo(BaseModel):
     location: str | None = Field(None, description="冷藏/冷凍/室溫")
     notes: str | None = Field(None, description="其他備註")
 
+class BulkIngredientsInput(BaseModel):
+    items: List[IngredientInfo] = Field(..., min_length=1, description="要添加的所有食材，每種食材一筆")
+
+class ListIngredientsInput(BaseModel):
+    limit: int = Field(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description=f"每頁筆數，預設{DEFAULT_PAGE_SIZE}")
+    cursor: str | None = Field(None, description="上一次結果最後附上的 cursor，用來查看下一頁")
+    location: str | None = Field(None, description="只列出這個存放位置的食材：冷藏/冷凍/室溫")
+    name_prefix: str | None = Field(None, description="只列出名稱以此開頭的食材")
+    expiring_first: bool = Field(False, description="依到期日排序，最快到期的在前")
+
+class ExpiringIngredientsInput(BaseModel):
+    days: int = Field(3, ge=0, description="檢查幾天內到期，預設3天")
+
+class IngredientRefInput(BaseModel):
+    identifier: int | str = Field(..., description="食材ID或食材名稱")
+
+class ReduceQuantityInput(BaseModel):
+    identifier: int | str = Field(..., description="食材ID或食材名稱")
+    amount: float = Field(..., gt=0, description="要減少的數量")
+
+class UpdateIngredientInput(BaseModel):
+    identifier: int | str = Field(..., description="要修改的食材ID或食材名稱")
+    name: str | None = Field(None, description="新名稱")
+    quantity: float | None = Field(None, description="新數量")
+    unit: str | None = Field(None, description="新單位")
+    expires_at: str | None = Field(None, description="新到期日 YYYY-MM-DD")
+    location: str | None = Field(None, description="新存放位置：冷藏/冷凍/室溫")
+
 def parse_ingredient_from_text(text: str) -> str:
     """從用戶輸入解析食材資訊"""
     # 這裡可以整合之前的 LangChain 解析邏輯
@@ -34,28 +67,37 @@ ingredient_storage = [
     {"name": "麵包", "quantity": 1, "unit": "條", "expires_at": "2025-09-16", "location": "室溫"},
 ]
 
-def add_ingredient(ingredient_info: str) -> str:
-    """添加食材到庫存，格式: 名稱,數量,單位,到期日,存放位置"""
+def _invalid_date_message(expires_at: str | None) -> str | None:
+    """到期日不是 YYYY-MM-DD 時回傳錯誤訊息（在寫入前檢查，儲存層只保存有效日期）"""
+    if expires_at and parse_date(expires_at) is None:
+        return f"❌ 到期日格式錯誤：{expires_at}，請使用 YYYY-MM-DD"
+    return None
+
+@traced("tool.add_ingredient")
+def add_ingredient(name: str, quantity: float | None = 1, unit: str | None = None,
+                   expires_at: str | None = None, location: str | None = None,
+                   notes: str | None = None) -> str:
+    """添加食材到庫存"""
     try:
-        parts = ingredient_info.split(',')
-        if len(parts) < 1:
+        name = (name or "").strip()
+        if not name:
             return "❌ 請提供食材名稱"
-        
-        name = parts[0].strip()
-        quantity = float(parts[1].strip()) if len(parts) > 1 and parts[1].strip() else 1
-        unit = parts[2].strip() if len(parts) > 2 and parts[2].strip() else None
-        expires_at = parts[3].strip() if len(parts) > 3 and parts[3].strip() else None
-        location = parts[4].strip() if len(parts) > 4 and parts[4].strip() else None
-        
-        # 使用 Google Sheets 儲存
-        logger.info(f"🔄 正在添加食材到 Google Sheets: {name}")
-        storage = get_google_sheets_storage()
+        if quantity is None:
+            quantity = 1
+        error = _invalid_date_message(expires_at)
+        if error:
+            return error
+        
+        # 使用設定的儲存後端
+        storage = get_storage()
+        logger.info(f"🔄 正在添加食材到 {storage.backend_name}: {name}")
         result = storage.add_ingredient(
             name=name,
             quantity=quantity,
             unit=unit,
             expires_at=expires_at,
-            location=location
+            location=location,
+            notes=notes
         )
         
         # 同時更新本地記憶體（作為快取）
@@ -73,36 +115,92 @@ def add_ingredient(ingredient_info: str) -> str:
         logger.error(f"❌ 添加食材失敗: {str(e)}")
         return f"❌ 添加食材失敗: {str(e)}"
 
-def get_ingredient_list(query: str = "") -> str:
-    """獲取食材庫存列表"""
+@traced("tool.add_ingredients")
+def add_ingredients(items: List[IngredientInfo | Dict[str, Any]]) -> str:
+    """一次添加多項食材（例如一次購物買的所有東西），只寫入一次儲存後端"""
+    try:
+        records = []
+        for item in items:
+            record = item.model_dump() if isinstance(item, BaseModel) else dict(item)
+            record['name'] = (record.get('name') or "").strip()
+            if not record['name']:
+                return "❌ 請提供每一項食材的名稱"
+            if record.get('quantity') is None:
+                record['quantity'] = 1
+            error = _invalid_date_message(record.get('expires_at'))
+            if error:
+                return error
+            records.append(record)
+        
+        storage = get_storage()
+        logger.info(f"🔄 正在添加 {len(records)} 項食材到 {storage.backend_name}: "
+                    f"{', '.join(record['name'] for record in records)}")
+        result = storage.add_ingredients(records)
+        
+        # 同時更新本地記憶體（作為快取）
+        if not result.startswith("❌"):
+            for record in records:
+                ingredient_storage.append({
+                    "name": record['name'],
+                    "quantity": record['quantity'],
+                    "unit": record.get('unit'),
+                    "expires_at": record.get('expires_at'),
+                    "location": record.get('location')
+                })
+        
+        return result
+    except Exception as e:
+        logger.error(f"❌ 添加食材失敗: {str(e)}")
+        return f"❌ 添加食材失敗: {str(e)}"
+
+@traced("tool.get_ingredient_list")
+def get_ingredient_list(limit: int = DEFAULT_PAGE_SIZE, cursor: str | None = None,
+                        location: str | None = None, name_prefix: str | None = None,
+                        expiring_first: bool = False) -> str:
+    """獲取食材庫存列表（一頁），結果附有下一頁的 cursor"""
     try:
-        # 優先從 Google Sheets 獲取
-        logger.info("🔄 正在從 Google Sheets 獲取食材列表")
-        storage = get_google_sheets_storage()
-        result = storage.get_ingredient_list()
+        # 優先從儲存後端獲取
+        storage = get_storage()
+        logger.info(f"🔄 正在從 {storage.backend_name} 獲取食材列表")
+        result = storage.get_ingredient_list(limit=limit, cursor=cursor, location=location,
+                                             name_prefix=name_prefix, expiring_first=expiring_first)
         return result
     except Exception as e:
-        logger.error(f"❌ 從 Google Sheets 獲取失敗，使用本地快取: {str(e)}")
-        # 如果 Google Sheets 失敗，使用本地快取
-        if not ingredient_storage:
+        logger.error(f"❌ 從儲存後端獲取失敗，使用本地快取: {str(e)}")
+        # 如果儲存後端失敗，使用本地快取（只顯示第一頁）
+        items = ingredient_storage
+        if location:
+            items = [item for item in items if normalize_name(item['location']) == normalize_name(location)]
+        if name_prefix:
+            items = [item for item in items if normalize_name(item['name']).startswith(normalize_name(name_prefix))]
+        if expiring_first:
+            items = sorted(items, key=lambda item: (item['expires_at'] is None, item['expires_at'] or ""))
+        if not items:
             return "📦 目前沒有食材庫存"
         
-        result = "📦 食材庫存列表 (本地快取):\n"
-        for i, item in enumerate(ingredient_storage, 1):
-            result += f"{i}. {item['name']} {item['quantity']}{item['unit'] or ''} (到期: {item['expires_at']}, 存放: {item['location']})\n"
-        return result
+        lines = ["📦 食材庫存列表 (本地快取):"]
+        lines.extend(
+            f"{i}. {item['name']} {item['quantity']}{item['unit'] or ''} (到期: {item['expires_at']}, 存放: {item['location']})"
+            for i, item in enumerate(items[:limit], 1)
+        )
+        if len(items) > limit:
+            lines.append(f"…還有 {len(items) - limit} 項")
+        return "\n".join(lines) + "\n"
+
+DEFAULT_EXPIRING_DAYS = 3
 
-def check_expiring_ingredients(query: str = "") -> str:
-    """檢查即將過期的食材"""
+@traced("tool.check_expiring_ingredients")
+def check_expiring_ingredients(days: int = DEFAULT_EXPIRING_DAYS) -> str:
+    """檢查 days 天內即將過期的食材"""
     try:
-        # 優先從 Google Sheets 檢查
-        logger.info("🔄 正在從 Google Sheets 檢查過期食材")
-        storage = get_google_sheets_storage()
-        result = storage.check_expiring_ingredients()
+        # 優先從儲存後端檢查
+        storage = get_storage()
+        logger.info(f"🔄 正在從 {storage.backend_name} 檢查過期食材")
+        result = storage.check_expiring_ingredients(days)
         return result
     except Exception as e:
-        logger.error(f"❌ 從 Google Sheets 檢查失敗，使用本地快取: {str(e)}")
-        # 如果 Google Sheets 失敗，使用本地快取
+        logger.error(f"❌ 從儲存後端檢查失敗，使用本地快取: {str(e)}")
+        # 如果儲存後端失敗，使用本地快取
         today = date.today()
         expiring_soon = []
         
@@ -110,26 +208,27 @@ def check_expiring_ingredients(query: str = "") -> str:
             if item['expires_at']:
                 expires_date = date.fromisoformat(item['expires_at'])
                 days_left = (expires_date - today).days
-                if days_left <= 3:
+                if days_left <= days:
                     expiring_soon.append((item, days_left))
         
         if not expiring_soon:
             return "✅ 沒有即將過期的食材"
         
-        result = "⚠️ 即將過期的食材 (本地快取):\n"
-        for item, days_left in expiring_soon:
-            result += f"- {item['name']} 還有 {days_left} 天到期\n"
-        return result
+        lines = [f"⚠️ 即將過期的食材 (未來{days}天內，本地快取):"]
+        lines.extend(f"- {item['name']} 還有 {days_left} 天到期" for item, days_left in expiring_soon)
+        return "\n".join(lines) + "\n"
 
-def delete_ingredient(ingredient_info: str) -> str:
-    """刪除食材，格式: 食材ID 或 食材名稱"""
+@traced("tool.delete_ingredient")
+def delete_ingredient(identifier: int | str) -> str:
+    """刪除食材，identifier 為食材ID或食材名稱"""
     try:
         # 先獲取食材列表來找到要刪除的食材
-        storage = get_google_sheets_storage()
+        storage = get_storage()
+        ingredient_info = str(identifier).strip()
         
         # 嘗試解析為 ID
         try:
-            ingredient_id = int(ingredient_info.strip())
+            ingredient_id = int(ingredient_info)
             logger.info(f"🔄 正在刪除食材 ID: {ingredient_id}")
             result = storage.delete_ingredient(ingredient_id)
             return result
@@ -137,19 +236,14 @@ def delete_ingredient(ingredient_info: str) -> str:
             # 如果不是數字，嘗試按名稱查找
             logger.info(f"🔄 正在按名稱刪除食材: {ingredient_info}")
             
-            # 獲取食材列表來查找 ID
+            # 從索引按名稱查找 ID
             try:
-                expected_headers = ["ID", "名稱", "數量", "單位", "到期日", "存放位置", "備註", "創建時間", "更新時間"]
-                records = storage.worksheet.get_all_records(expected_headers=expected_headers)
-                
-                # 查找匹配的食材
-                for record in records:
-                    if record.get('名稱', '').strip() == ingredient_info.strip():
-                        ingredient_id = int(record.get('ID', 0))
-                        result = storage.delete_ingredient(ingredient_id)
-                        return result
+                target = storage.find_ingredient(ingredient_info)
+                if not target:
+                    return storage.not_found_message(ingredient_info)
                 
-                return f"❌ 找不到名稱為 '{ingredient_info}' 的食材"
+                result = storage.delete_ingredient(target.id)
+                return result
                 
             except Exception as e:
                 return f"❌ 刪除食材失敗: {str(e)}"
@@ -158,143 +252,92 @@ def delete_ingredient(ingredient_info: str) -> str:
         logger.error(f"❌ 刪除食材失敗: {str(e)}")
         return f"❌ 刪除食材失敗: {str(e)}"
 
-def reduce_ingredient_quantity(ingredient_info: str) -> str:
-    """減少食材數量，格式: 食材名稱,減少數量 或 食材ID,減少數量"""
+@traced("tool.reduce_ingredient_quantity")
+def reduce_ingredient_quantity(identifier: int | str, amount: float) -> str:
+    """減少食材數量，identifier 為食材ID或食材名稱"""
     try:
-        parts = ingredient_info.split(',')
-        if len(parts) < 2:
-            return "❌ 請提供食材名稱和要減少的數量，格式：食材名稱,數量"
-        
-        ingredient_identifier = parts[0].strip()
-        reduce_quantity = float(parts[1].strip())
-        
-        storage = get_google_sheets_storage()
-        
-        # 獲取食材列表來查找目標食材
-        expected_headers = ["ID", "名稱", "數量", "單位", "到期日", "存放位置", "備註", "創建時間", "更新時間"]
-        records = storage.worksheet.get_all_records(expected_headers=expected_headers)
-        
-        target_record = None
-        target_row_index = None
-        
-        # 查找目標食材
-        try:
-            # 嘗試按 ID 查找
-            ingredient_id = int(ingredient_identifier)
-            for i, record in enumerate(records):
-                if int(record.get('ID', 0)) == ingredient_id:
-                    target_record = record
-                    target_row_index = i + 2  # +2 因為第1行是標題，記錄從第2行開始
-                    break
-        except ValueError:
-            # 按名稱查找
-            for i, record in enumerate(records):
-                if record.get('名稱', '').strip() == ingredient_identifier.strip():
-                    target_record = record
-                    target_row_index = i + 2
-                    break
-        
-        if not target_record:
-            return f"❌ 找不到食材：{ingredient_identifier}"
-        
-        # 獲取當前數量
-        current_quantity = float(target_record.get('數量', 0))
-        new_quantity = current_quantity - reduce_quantity
-        
-        if new_quantity < 0:
-            return f"❌ 無法減少 {reduce_quantity} 個，當前只有 {current_quantity} 個 {target_record.get('名稱', '')}"
-        
-        if new_quantity == 0:
-            # 如果數量變為0，直接刪除該行
-            storage.worksheet.delete_rows(target_row_index)
-            logger.info(f"✅ 已完全刪除食材: {target_record.get('名稱', '')}")
-            return f"✅ 已完全刪除食材: {target_record.get('名稱', '')}"
-        else:
-            # 更新數量
-            storage.worksheet.update_cell(target_row_index, 3, new_quantity)  # 第3列是數量
-            storage.worksheet.update_cell(target_row_index, 9, date.today().isoformat())  # 更新時間
-            
-            logger.info(f"✅ 已減少食材數量: {target_record.get('名稱', '')} 從 {current_quantity} 減少到 {new_quantity}")
-            return f"✅ 已減少食材數量: {target_record.get('名稱', '')} 從 {current_quantity} 減少到 {new_quantity}"
+        storage = get_storage()
+        return storage.reduce_ingredient_quantity(str(identifier).strip(), float(amount))
             
     except Exception as e:
         logger.error(f"❌ 減少食材數量失敗: {str(e)}")
         return f"❌ 減少食材數量失敗: {str(e)}"
 
-def update_ingredient(ingredient_info: str) -> str:
-    """修改食材資訊，格式: 食材ID或名稱,新名稱,新數量,新單位,新到期日,新存放位置"""
+@traced("tool.update_ingredient")
+def update_ingredient(identifier: int | str, name: str | None = None, quantity: float | None = None,
+                      unit: str | None = None, expires_at: str | None = None,
+                      location: str | None = None) -> str:
+    """修改食材資訊，identifier 為食材ID或食材名稱，只修改有提供的欄位"""
     try:
-        parts = ingredient_info.split(',')
-        if len(parts) < 2:
-            return "❌ 請提供食材ID或名稱，以及要修改的資訊，格式：食材ID或名稱,新名稱,新數量,新單位,新到期日,新存放位置"
-        
-        ingredient_identifier = parts[0].strip()
-        new_name = parts[1].strip() if len(parts) > 1 and parts[1].strip() else None
-        new_quantity = float(parts[2].strip()) if len(parts) > 2 and parts[2].strip() else None
-        new_unit = parts[3].strip() if len(parts) > 3 and parts[3].strip() else None
-        new_expires_at = parts[4].strip() if len(parts) > 4 and parts[4].strip() else None
-        new_location = parts[5].strip() if len(parts) > 5 and parts[5].strip() else None
-        
-        storage = get_google_sheets_storage()
-        
-        # 獲取食材列表來查找目標食材
-        expected_headers = ["ID", "名稱", "數量", "單位", "到期日", "存放位置", "備註", "創建時間", "更新時間"]
-        records = storage.worksheet.get_all_records(expected_headers=expected_headers)
-        
-        target_record = None
-        target_row_index = None
-        
-        # 查找目標食材
-        try:
-            # 嘗試按 ID 查找
-            ingredient_id = int(ingredient_identifier)
-            for i, record in enumerate(records):
-                if int(record.get('ID', 0)) == ingredient_id:
-                    target_record = record
-                    target_row_index = i + 2  # +2 因為第1行是標題，記錄從第2行開始
-                    break
-        except ValueError:
-            # 按名稱查找
-            for i, record in enumerate(records):
-                if record.get('名稱', '').strip() == ingredient_identifier.strip():
-                    target_record = record
-                    target_row_index = i + 2
-                    break
-        
-        if not target_record:
-            return f"❌ 找不到食材：{ingredient_identifier}"
-        
-        # 更新食材資訊
-        updated_fields = []
-        
-        if new_name and new_name != target_record.get('名稱', ''):
-            storage.worksheet.update_cell(target_row_index, 2, new_name)  # 第2列是名稱
-            updated_fields.append(f"名稱: {target_record.get('名稱', '')} → {new_name}")
-        
-        if new_quantity is not None and new_quantity != float(target_record.get('數量', 0)):
-            storage.worksheet.update_cell(target_row_index, 3, new_quantity)  # 第3列是數量
-            updated_fields.append(f"數量: {target_record.get('數量', '')} → {new_quantity}")
-        
-        if new_unit and new_unit != target_record.get('單位', ''):
-            storage.worksheet.update_cell(target_row_index, 4, new_unit)  # 第4列是單位
-            updated_fields.append(f"單位: {target_record.get('單位', '')} → {new_unit}")
-        
-        if new_expires_at and new_expires_at != target_record.get('到期日', ''):
-            storage.worksheet.update_cell(target_row_index, 5, new_expires_at)  # 第5列是到期日
-            updated_fields.append(f"到期日: {target_record.get('到期日', '')} → {new_expires_at}")
-        
-        if new_location and new_location != target_record.get('存放位置', ''):
-            storage.worksheet.update_cell(target_row_index, 6, new_location)  # 第6列是存放位置
-            updated_fields.append(f"存放位置: {target_record.get('存放位置', '')} → {new_location}")
-        
-        # 更新修改時間
-        storage.worksheet.update_cell(target_row_index, 9, date.today().isoformat())  # 第9列是更新時間
+        ingredient_identifier = str(identifier).strip()
+        new_name = name.strip() if name and name.strip() else None
+        new_quantity = float(quantity) if quantity is not None else None
+        new_unit = unit.strip() if unit and unit.strip() else None
+        new_expires_at = expires_at.strip() if expires_at and expires_at.strip() else None
+        new_location = location.strip() if location and location.strip() else None
+        
+        if not any(value is not None for value in (new_name, new_quantity, new_unit, new_expires_at, new_location)):
+            return "❌ 請提供要修改的資訊（名稱、數量、單位、到期日或存放位置）"
+        error = _invalid_date_message(new_expires_at)
+        if error:
+            return error
+        
+        storage = get_storage()
+        
+        for attempt in range(MAX_CONFLICT_RETRIES + 1):
+            # 從記憶體索引查找目標食材（依 ID 或名稱）
+            target = storage.find_ingredient(ingredient_identifier)
+            
+            if not target:
+                return storage.not_found_message(ingredient_identifier)
+            
+            # 更新食材資訊
+            updated_fields = []
+            changes = {}
+            
+            if new_name and new_name != target.name:
+                changes['name'] = new_name
+                updated_fields.append(f"名稱: {target.name} → {new_name}")
+            
+            if new_quantity is not None and new_quantity != target.quantity:
+                changes['quantity'] = new_quantity
+                updated_fields.append(f"數量: {target.quantity_text} → {new_quantity}")
+            
+            if new_unit and new_unit != target.unit:
+                changes['unit'] = new_unit
+                updated_fields.append(f"單位: {target.unit} → {new_unit}")
+            
+            if new_expires_at and parse_date(new_expires_at) != target.expires_at:
+                changes['expires_at'] = new_expires_at
+                updated_fields.append(f"到期日: {target.expires_at_text} → {new_expires_at}")
+            
+            if new_location and new_location != target.location:
+                changes['location'] = new_location
+                updated_fields.append(f"存放位置: {target.location} → {new_location}")
+            
+            # 原本的名稱（target 是讀取當下的快照，更新後也不會改變）
+            original_name = target.name
+            
+            # 寫入試算表（同時更新修改時間）
+            if changes:
+                try:
+                    # 以讀取時的版本寫入，其他寫入者先修改時重新讀取再比較
+                    result = storage.update_ingredient(target.id, expected_version=target.updated_at, **changes)
+                except ConflictError:
+                    logger.warning(f"⚠️ 食材 {original_name} 已被其他寫入者修改，重新讀取後重試（第 {attempt + 1} 次）")
+                    conflict_backoff(attempt)
+                    continue
+                if result.startswith("❌"):
+                    return result
+            break
+        else:
+            return f"❌ 食材 {ingredient_identifier} 同時被多次修改，請稍後再試"
         
         if updated_fields:
-            logger.info(f"✅ 已修改食材: {target_record.get('名稱', '')} - {', '.join(updated_fields)}")
-            return f"✅ 已修改食材: {target_record.get('名稱', '')}\n" + "\n".join(updated_fields)
+            logger.info(f"✅ 已修改食材: {original_name} - {', '.join(updated_fields)}")
+            return f"✅ 已修改食材: {original_name}\n" + "\n".join(updated_fields)
         else:
-            return f"ℹ️ 食材 {target_record.get('名稱', '')} 的資訊沒有變化"
+            return f"ℹ️ 食材 {original_name} 的資訊沒有變化"
             
     except Exception as e:
         logger.error(f"❌ 修改食材失敗: {str(e)}")
@@ -303,47 +346,68 @@ def update_ingredient(ingredient_info: str) -> str:
 
 # ==================== 工具初始化 ====================
 
-# 食材管理工具
-add_ingredient_tool = Tool(
-    name="add_ingredient",
+# 食材管理工具（以 pydantic 定義參數，經由 OpenAI function calling 傳入並在執行前驗證）
+add_ingredient_tool = StructuredTool.from_function(
     func=add_ingredient,
-    description="添加食材到庫存中，需要提供食材名稱、數量、單位、到期日和存放位置"
+    name="add_ingredient",
+    description="添加一項食材到庫存中。相對日期請先換算成 YYYY-MM-DD",
+    args_schema=IngredientInfo,
+    handle_validation_error=True
 )
 
-get_ingredient_list_tool = Tool(
-    name="get_ingredient_list",
+add_ingredients_tool = StructuredTool.from_function(
+    func=add_ingredients,
+    name="add_ingredients",
+    description="一次添加多項食材到庫存中（例如一次購物買的所有東西），訊息中有兩種以上食材時使用。相對日期請先換算成 YYYY-MM-DD",
+    args_schema=BulkIngredientsInput,
+    handle_validation_error=True
+)
+
+get_ingredient_list_tool = StructuredTool.from_function(
     func=get_ingredient_list,
-    description="獲取當前食材庫存列表"
+    name="get_ingredient_list",
+    description="分頁獲取食材庫存列表，可依存放位置或名稱開頭篩選、依到期日排序；結果最後有 cursor 時，帶入 cursor 查看下一頁",
+    args_schema=ListIngredientsInput,
+    handle_validation_error=True
 )
 
-check_expiring_ingredients_tool = Tool(
-    name="check_expiring_ingredients",
+check_expiring_ingredients_tool = StructuredTool.from_function(
     func=check_expiring_ingredients,
-    description="檢查即將過期（3天內）的食材"
+    name="check_expiring_ingredients",
+    description="檢查即將過期的食材，預設3天內",
+    args_schema=ExpiringIngredientsInput,
+    handle_validation_error=True
 )
 
-delete_ingredient_tool = Tool(
-    name="delete_ingredient",
+delete_ingredient_tool = StructuredTool.from_function(
     func=delete_ingredient,
-    description="完全刪除食材項目，可以通過食材ID或食材名稱來刪除"
+    name="delete_ingredient",
+    description="完全刪除食材項目，可以通過食材ID或食材名稱來刪除",
+    args_schema=IngredientRefInput,
+    handle_validation_error=True
 )
 
-reduce_ingredient_quantity_tool = Tool(
-    name="reduce_ingredient_quantity",
+reduce_ingredient_quantity_tool = StructuredTool.from_function(
     func=reduce_ingredient_quantity,
-    description="減少食材數量，格式：食材名稱,數量 或 食材ID,數量。如果數量變為0則自動刪除該食材"
+    name="reduce_ingredient_quantity",
+    description="減少食材數量，如果數量變為0則自動刪除該食材",
+    args_schema=ReduceQuantityInput,
+    handle_validation_error=True
 )
 
-update_ingredient_tool = Tool(
-    name="update_ingredient",
+update_ingredient_tool = StructuredTool.from_function(
     func=update_ingredient,
-    description="修改食材資訊，格式：食材ID或名稱,新名稱,新數量,新單位,新到期日,新存放位置。可以只修改部分欄位"
+    name="update_ingredient",
+    description="修改食材資訊（名稱、數量、單位、到期日、存放位置），只需提供要修改的欄位",
+    args_schema=UpdateIngredientInput,
+    handle_validation_error=True
 )
 
 
 # 所有可用工具列表
 AVAILABLE_TOOLS = [
     add_ingredient_tool,
+    add_ingredients_tool,
     get_ingredient_list_tool,
     check_expiring_ingredients_tool,
     delete_ingredient_tool,
@@ -0,0 +1,124 @@
+# worker_pool.py
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AgentWorkerPool:
+    """有界的背景工作池
+
+    webhook 只負責把工作交給工作池後立即回應，Agent 與 Google Sheets 的
+    阻塞呼叫在背景執行緒中完成。max_workers 限制同時執行的工作數，
+    max_pending 限制排隊中的工作數，超過上限時 submit 回傳 None。
+    submit_keyed 讓同一個 key（例如同一位用戶）的工作依提交順序逐一執行，
+    不同 key 的工作仍然並行。
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 100, name: str = "agent-worker"):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._lanes: Dict[Hashable, Deque[tuple]] = {}
+
+    @property
+    def in_flight(self) -> int:
+        """執行中與排隊中的工作數"""
+        return self._in_flight
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Optional[Future]:
+        """提交工作，工作池已滿時回傳 None"""
+        if not self._slots.acquire(blocking=False):
+            logger.warning(f"⚠️ 工作池已滿（{self.max_workers + self.max_pending} 個工作），拒絕新工作")
+            return None
+
+        with self._lock:
+            self._in_flight += 1
+
+        try:
+            # 沿用提交者的 contextvars（例如 webhook 的追蹤 ID）
+            context = contextvars.copy_context()
+            future = self._executor.submit(context.run, fn, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+
+        future.add_done_callback(self._on_done)
+        return future
+
+    def submit_keyed(self, key: Hashable, fn: Callable, *args, **kwargs) -> Optional[Future]:
+        """提交工作，同一個 key 的工作依序執行；工作池已滿時回傳 None"""
+        if not self._slots.acquire(blocking=False):
+            logger.warning(f"⚠️ 工作池已滿（{self.max_workers + self.max_pending} 個工作），拒絕新工作")
+            return None
+
+        future = Future()
+        future.add_done_callback(self._on_done)
+        task = (contextvars.copy_context(), fn, args, kwargs, future)
+        with self._lock:
+            self._in_flight += 1
+            lane = self._lanes.get(key)
+            start = lane is None
+            if start:
+                self._lanes[key] = deque([task])
+            else:
+                lane.append(task)
+
+        if start:
+            self._schedule(key)
+        return future
+
+    def _schedule(self, key: Hashable):
+        try:
+            self._executor.submit(self._run_next, key)
+        except RuntimeError:
+            # 工作池已關閉，取消這個 key 剩下的工作
+            with self._lock:
+                lane = self._lanes.pop(key, deque())
+            for _, _, _, _, future in lane:
+                future.cancel()
+
+    def _run_next(self, key: Hashable):
+        """執行 key 的下一個工作，完成後把下一個工作排到執行緒池最後（不獨占執行緒）"""
+        with self._lock:
+            context, fn, args, kwargs, future = self._lanes[key][0]
+
+        if future.set_running_or_notify_cancel():
+            try:
+                result = context.run(fn, *args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+        with self._lock:
+            lane = self._lanes[key]
+            lane.popleft()
+            if not lane:
+                del self._lanes[key]
+                return
+        self._schedule(key)
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _on_done(self, future: Future):
+        self._release()
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            logger.error(f"❌ 背景工作執行失敗: {str(error)}")
+
+    def shutdown(self, wait: bool = True):
+        """關閉工作池"""
+        self._executor.shutdown(wait=wait)
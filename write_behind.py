@@ -0,0 +1,257 @@
+# write_behind.py
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, Deque, Dict, List, Optional
+
+from gspread.utils import rowcol_to_a1
+
+logger = logging.getLogger(__name__)
+
+
+class MutationJournal:
+    """本機預寫日誌（append-only JSON Lines）
+
+    每筆變更寫入並 fsync 後才算確認；已寫入試算表的序號記錄在
+    checkpoint 檔，重啟時只重播序號大於 checkpoint 的變更。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.checkpoint_path = f"{path}.checkpoint"
+        self._lock = threading.Lock()
+        self.flushed_seq = self._read_checkpoint()
+        self.last_seq = self.flushed_seq
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _read_checkpoint(self) -> int:
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """讀出尚未寫入試算表的變更"""
+        ops = []
+        with self._lock, open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    op = json.loads(line)
+                except ValueError:
+                    # 寫到一半就當機的最後一行
+                    logger.warning(f"⚠️ 略過無法解析的日誌記錄: {line[:80]}")
+                    continue
+                self.last_seq = max(self.last_seq, op["seq"])
+                if op["seq"] > self.flushed_seq:
+                    ops.append(op)
+        return ops
+
+    def append(self, op: Dict[str, Any]) -> Dict[str, Any]:
+        """寫入一筆變更並 fsync，回傳帶有序號與時間的記錄"""
+        with self._lock:
+            self.last_seq += 1
+            entry = dict(op, seq=self.last_seq, ts=time.time())
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            return entry
+
+    def checkpoint(self, seq: int):
+        """記錄已寫入試算表的最後序號；全部寫入時清空日誌"""
+        with self._lock:
+            tmp_path = f"{self.checkpoint_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(str(seq))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.checkpoint_path)
+            self.flushed_seq = seq
+
+            if seq >= self.last_seq:
+                self._file.close()
+                self._file = open(self.path, "w", encoding="utf-8")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class WriteBehindQueue:
+    """Google Sheets 的延遲寫入佇列
+
+    變更先寫入 MutationJournal 並套用到記憶體索引，立即回覆用戶；
+    背景執行緒每 flush_interval 秒把累積的變更合併成批次寫入：
+    一次讀取 ID 欄定位列號、一次 batch_update、一次請求刪除所有列、一次 append_rows。
+    重播是冪等的：已存在的 ID 不會重複新增，找不到的 ID 不會刪除或更新。
+
+    row_lock 是儲存後端的列位移鎖（獨占）：寫入與移出佇列都在鎖內進行，
+    不會與同步時重新載入索引或其他會移動列的寫入交錯。
+    """
+
+    def __init__(self, worksheet: Any, journal: MutationJournal, headers: List[str],
+                 flush_interval: float = 2.0, max_batch: int = 200,
+                 row_lock: Callable[[], ContextManager] = nullcontext):
+        self.worksheet = worksheet
+        self.row_lock = row_lock
+        self.journal = journal
+        self.headers = headers
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue: Deque[Dict[str, Any]] = deque(journal.pending())
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {
+            'flushed_ops': 0,
+            'flush_batches': 0,
+            'failed_flushes': 0,
+            'last_flush_seconds': 0.0,
+            'last_error': None,
+        }
+        if self._queue:
+            logger.info(f"🔁 從日誌重播 {len(self._queue)} 筆尚未寫入的變更")
+
+    # ---------- 佇列 ----------
+
+    def enqueue(self, op: Dict[str, Any]) -> int:
+        """寫入日誌後放入佇列，回傳序號"""
+        entry = self.journal.append(op)
+        with self._cond:
+            self._queue.append(entry)
+            if len(self._queue) >= self.max_batch:
+                self._cond.notify()
+        return entry["seq"]
+
+    def pending_ops(self) -> List[Dict[str, Any]]:
+        """尚未寫入試算表的變更（用於重新載入索引後重新套用）"""
+        with self._cond:
+            return list(self._queue)
+
+    def stats(self) -> Dict[str, Any]:
+        """佇列深度與寫入延遲"""
+        with self._cond:
+            depth = len(self._queue)
+            oldest = self._queue[0]["ts"] if self._queue else None
+        stats = dict(self._stats)
+        stats['queue_depth'] = depth
+        stats['flush_lag_seconds'] = time.time() - oldest if oldest else 0.0
+        return stats
+
+    # ---------- 背景寫入 ----------
+
+    def start(self):
+        """啟動背景寫入執行緒"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sheets-write-behind", daemon=True)
+            self._thread.start()
+
+    def stop(self, flush: bool = True):
+        """停止背景執行緒，預設先把剩下的變更寫完"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if flush:
+            while self._queue and self.flush():
+                pass
+
+    def _run(self):
+        delay = self.flush_interval
+        while True:
+            with self._cond:
+                if not self._stopped and len(self._queue) < self.max_batch:
+                    self._cond.wait(timeout=delay)
+                if self._stopped:
+                    return
+            # 寫入失敗時逐步拉長間隔，避免在配額耗盡時持續重試
+            delay = self.flush_interval if self.flush() else min(delay * 2, 60.0)
+
+    def flush(self) -> bool:
+        """把目前佇列前端的一批變更寫入試算表，成功（或沒有變更）時回傳 True"""
+        with self._flush_lock, self.row_lock():
+            with self._cond:
+                batch = list(self._queue)[:self.max_batch]
+            if not batch:
+                return True
+
+            started = time.monotonic()
+            try:
+                self._apply_batch(batch)
+            except Exception as e:
+                self._stats['failed_flushes'] += 1
+                self._stats['last_error'] = str(e)
+                logger.error(f"❌ 延遲寫入 Google Sheets 失敗，稍後重試: {str(e)}")
+                return False
+
+            self.journal.checkpoint(batch[-1]["seq"])
+            with self._cond:
+                for _ in batch:
+                    self._queue.popleft()
+
+            self._stats['flushed_ops'] += len(batch)
+            self._stats['flush_batches'] += 1
+            self._stats['last_flush_seconds'] = time.monotonic() - started
+            logger.info(f"✅ 已批次寫入 {len(batch)} 筆變更到 Google Sheets")
+            return True
+
+    def _apply_batch(self, batch: List[Dict[str, Any]]):
+        # 合併同一個 ID 的變更
+        adds: "OrderedDict[int, List[Any]]" = OrderedDict()
+        updates: Dict[int, Dict[str, Any]] = {}
+        deletes = set()
+        for op in batch:
+            kind = op["op"]
+            if kind == "add":
+                adds[int(op["row"][0])] = list(op["row"])
+            elif kind == "update":
+                ingredient_id = op["id"]
+                if ingredient_id in adds:
+                    row = adds[ingredient_id]
+                    for header, value in op["fields"].items():
+                        row[self.headers.index(header)] = value
+                else:
+                    updates.setdefault(ingredient_id, {}).update(op["fields"])
+            elif kind == "delete":
+                ingredient_id = op["id"]
+                if ingredient_id in adds:
+                    # 還沒寫進試算表就被刪除
+                    del adds[ingredient_id]
+                else:
+                    updates.pop(ingredient_id, None)
+                    deletes.add(ingredient_id)
+
+        # 一次讀取 ID 欄，依寫入當下的列號定位
+        row_of = {}
+        for row, value in enumerate(self.worksheet.col_values(1)[1:], start=2):
+            try:
+                row_of[int(value)] = row
+            except (TypeError, ValueError):
+                continue
+
+        data = []
+        for ingredient_id, fields in updates.items():
+            row = row_of.get(ingredient_id)
+            if row is None:
+                continue
+            for header, value in fields.items():
+                data.append({'range': rowcol_to_a1(row, self.headers.index(header) + 1), 'values': [[value]]})
+        if data:
+            self.worksheet.batch_update(data, value_input_option='RAW')
+
+        # 一次請求刪除所有列（由下往上，避免列號位移）
+        self.worksheet.delete_rows_batch(row_of[i] for i in deletes if i in row_of)
+
+        new_rows = [row for ingredient_id, row in adds.items() if ingredient_id not in row_of]
+        if new_rows:
+            self.worksheet.append_rows(new_rows)